@@ -0,0 +1,332 @@
+import os
+import threading
+import time
+import numpy as np
+
+# מעל מספר אנשים זה - בדיקת נוכחות משתמשת באינדקס במקום מטריצה מלאה. 0 = כבוי (ברירת מחדל):
+# לפי benchmark_ann_index, בכל גודל (1k-20k) שבו recall של ההתאמה האמיתית קרוב ל-1.0, החיפוש באינדקס
+# איטי יותר מהמטריצה המלאה - ומועמד שהאינדקס מפספס הוא תלמיד נוכח שמסומן כנעדר
+ANN_MIN_PEOPLE = int(os.getenv('ATTENDME_ANN_MIN_PEOPLE', '0'))
+
+# כמה מועמדים (אנשים) לכל פנים מהמצלמה עוברים לדירוג מדויק
+ANN_CANDIDATES = 50
+
+# כמה רשימות (clusters) סורקים בכל חיפוש (32 × 50 מועמדים: recall של ההתאמה האמיתית 0.997-1.0 עד 20k אנשים)
+ANN_NPROBE = 32
+
+# אימון מחדש של ה-centroids כאשר האינדקס גדל פי 2 מאז האימון האחרון
+RETRAIN_GROWTH_FACTOR = 2.0
+
+KMEANS_ITERATIONS = 10
+
+
+def print_status(message, emoji="ℹ️", level=0):
+    """פונקציה להדפסת סטטוס עם רמות הזחה - בלי כפילות"""
+    indent = "  " * level
+    log_message = f"{indent}{emoji} {message}"
+    print(log_message)
+
+
+def _kmeans(vectors, clusters_count, iterations=KMEANS_ITERATIONS, seed=0):
+    """k-means פשוט על וקטורים מנורמלים (דמיון קוסינוס) - מחזיר centroids מנורמלים"""
+    rng = np.random.default_rng(seed)
+    centroids = vectors[rng.choice(len(vectors), clusters_count, replace=False)].copy()
+
+    for _ in range(iterations):
+        assignments = (vectors @ centroids.T).argmax(axis=1)
+        for cluster in range(clusters_count):
+            members = vectors[assignments == cluster]
+            if len(members):
+                centroids[cluster] = members.mean(axis=0)
+            else:
+                # cluster ריק - מקבל וקטור אקראי מחדש
+                centroids[cluster] = vectors[rng.integers(len(vectors))]
+        norms = np.linalg.norm(centroids, axis=1, keepdims=True)
+        centroids /= np.where(norms == 0, 1, norms)
+
+    return centroids
+
+
+class IvfIndex:
+    """
+    אינדקס IVF (inverted file) מעל NumPy: הוקטורים מחולקים ל-clusters לפי centroid,
+    וחיפוש סורק רק את nprobe ה-clusters הקרובים לשאילתה.
+    כל אדם יכול להופיע כמה פעמים (תמונה לכל רשומה) - התוצאות מאוחדות לפי אדם.
+    """
+
+    def __init__(self, nprobe=ANN_NPROBE):
+        self.nprobe = nprobe
+        self._lock = threading.Lock()
+        self._reset()
+
+    def _reset(self):
+        self._vectors = np.zeros((0, 0), dtype=np.float32)
+        self._owners = []
+        self._alive = np.zeros(0, dtype=bool)
+        self._rows_by_person = {}
+        self._centroids = None
+        self._lists = []
+        self._trained_size = 0
+
+    def __len__(self):
+        return len(self._rows_by_person)
+
+    def __contains__(self, person_id):
+        return person_id in self._rows_by_person
+
+    def person_ids(self):
+        return set(self._rows_by_person)
+
+    def build(self, person_vectors):
+        """
+        בונה את האינדקס מאפס
+
+        Args:
+            person_vectors (dict): {תעודת זהות: מטריצת וקטורים (תמונות × מימד)}
+        """
+        with self._lock:
+            self._reset()
+            if not person_vectors:
+                return
+
+            owners = []
+            blocks = []
+            for person_id, vectors in person_vectors.items():
+                vectors = np.atleast_2d(vectors).astype(np.float32)
+                start = len(owners)
+                owners.extend([person_id] * len(vectors))
+                self._rows_by_person[person_id] = list(range(start, start + len(vectors)))
+                blocks.append(vectors)
+
+            self._vectors = np.vstack(blocks)
+            self._owners = owners
+            self._alive = np.ones(len(owners), dtype=bool)
+            self._train()
+
+    def _train(self):
+        """אימון centroids ובניית הרשימות ההפוכות עבור כל השורות החיות"""
+        alive_rows = np.flatnonzero(self._alive)
+        clusters_count = max(1, int(np.sqrt(len(alive_rows))))
+        self._centroids = _kmeans(self._vectors[alive_rows], clusters_count)
+
+        assignments = (self._vectors[alive_rows] @ self._centroids.T).argmax(axis=1)
+        self._lists = [alive_rows[assignments == cluster] for cluster in range(clusters_count)]
+        self._trained_size = len(alive_rows)
+
+    def add(self, person_id, vectors):
+        """מוסיף (או מחליף) אדם בלי לאמן מחדש - כל וקטור נכנס לרשימה של ה-centroid הקרוב"""
+        vectors = np.atleast_2d(vectors).astype(np.float32)
+        if person_id in self._rows_by_person:
+            self.remove(person_id)
+
+        with self._lock:
+            if self._centroids is None:
+                # אינדקס ריק - האדם הראשון מאמן אותו
+                self._vectors = vectors
+                self._owners = [person_id] * len(vectors)
+                self._alive = np.ones(len(vectors), dtype=bool)
+                self._rows_by_person[person_id] = list(range(len(vectors)))
+                self._train()
+                return
+
+            start = len(self._owners)
+            new_rows = np.arange(start, start + len(vectors))
+            self._vectors = np.vstack([self._vectors, vectors])
+            self._owners.extend([person_id] * len(vectors))
+            self._alive = np.concatenate([self._alive, np.ones(len(vectors), dtype=bool)])
+            self._rows_by_person[person_id] = list(new_rows)
+
+            assignments = (vectors @ self._centroids.T).argmax(axis=1)
+            for row, cluster in zip(new_rows, assignments):
+                self._lists[cluster] = np.append(self._lists[cluster], row)
+
+            if self._alive.sum() >= self._trained_size * RETRAIN_GROWTH_FACTOR:
+                self._compact()
+                self._train()
+
+    def remove(self, person_id):
+        """מסיר אדם מהאינדקס; השורות מסומנות כמחוקות ונדחסות כשהן מצטברות"""
+        with self._lock:
+            rows = self._rows_by_person.pop(person_id, None)
+            if rows is None:
+                return False
+
+            self._alive[rows] = False
+            removed = set(rows)
+            self._lists = [np.array([row for row in rows_list if row not in removed], dtype=np.int64)
+                           for rows_list in self._lists]
+
+            if not self._rows_by_person:
+                self._reset()
+            elif (~self._alive).sum() > len(self._alive) // 4:
+                self._compact()
+                self._train()
+            return True
+
+    def _compact(self):
+        """מוחק פיזית שורות מחוקות ומעדכן את מיפוי השורות"""
+        alive_rows = np.flatnonzero(self._alive)
+        self._vectors = self._vectors[alive_rows]
+        self._owners = [self._owners[row] for row in alive_rows]
+        self._alive = np.ones(len(alive_rows), dtype=bool)
+        self._rows_by_person = {}
+        for row, person_id in enumerate(self._owners):
+            self._rows_by_person.setdefault(person_id, []).append(row)
+
+    def search(self, queries, top_k=ANN_CANDIDATES):
+        """
+        מחזיר לכל שאילתה את top_k האנשים הקרובים (מועמדים לדירוג מדויק)
+
+        Args:
+            queries (numpy.ndarray): וקטורים מנורמלים (שאילתות × מימד)
+            top_k (int): מספר מועמדים לכל שאילתה
+
+        Returns:
+            list: לכל שאילתה - רשימת תעודות זהות, מהקרוב לרחוק
+        """
+        queries = np.atleast_2d(queries).astype(np.float32)
+        with self._lock:
+            if self._centroids is None:
+                return [[] for _ in range(len(queries))]
+
+            nprobe = min(self.nprobe, len(self._centroids))
+            probes = np.argsort(-(queries @ self._centroids.T), axis=1)[:, :nprobe]
+
+            results = []
+            for query, query_probes in zip(queries, probes):
+                rows = np.concatenate([self._lists[cluster] for cluster in query_probes])
+                if len(rows) == 0:
+                    results.append([])
+                    continue
+
+                similarities = self._vectors[rows] @ query
+                candidates = []
+                seen = set()
+                for position in np.argsort(-similarities):
+                    person_id = self._owners[rows[position]]
+                    if person_id not in seen:
+                        seen.add(person_id)
+                        candidates.append(person_id)
+                        if len(candidates) == top_k:
+                            break
+                results.append(candidates)
+            return results
+
+
+class SchoolAnnIndex:
+    """אינדקס לבית ספר אחד, עם מעקב אחרי אנשים שנוספו/השתנו ועדיין לא הוכנסו"""
+
+    def __init__(self):
+        self.index = IvfIndex()
+        self.pending = set()
+        self.lock = threading.Lock()
+
+    def sync(self, person_vectors):
+        """
+        מעדכן את האינדקס באופן הדרגתי מול מצב בית הספר
+
+        Args:
+            person_vectors (dict): {תעודת זהות: מטריצת וקטורים} של האנשים בבדיקה הנוכחית
+        """
+        with self.lock:
+            if len(self.index) == 0:
+                self.index.build(person_vectors)
+                self.pending.clear()
+                return
+
+            # מחיקות מטופלות מיד ב-note_person_removed; כאן רק מוסיפים/מחליפים
+            changed = (self.pending & person_vectors.keys()) | (person_vectors.keys() - self.index.person_ids())
+            for person_id in changed:
+                self.index.add(person_id, person_vectors[person_id])
+            self.pending -= changed
+
+
+# אינדקס לכל בית ספר - לפי school_index
+_school_indexes = {}
+_registry_lock = threading.Lock()
+
+
+def get_school_ann_index(school_index):
+    with _registry_lock:
+        if school_index not in _school_indexes:
+            _school_indexes[school_index] = SchoolAnnIndex()
+        return _school_indexes[school_index]
+
+
+def note_person_changed(school_index, person_id):
+    """אדם נוסף או שתמונותיו השתנו - ייכנס לאינדקס בבדיקה הבאה (בלי בנייה מחדש)"""
+    school_ann = get_school_ann_index(school_index)
+    with school_ann.lock:
+        school_ann.pending.add(person_id)
+
+
+def note_person_removed(school_index, person_id):
+    """אדם נמחק - מוסר מיד מהאינדקס"""
+    school_ann = get_school_ann_index(school_index)
+    with school_ann.lock:
+        school_ann.pending.discard(person_id)
+        school_ann.index.remove(person_id)
+
+
+def benchmark_ann_index(people_count=5000, faces_count=300, dim=128, images_per_person=2, top_k=ANN_CANDIDATES,
+                        noise=0.6, seed=0):
+    """
+    משווה את האינדקס מול חיפוש מלא (brute-force) על נתונים סינתטיים
+
+    Returns:
+        dict: recall@k של האינדקס, וזמני בנייה וחיפוש (שניות)
+    """
+    rng = np.random.default_rng(seed)
+
+    def normalize(matrix):
+        return (matrix / np.linalg.norm(matrix, axis=-1, keepdims=True)).astype(np.float32)
+
+    identities = normalize(rng.normal(size=(people_count, dim)))
+    # רעש בגודל noise (בנורמה) סביב וקטור הזהות של כל אדם
+    noise_scale = noise / np.sqrt(dim)
+    gallery = normalize(identities[:, None, :] + noise_scale * rng.normal(size=(people_count, images_per_person, dim)))
+    queried = rng.choice(people_count, faces_count, replace=False)
+    queries = normalize(identities[queried] + noise_scale * rng.normal(size=(faces_count, dim)))
+    person_ids = [str(person) for person in range(people_count)]
+
+    # brute-force: מקסימום על הגלריה לכל אדם
+    start = time.perf_counter()
+    exact_scores = (gallery.reshape(-1, dim) @ queries.T).reshape(people_count, images_per_person, -1).max(axis=1)
+    exact_top = np.argsort(-exact_scores, axis=0)[:top_k].T
+    brute_force_seconds = time.perf_counter() - start
+
+    index = IvfIndex()
+    start = time.perf_counter()
+    index.build({person_ids[person]: gallery[person] for person in range(people_count)})
+    build_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    approximate_top = index.search(queries, top_k)
+    search_seconds = time.perf_counter() - start
+
+    hits = sum(len(set(person_ids[p] for p in exact) & set(approx))
+               for exact, approx in zip(exact_top, approximate_top))
+    true_match_hits = sum(person_ids[person] in approx for person, approx in zip(queried, approximate_top))
+
+    return {
+        'people': people_count,
+        'faces': faces_count,
+        'recall_at_k': hits / (faces_count * top_k),
+        'true_match_recall': true_match_hits / faces_count,
+        'brute_force_seconds': brute_force_seconds,
+        'build_seconds': build_seconds,
+        'search_seconds': search_seconds
+    }
+
+
+if __name__ == '__main__':
+    from tabulate import tabulate
+
+    rows = []
+    for people in (1000, 5000, 20000):
+        result = benchmark_ann_index(people_count=people)
+        rows.append([people, result['faces'], f"{result['recall_at_k']:.3f}", f"{result['true_match_recall']:.3f}",
+                     f"{result['brute_force_seconds'] * 1000:.1f}", f"{result['build_seconds'] * 1000:.1f}",
+                     f"{result['search_seconds'] * 1000:.1f}"])
+    print(tabulate(rows, headers=["people", "faces", "recall@k", "true match recall", "brute force ms",
+                                  "build ms", "search ms"], tablefmt="grid"))
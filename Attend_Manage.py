@@ -1,5 +1,9 @@
+import time
+from functools import partial
+
 from Yolo_modle import extract_all_faces_from_cameras
 from Face_comparison import check_attendance_unified
+from Job_manager import submit_job
 
 
 def extract_faces_from_cameras(school_index):
@@ -12,3 +16,76 @@ def check_attendance_for_people(school_index):
 
 def check_attendance_for_selected_people(school_index, person_ids):
     return check_attendance_unified(school_index, is_specific_check=True, person_ids=person_ids)
+
+
+def run_attendance_pipeline(school_index, person_ids=None, on_progress=None):
+    """
+    ריצה מלאה בקריאה אחת: חילוץ פנים מהמצלמות (detect) ואז בדיקת נוכחות (embed → match → persist).
+    הפנים מהחילוץ נשארות בזיכרון, כך שהבדיקה לא חוזרת ל-Cloudinary.
+
+    Args:
+        school_index (int): מספר בית הספר
+        person_ids (list, optional): תעודות זהות לבדיקה ספציפית (None = כל האנשים)
+        on_progress (callable, optional): מקבל מילון {'stage', 'status', ...} בתחילת ובסוף כל שלב
+
+    Returns:
+        dict: תוצאת בדיקת הנוכחות, בתוספת 'faces_extracted' ו-'stage_seconds'
+    """
+    def report(event):
+        if on_progress is not None:
+            on_progress(event)
+
+    pipeline_start = time.perf_counter()
+    report({'stage': 'pipeline', 'status': 'started', 'school_index': school_index})
+
+    extract_start = time.perf_counter()
+    extract_result = extract_all_faces_from_cameras(school_index, on_progress=on_progress)
+    extract_seconds = time.perf_counter() - extract_start
+
+    if not extract_result['success']:
+        report({'stage': 'pipeline', 'status': 'failed', 'message': extract_result['message']})
+        return {
+            'success': False,
+            'checked_people': 0,
+            'present_people': 0,
+            'absent_people': 0,
+            'faces_extracted': 0,
+            'message': extract_result['message'],
+            'school_name': extract_result.get('school_name')
+        }
+
+    check_start = time.perf_counter()
+    result = check_attendance_unified(school_index, is_specific_check=person_ids is not None, person_ids=person_ids,
+                                      on_progress=on_progress)
+    check_seconds = time.perf_counter() - check_start
+
+    result['faces_extracted'] = extract_result['faces_extracted']
+    result['stage_seconds'] = {
+        'extract': round(extract_seconds, 3),
+        'check': round(check_seconds, 3),
+        'total': round(time.perf_counter() - pipeline_start, 3)
+    }
+
+    report({'stage': 'pipeline', 'status': 'completed' if result['success'] else 'failed',
+            'message': result['message'], 'stage_seconds': result['stage_seconds']})
+    return result
+
+
+def enqueue_face_extraction(school_index):
+    """מכניס חילוץ פנים לתור המשימות ומחזיר את המשימה מיד"""
+    return submit_job('extract_faces', school_index, partial(extract_all_faces_from_cameras, school_index))
+
+
+def enqueue_attendance_check(school_index, person_ids=None):
+    """מכניס בדיקת נוכחות (כללית, או ספציפית אם יש person_ids) לתור המשימות"""
+    is_specific_check = person_ids is not None
+    return submit_job('check_specific' if is_specific_check else 'check_all', school_index,
+                      partial(check_attendance_unified, school_index, is_specific_check=is_specific_check,
+                              person_ids=person_ids),
+                      params={'person_ids': person_ids} if is_specific_check else None)
+
+
+def enqueue_attendance_pipeline(school_index, person_ids=None, listener=None):
+    """מכניס ריצה מלאה (חילוץ + בדיקה) לתור המשימות; listener מקבל כל אירוע התקדמות"""
+    return submit_job('pipeline', school_index, partial(run_attendance_pipeline, school_index, person_ids),
+                      params={'person_ids': person_ids}, listener=listener)
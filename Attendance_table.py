@@ -0,0 +1,181 @@
+import threading
+from datetime import datetime
+import numpy as np
+
+# פורמט זמן הבדיקה כפי שהוא מוצג בממשק ונשמר במאגר
+CHECK_TIME_FORMAT = "%d/%m/%y %H:%M"
+
+INITIAL_CAPACITY = 64
+
+
+def format_check_time(timestamp):
+    """epoch seconds → מחרוזת זמן בדיקה (None אם לא נבדק)"""
+    if timestamp is None or np.isnan(timestamp):
+        return None
+    return datetime.fromtimestamp(timestamp).strftime(CHECK_TIME_FORMAT)
+
+
+def parse_check_time(check_time):
+    """מחרוזת זמן בדיקה (או epoch seconds) → epoch seconds; NaN אם אין"""
+    if check_time is None or check_time == '':
+        return np.nan
+    if isinstance(check_time, (int, float)):
+        return float(check_time)
+    return datetime.strptime(check_time, CHECK_TIME_FORMAT).timestamp()
+
+
+class AttendanceTable:
+    """
+    מצב הנוכחות של בית ספר כטבלה עמודתית: מערך בוליאני של נוכחות ומערך זמני בדיקה (epoch, NaN = לא נבדק),
+    שורה לכל אדם לפי תעודת זהות. סימון כולם, עדכון לפי רשימה, ספירות וסינון - פעולות וקטוריות על המערכים.
+    """
+
+    def __init__(self):
+        self._row_by_id = {}
+        self._ids = []
+        self._present = np.zeros(INITIAL_CAPACITY, dtype=bool)
+        self._check_time = np.full(INITIAL_CAPACITY, np.nan)
+        self._lock = threading.RLock()
+
+    def __len__(self):
+        return len(self._ids)
+
+    def __contains__(self, id_number):
+        return id_number in self._row_by_id
+
+    def _grow(self, capacity):
+        """מגדיל את המערכים (פי 2) כשנגמר המקום"""
+        present = np.zeros(capacity, dtype=bool)
+        check_time = np.full(capacity, np.nan)
+        size = len(self._ids)
+        present[:size] = self._present[:size]
+        check_time[:size] = self._check_time[:size]
+        self._present = present
+        self._check_time = check_time
+
+    # --- שורות ---
+    def add_row(self, id_number, is_present=False, check_time=None):
+        """מוסיף שורה לאדם (או מעדכן אם כבר קיימת)"""
+        with self._lock:
+            row = self._row_by_id.get(id_number)
+            if row is None:
+                row = len(self._ids)
+                if row >= len(self._present):
+                    self._grow(max(INITIAL_CAPACITY, len(self._present) * 2))
+                self._row_by_id[id_number] = row
+                self._ids.append(id_number)
+            self._present[row] = bool(is_present)
+            self._check_time[row] = parse_check_time(check_time)
+
+    def remove_row(self, id_number):
+        """
+        מוחק שורה ב-O(1): השורה האחרונה עוברת למקום שהתפנה
+
+        Returns:
+            tuple: (is_present, check_time) של השורה שנמחקה, או None אם לא קיימת
+        """
+        with self._lock:
+            row = self._row_by_id.pop(id_number, None)
+            if row is None:
+                return None
+            removed = (bool(self._present[row]), format_check_time(self._check_time[row]))
+
+            last_row = len(self._ids) - 1
+            last_id = self._ids.pop()
+            if row != last_row:
+                self._ids[row] = last_id
+                self._row_by_id[last_id] = row
+                self._present[row] = self._present[last_row]
+                self._check_time[row] = self._check_time[last_row]
+            self._present[last_row] = False
+            self._check_time[last_row] = np.nan
+            return removed
+
+    def _rows(self, id_numbers):
+        """תעודות זהות → (מערך שורות, תעודות זהות שלא קיימות)"""
+        rows = []
+        unknown_ids = []
+        for id_number in id_numbers:
+            row = self._row_by_id.get(id_number)
+            if row is None:
+                unknown_ids.append(id_number)
+            else:
+                rows.append(row)
+        return np.asarray(rows, dtype=np.intp), unknown_ids
+
+    # --- אדם אחד ---
+    def is_present(self, id_number):
+        with self._lock:
+            return bool(self._present[self._row_by_id[id_number]])
+
+    def get_check_time(self, id_number):
+        with self._lock:
+            return format_check_time(self._check_time[self._row_by_id[id_number]])
+
+    def set_present(self, id_number, is_present):
+        with self._lock:
+            self._present[self._row_by_id[id_number]] = bool(is_present)
+
+    def set_check_time(self, id_number, check_time):
+        with self._lock:
+            self._check_time[self._row_by_id[id_number]] = parse_check_time(check_time)
+
+    # --- פעולות וקטוריות ---
+    def mark_all(self, is_present, check_time=None):
+        """
+        מסמן את כל בית הספר כנוכח / לא נוכח בפעולה אחת
+
+        Args:
+            check_time (float, optional): זמן בדיקה (epoch) לכל השורות; None = זמני הבדיקה לא משתנים
+
+        Returns:
+            int: כמה אנשים סומנו
+        """
+        with self._lock:
+            size = len(self._ids)
+            self._present[:size] = bool(is_present)
+            if check_time is not None:
+                self._check_time[:size] = parse_check_time(check_time)
+            return size
+
+    def set_presence(self, id_numbers, is_present, check_time=None):
+        """
+        מעדכן נוכחות לרשימת תעודות זהות בפעולה וקטורית אחת
+
+        Args:
+            check_time (float, optional): זמן בדיקה (epoch) לשורות שעודכנו; None = זמני הבדיקה לא משתנים
+
+        Returns:
+            tuple: (כמה עודכנו, תעודות זהות שלא קיימות)
+        """
+        with self._lock:
+            rows, unknown_ids = self._rows(id_numbers)
+            self._present[rows] = bool(is_present)
+            if check_time is not None:
+                self._check_time[rows] = parse_check_time(check_time)
+            return len(np.unique(rows)), unknown_ids
+
+    def get_counts(self):
+        """{'total', 'present', 'absent', 'checked'}"""
+        with self._lock:
+            size = len(self._ids)
+            present = int(np.count_nonzero(self._present[:size]))
+            checked = int(np.count_nonzero(~np.isnan(self._check_time[:size])))
+        return {'total': size, 'present': present, 'absent': size - present, 'checked': checked}
+
+    def get_ids(self, is_present=None, checked_since=None):
+        """
+        תעודות הזהות לפי סינון: נוכחים / נעדרים (is_present) ו/או נבדקו מאז (checked_since, epoch)
+
+        Returns:
+            list: תעודות זהות לפי סדר השורות
+        """
+        with self._lock:
+            size = len(self._ids)
+            mask = np.ones(size, dtype=bool)
+            if is_present is not None:
+                mask &= self._present[:size] == bool(is_present)
+            if checked_since is not None:
+                # השוואה עם NaN תמיד False - מי שלא נבדק לא נכלל
+                mask &= self._check_time[:size] >= checked_since
+            return [self._ids[row] for row in np.flatnonzero(mask)]
@@ -1,8 +1,20 @@
+import time
+
 from Person import Person
 from Target import Target
 from School import School
+from Enrollment_cache import invalidate_urls
+from Ann_index import note_person_changed, note_person_removed
+from Attendance_table import format_check_time
+from School_store import (load_schools, save_school, save_person, save_presence, delete_person, save_target,
+                          delete_target, delete_targets, clear_store)
+
+# בתי הספר נטענים מהמאגר הקבוע (רק הכותרות - אנשים ומטרות נטענים בגישה הראשונה לכל בית ספר)
+schools_database = load_schools()
 
-schools_database = []
+# אינדקסים גלובליים לבתי הספר: שם משתמש → School, אימייל → School
+_schools_by_username = {school.admin_username: school for school in schools_database}
+_schools_by_email = {school.school_email: school for school in schools_database}
 
 """==================================School========================="""
 
@@ -11,11 +23,7 @@ def login_user(username, password):
     print(f"🔐 מנסה להתחבר עם המשתמש: {username}")
 
     # בדיקה אם יש משתמש כזה
-    user_school = None
-    for school in schools_database:
-        if school.admin_username == username:
-            user_school = school
-            break
+    user_school = _schools_by_username.get(username)
 
     # אם לא נמצא שם משתמש כזה
     if user_school is None:
@@ -73,24 +81,22 @@ def register_school(school_data):
         }
 
     # בדיקה אם שם המשתמש כבר קיים
-    for school in schools_database:
-        if school.admin_username == admin_username:
-            print(f"❌ שם המשתמש '{admin_username}' כבר קיים במערכת")
-            return {
-                'success': False,
-                'message': f"שם המשתמש '{admin_username}' כבר קיים במערכת. נא לבחור שם משתמש אחר",
-                'error_type': 'username_exists'
-            }
+    if admin_username in _schools_by_username:
+        print(f"❌ שם המשתמש '{admin_username}' כבר קיים במערכת")
+        return {
+            'success': False,
+            'message': f"שם המשתמש '{admin_username}' כבר קיים במערכת. נא לבחור שם משתמש אחר",
+            'error_type': 'username_exists'
+        }
 
     # בדיקה אם האימייל כבר קיים
-    for school in schools_database:
-        if school.school_email == school_email:
-            print(f"❌ האימייל '{school_email}' כבר קיים במערכת")
-            return {
-                'success': False,
-                'message': f"האימייל '{school_email}' כבר רשום במערכת. נא להשתמש באימייל אחר",
-                'error_type': 'email_exists'
-            }
+    if school_email in _schools_by_email:
+        print(f"❌ האימייל '{school_email}' כבר קיים במערכת")
+        return {
+            'success': False,
+            'message': f"האימייל '{school_email}' כבר רשום במערכת. נא להשתמש באימייל אחר",
+            'error_type': 'email_exists'
+        }
 
     # יצירת אובייקט בית ספר חדש
     try:
@@ -107,8 +113,11 @@ def register_school(school_data):
             school_index=new_position
         )
 
-        # הוספה לווקטור הגלובלי
+        # הוספה לווקטור הגלובלי ולמאגר
         schools_database.append(new_school)
+        _schools_by_username[admin_username] = new_school
+        _schools_by_email[school_email] = new_school
+        save_school(new_school)
 
         print(f"✅ בית הספר '{school_name}' נרשם בהצלחה עם המשתמש '{admin_username}'")
         print(f"📍 מיקום בווקטור: {new_position}")
@@ -140,18 +149,15 @@ def get_schools_count():
 
 
 def find_school_by_username(username):
-    for school in schools_database:
-        if school.admin_username == username:
-            return school
-    return None
+    return _schools_by_username.get(username)
 
 
 def get_school_index_by_username(username):
     """מחזיר את האינדקס של בית הספר לפי שם משתמש"""
-    for i, school in enumerate(schools_database):
-        if school.admin_username == username:
-            return i
-    return -1  # לא נמצא
+    school = _schools_by_username.get(username)
+    if school is None:
+        return -1  # לא נמצא
+    return school.school_index
 
 
 def validate_school_index(school_index):
@@ -189,6 +195,9 @@ def print_all_schools():
 def clear_database():
     global schools_database
     schools_database.clear()
+    _schools_by_username.clear()
+    _schools_by_email.clear()
+    clear_store()
     print("🗑️ מסד הנתונים נוקה")
 
 
@@ -246,7 +255,7 @@ def add_new_person(school_index, first_name, last_name, id_number, images_url):
     school = schools_database[school_index]
 
     # בדיקה אם האדם כבר קיים בבית הספר הזה
-    if any(person.id_number == id_number for person in school.people_vector):
+    if school.has_person(id_number):
         return {
             'success': False,
             'person': None,
@@ -257,8 +266,10 @@ def add_new_person(school_index, first_name, last_name, id_number, images_url):
     # יצירת אדם חדש
     new_person = Person(first_name, last_name, id_number, images_url)
 
-    # הוספה לווקטור של בית הספר הספציפי
-    school.people_vector.append(new_person)
+    # הוספה לבית הספר הספציפי
+    school.add_person(new_person)
+    save_person(school_index, new_person)
+    note_person_changed(school_index, id_number)
 
     print(f"✅ נוסף אדם חדש לבית הספר {school.school_name}: {new_person.get_full_name_and_id()}")
 
@@ -287,17 +298,20 @@ def remove_person(school_index, id_number):
     school = schools_database[school_index]
     print(f"\n=== מחיקת אדם עם ת.ז. {id_number} מבית הספר {school.school_name} ===")
 
-    # חיפוש האדם בבית הספר הספציפי
-    for i, person in enumerate(school.people_vector):
-        if person.id_number == id_number:
-            # מחיקה
-            removed_person = school.people_vector.pop(i)
-            print(f"✅ נמחק: {removed_person.get_full_name_and_id()} מבית הספר {school.school_name}")
-            return {
-                'success': True,
-                'message': f"האדם {removed_person.get_full_name_and_id()} נמחק בהצלחה",
-                'removed_person': removed_person.get_person_details()
-            }
+    # חיפוש ומחיקה של האדם בבית הספר הספציפי
+    removed_person = school.remove_person(id_number)
+    if removed_person is not None:
+        delete_person(school_index, id_number)
+        print(f"✅ נמחק: {removed_person.get_full_name_and_id()} מבית הספר {school.school_name}")
+
+        # ניקוי תמונות הרישום והוקטורים שלהן מהקאש המקומי ומאינדקס החיפוש
+        invalidate_urls(removed_person.image_urls)
+        note_person_removed(school_index, id_number)
+        return {
+            'success': True,
+            'message': f"האדם {removed_person.get_full_name_and_id()} נמחק בהצלחה",
+            'removed_person': removed_person.get_person_details()
+        }
 
     print(f"❌ לא נמצא אדם עם ת.ז. {id_number} בבית הספר {school.school_name}")
     return {
@@ -347,14 +361,14 @@ def get_person(school_index, person_id):
 
     school = schools_database[school_index]
 
-    for person in school.people_vector:
-        if person.id_number == person_id:
-            return {
-                'success': True,
-                'person': person.get_person_details(),
-                'school_name': school.school_name,
-                'message': f"אדם נמצא בבית הספר {school.school_name}"
-            }
+    person = school.get_person(person_id)
+    if person is not None:
+        return {
+            'success': True,
+            'person': person.get_person_details(),
+            'school_name': school.school_name,
+            'message': f"אדם נמצא בבית הספר {school.school_name}"
+        }
 
     return {
         'success': False,
@@ -364,6 +378,46 @@ def get_person(school_index, person_id):
     }
 
 
+def resolve_person_ids(school_index, person_ids):
+    """
+    בודק אילו תעודות זהות מהרשימה קיימות בבית הספר (דרך האינדקס, בלי מעבר על כל האנשים)
+
+    Returns:
+        dict: {'success': True אם נמצא לפחות אדם אחד, 'found_person_ids': [...], 'unknown_person_ids': [...]}
+    """
+
+    # בדיקת תקינות האינדקס
+    is_valid, error_msg = validate_school_index(school_index)
+    if not is_valid:
+        return {
+            'success': False,
+            'found_person_ids': [],
+            'unknown_person_ids': [],
+            'message': f"שגיאה באינדקס בית הספר: {error_msg}",
+            'error': 'INVALID_SCHOOL_INDEX'
+        }
+
+    school = schools_database[school_index]
+    people, unknown_person_ids = school.get_people(person_ids)
+
+    if not people:
+        return {
+            'success': False,
+            'found_person_ids': [],
+            'unknown_person_ids': unknown_person_ids,
+            'message': f"לא נמצאו אנשים עם תעודות הזהות שנבחרו בבית הספר {school.school_name}",
+            'error': 'PERSON_NOT_FOUND'
+        }
+
+    return {
+        'success': True,
+        'found_person_ids': [person.id_number for person in people],
+        'unknown_person_ids': unknown_person_ids,
+        'message': f"נמצאו {len(people)} מתוך {len(people) + len(unknown_person_ids)} תעודות זהות",
+        'error': None
+    }
+
+
 def update_person(school_index, person_id, new_first_name, new_last_name):
     """מעדכן פרטי אדם קיים בבית ספר ספציפי"""
 
@@ -378,23 +432,24 @@ def update_person(school_index, person_id, new_first_name, new_last_name):
 
     school = schools_database[school_index]
 
-    for person in school.people_vector:
-        if person.id_number == person_id:
-            # שמירת שמות ישנים לצורך הודעה
-            old_name = f"{person.first_name} {person.last_name}"
+    person = school.get_person(person_id)
+    if person is not None:
+        # שמירת שמות ישנים לצורך הודעה
+        old_name = f"{person.first_name} {person.last_name}"
 
-            # עדכון הפרטים
-            person.first_name = new_first_name
-            person.last_name = new_last_name
+        # עדכון הפרטים
+        person.first_name = new_first_name
+        person.last_name = new_last_name
+        save_person(school_index, person)
 
-            new_name = f"{person.first_name} {person.last_name}"
+        new_name = f"{person.first_name} {person.last_name}"
 
-            return {
-                'success': True,
-                'message': f"פרטי האדם עודכנו בהצלחה: {old_name} → {new_name}",
-                'updated_person': person.get_person_details(),
-                'school_name': school.school_name
-            }
+        return {
+            'success': True,
+            'message': f"פרטי האדם עודכנו בהצלחה: {old_name} → {new_name}",
+            'updated_person': person.get_person_details(),
+            'school_name': school.school_name
+        }
 
     return {
         'success': False,
@@ -420,12 +475,8 @@ def add_new_image_url(school_index, person_id, image_url):
         school = schools_database[school_index]
         print(f"📚 בית ספר נמצא: {school.school_name}")
 
-        # חיפוש האדם - תיקון: people_vector במקום people
-        person = None
-        for p in school.people_vector:  # 🔧 זה התיקון העיקרי!
-            if p.id_number == person_id:
-                person = p
-                break
+        # חיפוש האדם באינדקס תעודות הזהות של בית הספר
+        person = school.get_person(person_id)
 
         if not person:
             return {
@@ -452,8 +503,12 @@ def add_new_image_url(school_index, person_id, image_url):
 
         print(f"📷 התמונה נוספה. סה״כ תמונות: {len(person.image_urls)}")
 
-        # כאן אין צורך בשמירת קובץ כי הנתונים נשמרים בזיכרון
-        # אם יש לך פונקציה לשמירה, תוסיף אותה כאן
+        save_person(school_index, person)
+
+        # הקאש שומר וקטורים לכל URL בנפרד, והציון של האדם מחושב מהם מחדש בכל בדיקה - תמונה נוספת לא משנה
+        # את הרשומות של התמונות הקיימות. רק ה-URL החדש עלול להחזיק רשומה ישנה (URL בלי גרסה שתוכנו הוחלף)
+        invalidate_urls([image_url])
+        note_person_changed(school_index, person_id)
 
         return {
             'success': True,
@@ -485,20 +540,21 @@ def toggle_presence(school_index, person_id, new_presence_status):
 
     school = schools_database[school_index]
 
-    for person in school.people_vector:
-        if person.id_number == person_id:
-            # עדכון סטטוס הנוכחות
-            person.set_presence(new_presence_status)
+    person = school.get_person(person_id)
+    if person is not None:
+        # עדכון סטטוס הנוכחות
+        person.set_presence(new_presence_status)
+        save_person(school_index, person)
 
-            status_text = "נוכח" if new_presence_status else "לא נוכח"
+        status_text = "נוכח" if new_presence_status else "לא נוכח"
 
-            return {
-                'success': True,
-                'message': f"סטטוס נוכחות של {person.get_full_name_and_id()} עודכן ל: {status_text}",
-                'person_id': person_id,
-                'new_status': new_presence_status,
-                'school_name': school.school_name
-            }
+        return {
+            'success': True,
+            'message': f"סטטוס נוכחות של {person.get_full_name_and_id()} עודכן ל: {status_text}",
+            'person_id': person_id,
+            'new_status': new_presence_status,
+            'school_name': school.school_name
+        }
 
     return {
         'success': False,
@@ -507,6 +563,107 @@ def toggle_presence(school_index, person_id, new_presence_status):
     }
 
 
+def mark_all_presence(school_index, is_present, update_check_time=False):
+    """
+    מסמן את כל האנשים בבית הספר כנוכחים / לא נוכחים - פעולה וקטורית אחת על טבלת הנוכחות.
+    update_check_time - גם זמן הבדיקה של כולם מתעדכן לעכשיו (ונשמר במאגר)
+    """
+
+    # בדיקת תקינות האינדקס
+    is_valid, error_msg = validate_school_index(school_index)
+    if not is_valid:
+        return {
+            'success': False,
+            'message': f"שגיאה באינדקס בית הספר: {error_msg}",
+            'error': 'INVALID_SCHOOL_INDEX'
+        }
+
+    school = schools_database[school_index]
+    attendance = school.get_attendance()
+    check_time = time.time() if update_check_time else None
+    updated_count = attendance.mark_all(is_present, check_time)
+    save_presence(school_index, is_present, check_time=format_check_time(check_time))
+
+    status_text = "נוכחים" if is_present else "לא נוכחים"
+    print(f"✅ {updated_count} אנשים סומנו כ{status_text} בבית הספר {school.school_name}")
+
+    return {
+        'success': True,
+        'message': f"{updated_count} אנשים סומנו כ{status_text}",
+        'updated_count': updated_count,
+        'counts': attendance.get_counts(),
+        'school_name': school.school_name
+    }
+
+
+def set_presence_for_people(school_index, person_ids, is_present, update_check_time=False):
+    """מעדכן סטטוס נוכחות (ואופציונלית זמן בדיקה - עכשיו) לרשימת תעודות זהות בפעולה אחת"""
+
+    # בדיקת תקינות האינדקס
+    is_valid, error_msg = validate_school_index(school_index)
+    if not is_valid:
+        return {
+            'success': False,
+            'message': f"שגיאה באינדקס בית הספר: {error_msg}",
+            'error': 'INVALID_SCHOOL_INDEX'
+        }
+
+    school = schools_database[school_index]
+    attendance = school.get_attendance()
+    check_time = time.time() if update_check_time else None
+    updated_count, unknown_person_ids = attendance.set_presence(person_ids, is_present, check_time)
+
+    if updated_count == 0:
+        return {
+            'success': False,
+            'message': f"לא נמצאו אנשים עם תעודות הזהות שנבחרו בבית הספר {school.school_name}",
+            'unknown_person_ids': unknown_person_ids,
+            'error': 'PERSON_NOT_FOUND'
+        }
+
+    save_presence(school_index, is_present, [person_id for person_id in person_ids if person_id in attendance],
+                  check_time=format_check_time(check_time))
+
+    status_text = "נוכחים" if is_present else "לא נוכחים"
+    return {
+        'success': True,
+        'message': f"{updated_count} אנשים סומנו כ{status_text}",
+        'updated_count': updated_count,
+        'unknown_person_ids': unknown_person_ids,
+        'counts': attendance.get_counts(),
+        'school_name': school.school_name
+    }
+
+
+def get_attendance_summary(school_index, is_present=None):
+    """
+    ספירות הנוכחות של בית הספר, ואופציונלית תעודות הזהות של הנוכחים (True) או הנעדרים (False)
+    """
+
+    # בדיקת תקינות האינדקס
+    is_valid, error_msg = validate_school_index(school_index)
+    if not is_valid:
+        return {
+            'success': False,
+            'message': f"שגיאה באינדקס בית הספר: {error_msg}",
+            'error': 'INVALID_SCHOOL_INDEX'
+        }
+
+    school = schools_database[school_index]
+    attendance = school.get_attendance()
+    counts = attendance.get_counts()
+
+    result = {
+        'success': True,
+        'counts': counts,
+        'school_name': school.school_name,
+        'message': f"{counts['present']} נוכחים, {counts['absent']} נעדרים מתוך {counts['total']}"
+    }
+    if is_present is not None:
+        result['person_ids'] = attendance.get_ids(is_present=is_present)
+    return result
+
+
 """============================Target====================================="""
 
 
@@ -525,7 +682,7 @@ def add_new_target(school_index, camera_number, images_url, enable_face_detectio
     school = schools_database[school_index]
 
     # בדיקה אם מצלמה עם המספר הזה כבר קיימת בבית הספר
-    if any(target.camera_number == camera_number for target in school.targets_vector):
+    if school.has_target(camera_number):
         return {
             'success': False,
             'message': f"מצלמה מספר {camera_number} כבר קיימת בבית הספר {school.school_name}",
@@ -536,8 +693,9 @@ def add_new_target(school_index, camera_number, images_url, enable_face_detectio
         # יצירת מטרה חדשה
         new_target = Target(camera_number, images_url, enable_face_detection=enable_face_detection)
 
-        # הוספה לווקטור של בית הספר הספציפי
-        school.targets_vector.append(new_target)
+        # הוספה לבית הספר הספציפי
+        school.add_target(new_target)
+        save_target(school_index, new_target)
 
         print(f"✅ נוספה מטרה חדשה לבית הספר {school.school_name}: מצלמה {camera_number}")
 
@@ -574,18 +732,17 @@ def remove_target(school_index, camera_number):
     school = schools_database[school_index]
     print(f"\n=== מחיקת מטרה במצלמה {camera_number} מבית הספר {school.school_name} ===")
 
-    # חיפוש המטרה בבית הספר הספציפי
-    for i, target in enumerate(school.targets_vector):
-        if target.camera_number == camera_number:
-            # מחיקה
-            removed_target = school.targets_vector.pop(i)
-            print(f"✅ נמחקה מטרה: מצלמה {removed_target.camera_number} מבית הספר {school.school_name}")
-            return {
-                'success': True,
-                'message': f"מטרה במצלמה {camera_number} נמחקה בהצלחה",
-                'camera_number': camera_number,
-                'school_name': school.school_name
-            }
+    # חיפוש ומחיקה של המטרה בבית הספר הספציפי
+    removed_target = school.remove_target(camera_number)
+    if removed_target is not None:
+        delete_target(school_index, camera_number)
+        print(f"✅ נמחקה מטרה: מצלמה {removed_target.camera_number} מבית הספר {school.school_name}")
+        return {
+            'success': True,
+            'message': f"מטרה במצלמה {camera_number} נמחקה בהצלחה",
+            'camera_number': camera_number,
+            'school_name': school.school_name
+        }
 
     print(f"❌ לא נמצאה מטרה עם מספר מצלמה {camera_number} בבית הספר {school.school_name}")
     return {
@@ -643,9 +800,8 @@ def clear_all_targets(school_index):
         }
 
     school = schools_database[school_index]
-    targets_count = len(school.targets_vector)
-
-    school.targets_vector.clear()
+    targets_count = school.clear_targets()
+    delete_targets(school_index)
 
     print(f"✅ כל המטרות ({targets_count}) נמחקו מבית הספר {school.school_name}")
 
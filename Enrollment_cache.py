@@ -0,0 +1,214 @@
+import os
+import hashlib
+import threading
+import numpy as np
+
+# קאש מקומי לוקטורים של תמונות רישום - לפי ה-URL ב-Cloudinary (כולל גרסה).
+# רק הוקטורים נשמרים: בריצה חמה הם כל מה שנדרש, והתמונה עצמה לא נקראת שוב
+ENROLLMENT_CACHE_DIR = os.getenv('ATTENDME_ENROLLMENT_CACHE_DIR',
+                                 os.path.join(os.path.dirname(os.path.abspath(__file__)), 'enrollment_cache'))
+ENROLLMENT_CACHE_MAX_BYTES = int(os.getenv('ATTENDME_ENROLLMENT_CACHE_MB', '512')) * 1024 * 1024
+# פינוי מוריד את הקאש מתחת למגבלה (ולא בדיוק אליה), כדי שלא כל שמירה אחריו תפעיל פינוי נוסף
+ENROLLMENT_CACHE_EVICT_TO_RATIO = 0.9
+
+# שכבת זיכרון מעל הדיסק - וקטורים בלבד, קטנים מספיק כדי להחזיק את כולם
+_memory_embeddings = {}
+# נתיב קובץ → URL, לרשומות שנטענו או נשמרו בתהליך הזה (כדי לפנות מהזיכרון רק את מה שנמחק מהדיסק)
+_urls_by_path = {}
+# גודל הקאש בדיסק - מחושב בסריקה אחת בשימוש הראשון ומתעדכן בכל שמירה ומחיקה
+_total_bytes = None
+_lock = threading.Lock()
+_eviction_lock = threading.Lock()
+
+
+def print_status(message, emoji="ℹ️", level=0):
+    """פונקציה להדפסת סטטוס עם רמות הזחה - בלי כפילות"""
+    indent = "  " * level
+    log_message = f"{indent}{emoji} {message}"
+    print(log_message)
+
+
+def _entry_path(image_url):
+    """נתיב הקובץ של רשומה - hash של ה-URL"""
+    digest = hashlib.sha256(image_url.encode('utf-8')).hexdigest()
+    return os.path.join(ENROLLMENT_CACHE_DIR, digest[:2], f"{digest}.npz")
+
+
+def load_embeddings(image_url, model_names):
+    """
+    מחזיר את הוקטורים השמורים של תמונת רישום, מהזיכרון או מהדיסק
+
+    Args:
+        image_url (str): URL התמונה
+        model_names (tuple): המודלים הנדרשים - רשומה בלי כולם נחשבת כחסרה
+
+    Returns:
+        dict: {שם מודל: וקטור} או None
+    """
+    with _lock:
+        embeddings = _memory_embeddings.get(image_url)
+    if embeddings is not None and all(name in embeddings for name in model_names):
+        return embeddings
+
+    path = _entry_path(image_url)
+    try:
+        with np.load(path) as entry:
+            embeddings = {name: entry[f"embedding_{name}"] for name in model_names}
+        # עדכון זמן גישה לצורך פינוי LRU
+        os.utime(path)
+    except (FileNotFoundError, KeyError):
+        return None
+    except Exception as e:
+        print_status(f"רשומת קאש פגומה, נמחקת: {str(e)}", emoji="⚠️", level=2)
+        _remove_file(path)
+        return None
+
+    with _lock:
+        _memory_embeddings[image_url] = embeddings
+        _urls_by_path[path] = image_url
+    return embeddings
+
+
+def save_entry(image_url, embeddings):
+    """
+    שומר את הוקטורים של תמונת רישום בקובץ npz
+
+    Args:
+        image_url (str): URL התמונה
+        embeddings (dict): {שם מודל: וקטור}
+    """
+    path = _entry_path(image_url)
+    with _lock:
+        _memory_embeddings[image_url] = embeddings
+        _urls_by_path[path] = image_url
+
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # הגודל מחושב מראש (סריקה אחת), כדי שהקובץ החדש לא ייספר פעמיים
+        _get_total_bytes()
+
+        # כתיבה לקובץ זמני והחלפה אטומית - קורא מקביל לא יראה קובץ חלקי
+        temp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(temp_path, 'wb') as temp_file:
+            np.savez(temp_file,
+                     **{f"embedding_{name}": vector.astype(np.float32) for name, vector in embeddings.items()})
+        added_bytes = os.path.getsize(temp_path) - _file_size(path)
+        os.replace(temp_path, path)
+        _add_bytes(added_bytes)
+
+        _enforce_size_limit()
+
+    except Exception as e:
+        print_status(f"שגיאה בשמירה לקאש הרישום: {str(e)}", emoji="⚠️", level=2)
+
+
+def invalidate_urls(image_urls):
+    """מוחק רשומות של תמונות רישום (בזיכרון ובדיסק)"""
+    removed = 0
+    for image_url in image_urls:
+        if not image_url:
+            continue
+        path = _entry_path(image_url)
+        with _lock:
+            _memory_embeddings.pop(image_url, None)
+            _urls_by_path.pop(path, None)
+        if _remove_file(path):
+            removed += 1
+    return removed
+
+
+def _file_size(path):
+    try:
+        return os.path.getsize(path)
+    except OSError:
+        return 0
+
+
+def _remove_file(path):
+    """מוחק קובץ רשומה ומעדכן את גודל הקאש. מחזיר True אם נמחק"""
+    size = _file_size(path)
+    try:
+        os.remove(path)
+    except OSError:
+        return False
+    _add_bytes(-size)
+    return True
+
+
+def _scan_entries():
+    """סורק את הקאש בדיסק. מחזיר (רשימת (mtime, גודל, נתיב), סה"כ בתים)"""
+    entries = []
+    total_bytes = 0
+    for root, _, filenames in os.walk(ENROLLMENT_CACHE_DIR):
+        for filename in filenames:
+            if not filename.endswith('.npz'):
+                continue
+            path = os.path.join(root, filename)
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+            total_bytes += stat.st_size
+    return entries, total_bytes
+
+
+def _get_total_bytes():
+    """גודל הקאש בדיסק - סריקה מלאה רק בקריאה הראשונה"""
+    global _total_bytes
+
+    if _total_bytes is not None:
+        return _total_bytes
+
+    with _eviction_lock:
+        if _total_bytes is None:
+            _, total_bytes = _scan_entries()
+            with _lock:
+                _total_bytes = total_bytes
+    return _total_bytes
+
+
+def _add_bytes(delta):
+    global _total_bytes
+    with _lock:
+        if _total_bytes is not None:
+            _total_bytes = max(0, _total_bytes + delta)
+
+
+def _enforce_size_limit():
+    """
+    אם הקאש עבר את הגודל המותר - מפנה את הרשומות שנגעו בהן הכי מזמן עד ENROLLMENT_CACHE_EVICT_TO_RATIO מהמגבלה.
+    בשמירה רגילה זו רק השוואה מול הגודל הרץ; הסריקה (לסדר ה-LRU) רצה רק כשצריך לפנות.
+    """
+    global _total_bytes
+
+    if _get_total_bytes() <= ENROLLMENT_CACHE_MAX_BYTES:
+        return
+
+    with _eviction_lock:
+        # הסריקה גם מסנכרנת את הגודל הרץ עם הדיסק (למשל אחרי כתיבות של תהליכים אחרים)
+        entries, total_bytes = _scan_entries()
+        if total_bytes > ENROLLMENT_CACHE_MAX_BYTES:
+            target_bytes = ENROLLMENT_CACHE_MAX_BYTES * ENROLLMENT_CACHE_EVICT_TO_RATIO
+            evicted_paths = []
+            entries.sort()
+            for _, size, path in entries:
+                if total_bytes <= target_bytes:
+                    break
+                try:
+                    os.remove(path)
+                except OSError:
+                    continue
+                total_bytes -= size
+                evicted_paths.append(path)
+
+            # רק הרשומות שנמחקו יוצאות מהזיכרון - השאר נשארות זמינות בלי טעינה מהדיסק
+            with _lock:
+                for path in evicted_paths:
+                    image_url = _urls_by_path.pop(path, None)
+                    if image_url is not None:
+                        _memory_embeddings.pop(image_url, None)
+            print_status(f"פונו {len(evicted_paths)} רשומות מקאש הרישום", emoji="🧹", level=2)
+
+        with _lock:
+            _total_bytes = total_bytes
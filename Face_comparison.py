@@ -1,14 +1,19 @@
 from Data_Manage import validate_school_index, schools_database
 
 from deepface import DeepFace
-import requests
-import os
-import cv2
+import time
 import numpy as np
-from io import BytesIO
 
 from tabulate import tabulate
 
+from Face_embeddings import (EmbeddingStore, person_embeddings, gallery_similarity_matrix,
+                             PRIMARY_MODEL, SECONDARY_MODEL)
+from Image_cache import ImageCache
+from Face_store import get_latest_run
+from Storage import get_storage
+from School_store import save_people
+from Ann_index import get_school_ann_index, ANN_MIN_PEOPLE, ANN_CANDIDATES
+
 # ייבוא פונקציות Cloudinary
 from Yolo_modle import get_school_faces_from_cloudinary, save_detected_match_to_cloudinary
 
@@ -42,14 +47,9 @@ def normalize_similarity_score(value):
 
 
 def download_image_to_memory(image_url):
-    """מוריד תמונה מ-URL ומחזיר אותה כ-OpenCV image בזיכרון"""
+    """טוען תמונה לפי URL (מהאחסון הפעיל) ומחזיר אותה כ-OpenCV image בזיכרון"""
     try:
-        response = requests.get(image_url, timeout=10)
-        if response.status_code == 200:
-            image_array = np.frombuffer(response.content, np.uint8)
-            img = cv2.imdecode(image_array, cv2.IMREAD_COLOR)
-            return img
-        return None
+        return get_storage().read_image(image_url)
     except Exception as e:
         print_status(f"שגיאה בהורדת תמונה: {str(e)}", emoji="❌", level=2)
         return None
@@ -101,100 +101,255 @@ def verify_face_secondary(img1, img2):
         return 0
 
 
-def check_single_image_with_detailed_analysis(person_image, faces_from_cloudinary, first_name, last_name, school_index,
-                                              person_id):
+def _report_progress(on_progress, stage, status, **details):
+    """מדווח על שלב בבדיקה (embed / match / persist) לצרכן ההתקדמות, אם יש"""
+    if on_progress is None:
+        return
+    try:
+        on_progress({'stage': stage, 'status': status, **details})
+    except Exception as e:
+        print_status(f"שגיאה בדיווח התקדמות: {str(e)}", emoji="⚠️", level=1)
+
+
+def load_school_faces(school_index):
+    """
+    מחזיר את פני המצלמות של בית הספר: מריצת החילוץ האחרונה בזיכרון אם יש, אחרת רשימה מ-Cloudinary
+
+    Returns:
+        tuple: (רשימת פנים, FaceRun או None)
+    """
+    face_run = get_latest_run(school_index)
+    if face_run is not None and face_run.faces:
+        print_status(f"משתמש בפנים מריצת החילוץ {face_run.run_id} (בזיכרון)", emoji="💾", level=1)
+        return face_run.faces, face_run
+
+    print_status("טוען פנים מ-Cloudinary...", emoji="☁️", level=1)
+    return get_school_faces_from_cloudinary(school_index), None
+
+
+def compute_attendance_matrix(school_index, people=None, faces_from_cloudinary=None, image_cache=None,
+                              face_embeddings=None, on_progress=None):
     """
-    גרסה מתקדמת של בדיקת תמונה בודדת עם ניתוח מפורט וטבלאות - עבודה בזיכרון בלבד
+    מחשב בבת אחת את מטריצות הדמיון (אנשים × פנים) לכל מודל, ואת כל החלטות הנוכחות
 
     Args:
-        person_image (numpy.ndarray): תמונת האדם בזיכרון
-        faces_from_cloudinary (list): רשימת פנים מ-Cloudinary
-        first_name (str): שם פרטי
-        last_name (str): שם משפחה
         school_index (int): מספר בית הספר
-        person_id (str): תעודת זהות
+        people (list, optional): אנשים לבדיקה (ברירת מחדל - כל אנשי בית הספר)
+        faces_from_cloudinary (list, optional): פנים מהמצלמות (ברירת מחדל - טעינה מ-Cloudinary)
+        image_cache (ImageCache, optional): קאש תמונות של הריצה (ברירת מחדל - קאש חדש)
+        face_embeddings (EmbeddingStore, optional): וקטורי פנים שכבר חושבו (ברירת מחדל - מאגר חדש)
+        on_progress (callable, optional): מקבל אירועי התקדמות לשלבי embed ו-match
 
     Returns:
-        bool: True אם נמצאה התאמה, False אחרת
+        dict: {'success': bool, 'people': [...], 'faces': [...], 'primary_scores': ndarray,
+               'secondary_scores': ndarray, 'final_scores': ndarray, 'definite_mask': ndarray,
+               'gray_zone_mask': ndarray, 'present': ndarray, 'best_face_index': ndarray,
+               'best_scores': ndarray, 'gallery_sizes': ndarray, 'row_by_person_id': dict, 'message': str}
     """
-    try:
-        print_status(f"מתחיל בדיקה מפורטת עבור {first_name} {last_name}", emoji="🔍", level=3)
-
-        # בדיקת תקינות התמונה
-        if person_image is None:
-            print_status(f"תמונת אדם לא תקינה", emoji="❌", level=3)
-            return False
+    is_valid, error_msg = validate_school_index(school_index)
+    if not is_valid:
+        return {'success': False, 'message': f"שגיאה באינדקס בית הספר: {error_msg}"}
+
+    school = schools_database[school_index]
+    if people is None:
+        people = school.people_vector
+    if faces_from_cloudinary is None:
+        faces_from_cloudinary, face_run = load_school_faces(school_index)
+        if face_run is not None:
+            if image_cache is None:
+                image_cache = ImageCache(face_run.load_image)
+            face_run.prime(image_cache)
+            face_embeddings = face_run.embeddings
+    if image_cache is None:
+        image_cache = ImageCache(download_image_to_memory)
+    if face_embeddings is None:
+        face_embeddings = EmbeddingStore()
+
+    # וקטורי הפנים מהמצלמות - פעם אחת לכל פנים בריצה
+    print_status("מחשב וקטורי פנים עבור הפנים מהמצלמות...", emoji="🧠", level=1)
+    _report_progress(on_progress, 'embed', 'started', faces=len(faces_from_cloudinary), people=len(people))
+    embed_start = time.perf_counter()
+    faces = []
+    face_vectors = []
+    for face_data in faces_from_cloudinary:
+        face_url = face_data['url']
+        vectors = face_embeddings.get(face_data['public_id'], lambda: image_cache.get(face_url))
+        if vectors is None:
+            print_status(f"אין וקטור פנים עבור: {face_data['filename']}", emoji="❌", level=2)
+            continue
+        faces.append(face_data)
+        face_vectors.append(vectors)
+    print_status(f"חושבו וקטורים עבור {len(faces)} פנים", emoji="✅", level=1)
+
+    # גלריית וקטורים לכל אדם - כל תמונות הרישום שלו, כל אחת מחושבת פעם אחת ונשמרת לפי URL
+    print_status("מחשב וקטורי פנים עבור האנשים...", emoji="🧠", level=1)
+    matrix_people = []
+    galleries = []
+    for person in people:
+        gallery = []
+        for image_url in person.image_urls:
+            vectors = person_embeddings.get(image_url, lambda: download_image_to_memory(image_url))
+            if vectors is not None:
+                gallery.append(vectors)
+        if not gallery:
+            if person.image_urls:
+                print_status(f"לא ניתן לחשב וקטור פנים עבור {person.first_name} {person.last_name}", emoji="❌",
+                             level=2)
+            continue
+        matrix_people.append(person)
+        galleries.append(gallery)
+
+    _report_progress(on_progress, 'embed', 'completed', faces=len(faces), people=len(matrix_people),
+                     seconds=round(time.perf_counter() - embed_start, 3))
+    _report_progress(on_progress, 'match', 'started')
+    match_start = time.perf_counter()
+
+    faces_matrices = {}
+    for model_name in (PRIMARY_MODEL, SECONDARY_MODEL):
+        if faces:
+            faces_matrices[model_name] = np.vstack([vectors[model_name] for vectors in face_vectors])
+        else:
+            faces_matrices[model_name] = np.zeros((0, 1), dtype=np.float32)
 
-        found_match = False
-        results = []  # רשימה לשמירת התוצאות להצגתן בטבלה
-        definite_matches = []  # התאמות ודאיות (מעל הסף)
-        gray_zone_matches = []  # התאמות באזור האפור
+    # ברירת מחדל: מכפלת טנזורים אחת לכל מודל (הוקטורים מנורמלים, ולכן זה דמיון קוסינוס) מול כל הגלריה.
+    # אינדקס ה-ANN רק אם הופעל במפורש (ATTENDME_ANN_MIN_PEOPLE) ובית הספר גדול מספיק
+    used_ann = bool(ANN_MIN_PEOPLE) and len(matrix_people) >= ANN_MIN_PEOPLE and bool(faces)
+    if used_ann:
+        scores = _ann_scores(school_index, matrix_people, galleries, faces_matrices)
+    else:
+        scores = {model_name: gallery_similarity_matrix(galleries, faces_matrices[model_name], model_name)
+                  for model_name in (PRIMARY_MODEL, SECONDARY_MODEL)}
 
-        print_status(f"בודק התאמה מול {len(faces_from_cloudinary)} תמונות ב-Cloudinary", emoji="🔍", level=3)
+    primary_scores = scores[PRIMARY_MODEL]
 
-        # בדיקה מול כל פנים מ-Cloudinary
-        for face_data in faces_from_cloudinary:
-            try:
-                face_filename = face_data['filename']
-                face_url = face_data['url']
+    # הציון השני נחשב רק כשהראשון עבר את הסף - בדיוק כמו בהשוואה הזוגית
+    passed_first = primary_scores >= FIRST_THRESHOLD
+    secondary_scores = np.where(passed_first, scores[SECONDARY_MODEL], 0)
+    final_scores = np.where(secondary_scores > 0, (primary_scores + secondary_scores) / 2, primary_scores)
 
-                print_status(f"בודק מול: {face_filename}", emoji="🔎", level=4)
+    definite_mask = passed_first & (secondary_scores >= SECOND_THRESHOLD)
+    gray_zone_mask = ~definite_mask & (primary_scores >= GRAY_ZONE_LOWER_THRESHOLD)
+    present = definite_mask.any(axis=1)
 
-                # הורדת תמונת הפנים מ-Cloudinary לזיכרון
-                face_image = download_image_to_memory(face_url)
-                if face_image is None:
-                    print_status(f"לא ניתן להוריד: {face_filename}", emoji="❌", level=4)
-                    continue
+    if faces:
+        best_face_index = primary_scores.argmax(axis=1)
+        best_scores = np.clip(primary_scores.max(axis=1), 0, 1)
+    else:
+        best_face_index = np.full(len(matrix_people), -1)
+        best_scores = np.zeros(len(matrix_people))
+
+    _report_progress(on_progress, 'match', 'completed', present=int(present.sum()), used_ann=used_ann,
+                     seconds=round(time.perf_counter() - match_start, 3))
+
+    return {
+        'success': True,
+        'people': matrix_people,
+        'faces': faces,
+        'primary_scores': primary_scores,
+        'secondary_scores': secondary_scores,
+        'final_scores': final_scores,
+        'definite_mask': definite_mask,
+        'gray_zone_mask': gray_zone_mask,
+        'present': present,
+        'best_face_index': best_face_index,
+        'best_scores': best_scores,
+        'gallery_sizes': np.array([len(gallery) for gallery in galleries], dtype=np.int32),
+        'row_by_person_id': {person.id_number: row for row, person in enumerate(matrix_people)},
+        'message': f"חושבה מטריצת דמיון {len(matrix_people)}×{len(faces)} "
+                   f"({sum(len(gallery) for gallery in galleries)} תמונות רישום)"
+    }
+
+
+def _ann_scores(school_index, matrix_people, galleries, faces_matrices):
+    """
+    ציונים בעזרת אינדקס ה-ANN של בית הספר: כל האנשים שהאינדקס החזיר כמועמדים מדורגים במדויק מול כל הפנים.
+    פנים שאף מועמד שלהן לא עבר את FIRST_THRESHOLD מדורגות מחדש מול כל הגלריה - כך אדם שהאינדקס פספס
+    לא נשאר עם ציון 0 ומסומן כנעדר.
 
-                # בדיקה ראשונה עם VGG-Face - ישירות בזיכרון
-                first_similarity = verify_face_primary(person_image, face_image)
-                print_status(f"בדיקה ראשונה (VGG-Face): {first_similarity:.3f}", level=4)
+    Returns:
+        dict: {שם מודל: מטריצת ציונים (אנשים × פנים)}
+    """
+    start_time = time.perf_counter()
+    school_ann = get_school_ann_index(school_index)
+    school_ann.sync({
+        person.id_number: np.vstack([vectors[PRIMARY_MODEL] for vectors in gallery])
+        for person, gallery in zip(matrix_people, galleries)
+    })
+
+    row_by_person_id = {person.id_number: row for row, person in enumerate(matrix_people)}
+    candidate_rows = sorted({row_by_person_id[person_id]
+                             for candidates in school_ann.index.search(faces_matrices[PRIMARY_MODEL], ANN_CANDIDATES)
+                             for person_id in candidates if person_id in row_by_person_id})
+
+    faces_count = len(faces_matrices[PRIMARY_MODEL])
+    scores = {}
+    for model_name in (PRIMARY_MODEL, SECONDARY_MODEL):
+        model_scores = np.zeros((len(matrix_people), faces_count), dtype=np.float32)
+        model_scores[candidate_rows] = gallery_similarity_matrix(
+            [galleries[row] for row in candidate_rows], faces_matrices[model_name], model_name)
+        scores[model_name] = model_scores
+
+    uncertain_columns = np.flatnonzero(scores[PRIMARY_MODEL].max(axis=0) < FIRST_THRESHOLD)
+    if len(uncertain_columns):
+        for model_name in (PRIMARY_MODEL, SECONDARY_MODEL):
+            scores[model_name][:, uncertain_columns] = gallery_similarity_matrix(
+                galleries, faces_matrices[model_name][uncertain_columns], model_name)
+
+    print_status(f"אינדקס ANN: {len(candidate_rows)} מועמדים מתוך {len(matrix_people)} אנשים, "
+                 f"{len(uncertain_columns)}/{faces_count} פנים דורגו מול כל הגלריה "
+                 f"({(time.perf_counter() - start_time) * 1000:.0f}ms)", emoji="⚡", level=1)
+    return scores
+
+
+def check_single_image_with_detailed_analysis(attendance_matrix, person_row, first_name, last_name, school_index,
+                                              person_id, image_cache=None):
+    """
+    גרסה מתקדמת של בדיקת תמונה בודדת עם ניתוח מפורט וטבלאות - קריאת שורה ממטריצת הדמיון
 
-                # בדיקה שנייה עם Facenet (רק אם עברנו את הסף הראשון)
-                second_similarity = 0
-                if first_similarity >= FIRST_THRESHOLD:
-                    second_similarity = verify_face_secondary(person_image, face_image)
-                    print_status(f"בדיקה שנייה (Facenet): {second_similarity:.3f}", level=4)
+    Args:
+        attendance_matrix (dict): תוצאת compute_attendance_matrix
+        person_row (int): שורת האדם במטריצה
+        first_name (str): שם פרטי
+        last_name (str): שם משפחה
+        school_index (int): מספר בית הספר
+        person_id (str): תעודת זהות
+        image_cache (ImageCache, optional): קאש תמונות של הריצה
 
-                # חישוב דמיון סופי
-                if second_similarity > 0:
-                    final_similarity = (first_similarity + second_similarity) / 2
-                else:
-                    final_similarity = first_similarity
-
-                # חלוקה לקטגוריות לפי ציון הדמיון
-                if first_similarity >= FIRST_THRESHOLD and second_similarity >= SECOND_THRESHOLD:
-                    # מקרה 1: התאמה ודאית (שתי הבדיקות עברו)
-                    status_icon = "✅"
-                    definite_matches.append(face_data)
-                    found_match = True
-                    print_status(f"התאמה ודאית נמצאה! {face_filename}", emoji="🎯", level=4)
-
-                elif first_similarity >= GRAY_ZONE_LOWER_THRESHOLD:
-                    # מקרה 2: באזור האפור, צריך בדיקה מעמיקה
-                    status_icon = "🔍"
-                    gray_zone_matches.append((face_data, first_similarity))
-                    print_status(f"באזור אפור: {face_filename} - {first_similarity:.3f}", emoji="🔍", level=4)
+    Returns:
+        dict: {'is_present': bool, 'matched_faces': [{'public_id', 'filename', 'primary_score',
+               'secondary_score', 'final_score'}], 'best_score': float}
+    """
+    try:
+        print_status(f"מתחיל בדיקה מפורטת עבור {first_name} {last_name}", emoji="🔍", level=3)
 
-                else:
-                    # מקרה 3: מתחת לסף
-                    status_icon = "❌"
-                    print_status(f"מתחת לסף: {face_filename} - {first_similarity:.3f}", emoji="❌", level=4)
-
-                # הוסף את הנתונים לרשימת התוצאות (בסדר הנכון - מימין לשמאל בעברית)
-                results.append([
-                    f"{person_id}",
-                    face_filename,
-                    f"{normalize_similarity_score(first_similarity):.3f}",
-                    f"{normalize_similarity_score(second_similarity):.3f}",
-                    f"{normalize_similarity_score(final_similarity):.3f}",
-                    status_icon
-                ])
-
-            except Exception as face_error:
-                print_status(f"שגיאה בבדיקת פנים {face_data.get('filename', 'לא ידוע')}: {str(face_error)}", emoji="⚠️",
-                             level=4)
-                continue
+        faces = attendance_matrix['faces']
+        primary_row = attendance_matrix['primary_scores'][person_row]
+        secondary_row = attendance_matrix['secondary_scores'][person_row]
+        final_row = attendance_matrix['final_scores'][person_row]
+        definite_row = attendance_matrix['definite_mask'][person_row]
+        gray_zone_row = attendance_matrix['gray_zone_mask'][person_row]
+
+        found_match = bool(attendance_matrix['present'][person_row])
+        definite_columns = np.flatnonzero(definite_row)
+        definite_matches = [faces[col] for col in definite_columns]
+        best_score = float(attendance_matrix['best_scores'][person_row])
+        gray_zone_matches = [(faces[col], float(primary_row[col])) for col in np.flatnonzero(gray_zone_row)]
+
+        print_status(f"בודק התאמה מול {len(faces)} תמונות ב-Cloudinary", emoji="🔍", level=3)
+
+        # טבלת תוצאות (בסדר הנכון - מימין לשמאל בעברית)
+        status_icons = np.where(definite_row, "✅", np.where(gray_zone_row, "🔍", "❌"))
+        results = [
+            [
+                f"{person_id}",
+                face_data['filename'],
+                f"{normalize_similarity_score(float(primary_row[col])):.3f}",
+                f"{normalize_similarity_score(float(secondary_row[col])):.3f}",
+                f"{normalize_similarity_score(float(final_row[col])):.3f}",
+                status_icons[col]
+            ]
+            for col, face_data in enumerate(faces)
+        ]
 
         # הדפסת טבלת תוצאות
         if results:
@@ -216,16 +371,25 @@ def check_single_image_with_detailed_analysis(person_image, faces_from_cloudinar
 
                 # שמירת כל הפנים מהמצלמה שהתאימו
                 saved_count = 0
-                for face_index, matched_face in enumerate(definite_matches):
-                    # הורדת הפנים מהמצלמה שהתאימו
-                    camera_face_image = download_image_to_memory(matched_face['url'])
+                for face_index, (col, matched_face) in enumerate(zip(definite_columns, definite_matches)):
+                    # הפנים מהמצלמה שהתאימו - מהקאש של הריצה
+                    if image_cache is not None:
+                        camera_face_image = image_cache.get(matched_face['url'])
+                    else:
+                        camera_face_image = download_image_to_memory(matched_face['url'])
                     if camera_face_image is not None:
                         success = save_detected_match_to_cloudinary(
                             camera_face_image,  # פנים מהמצלמה
                             school_index,
                             first_name,
                             last_name,
-                            f"{person_id}_{face_index + 1}"  # הוסף מספר סידורי למקרה של כמה התאמות
+                            person_id,
+                            match_number=face_index + 1,  # מספר סידורי למקרה של כמה התאמות
+                            scores={
+                                'primary_score': float(primary_row[col]),
+                                'secondary_score': float(secondary_row[col]),
+                                'final_score': float(final_row[col])
+                            }
                         )
 
                         if success:
@@ -243,34 +407,51 @@ def check_single_image_with_detailed_analysis(person_image, faces_from_cloudinar
             print_status(f"סיכום: נמצאו {len(definite_matches)} התאמות ודאיות עבור {first_name} {last_name}", emoji="✅",
                          level=3)
         else:
-            best_score = max([float(r[2]) for r in results]) if results else 0
             print_status(f"סיכום: לא נמצאה התאמה עבור {first_name} {last_name} (ציון הטוב ביותר: {best_score:.3f})",
                          emoji="❓", level=3)
 
-        return found_match
+        # תוצאה מובנית - הפנים שהתאימו וציוניהן, כדי שלא יהיה צורך לבדוק אותן שוב
+        matched_faces = [
+            {
+                'public_id': faces[col]['public_id'],
+                'filename': faces[col]['filename'],
+                'primary_score': float(primary_row[col]),
+                'secondary_score': float(secondary_row[col]),
+                'final_score': float(final_row[col])
+            }
+            for col in definite_columns
+        ]
+
+        return {
+            'is_present': found_match,
+            'matched_faces': matched_faces,
+            'best_score': best_score
+        }
 
     except Exception as e:
         print_status(f"שגיאה בבדיקת תמונה: {str(e)}", emoji="❌", level=3)
-        return False
+        return {'is_present': False, 'matched_faces': [], 'best_score': 0.0}
 
 
 # הוסף את השורה הזו בתחילת הקובץ Face_comparison.py (עם הייבואים)
 from Yolo_modle import save_unidentified_faces_after_attendance
 
 
-def check_attendance_unified(school_index, is_specific_check=False, person_ids=None):
+def check_attendance_unified(school_index, is_specific_check=False, person_ids=None, on_progress=None):
     """
     פונקציה מאוחדת לבדיקת נוכחות - כללית או ספציפית - עבודה בזיכרון בלבד
-    משווה את התמונה הראשית של כל אדם מול פנים ב-Cloudinary
+    משווה את גלריית תמונות הרישום של כל אדם מול פנים ב-Cloudinary
     *** מעקב על פנים מזוהים ושמירת לא מזוהים ***
 
     Args:
         school_index (int): מספר בית הספר במערכת
         is_specific_check (bool): True = בדיקה ספציפית, False = בדיקה כללית
         person_ids (list, optional): רשימת תעודות זהות (נדרש רק אם is_specific_check=True)
+        on_progress (callable, optional): מקבל אירועי התקדמות לשלבי embed, match ו-persist
 
     Returns:
-        dict: {'success': bool, 'checked_people': int, 'present_people': int, 'absent_people': int, 'message': str, 'school_name': str}
+        dict: {'success': bool, 'checked_people': int, 'present_people': int, 'absent_people': int, 'message': str, 'school_name': str,
+               'unknown_person_ids': list - תעודות זהות מהבקשה שלא קיימות בבית הספר}
     """
     try:
         # בדיקת תקינות האינדקס
@@ -304,7 +485,7 @@ def check_attendance_unified(school_index, is_specific_check=False, person_ids=N
         # הדפסת הודעת התחלה לפי סוג הבדיקה
         if is_specific_check:
             print_status(f"מתחיל בדיקת נוכחות ספציפית עבור בית הספר: {school.school_name}", emoji="🚀")
-            print_status(f"תעודות זהות לבדיקה: {', '.join(person_ids)}", emoji="🎯", level=1)
+            print_status(f"תעודות זהות לבדיקה: {', '.join(map(str, person_ids))}", emoji="🎯", level=1)
         else:
             print_status(f"מתחיל בדיקת נוכחות כללית עבור בית הספר: {school.school_name}", emoji="🚀")
 
@@ -320,12 +501,14 @@ def check_attendance_unified(school_index, is_specific_check=False, person_ids=N
             }
 
         # קביעת רשימת האנשים לבדיקה
+        unknown_person_ids = []
         if is_specific_check:
-            # סינון האנשים לפי תעודות הזהות הנבחרות
-            people_to_check = []
-            for person in people_vector:
-                if person.id_number in person_ids:
-                    people_to_check.append(person)
+            # האנשים הנבחרים נשלפים מאינדקס תעודות הזהות של בית הספר
+            people_to_check, unknown_person_ids = school.get_people(person_ids)
+
+            if unknown_person_ids:
+                print_status(f"תעודות זהות שלא נמצאו בבית הספר: {', '.join(map(str, unknown_person_ids))}", emoji="⚠️",
+                             level=1)
 
             # בדיקה שנמצאו אנשים תואמים
             if not people_to_check:
@@ -334,6 +517,7 @@ def check_attendance_unified(school_index, is_specific_check=False, person_ids=N
                     'checked_people': 0,
                     'present_people': 0,
                     'absent_people': 0,
+                    'unknown_person_ids': unknown_person_ids,
                     'message': f'לא נמצאו אנשים עם תעודות הזהות שנבחרו בבית הספר {school.school_name}',
                     'school_name': school.school_name
                 }
@@ -344,9 +528,8 @@ def check_attendance_unified(school_index, is_specific_check=False, person_ids=N
             people_to_check = people_vector
             print_status(f"בודק נוכחות עבור {len(people_to_check)} אנשים", emoji="👥", level=1)
 
-        # טעינת פנים מ-Cloudinary
-        print_status("טוען פנים מ-Cloudinary...", emoji="☁️", level=1)
-        faces_from_cloudinary = get_school_faces_from_cloudinary(school_index)
+        # פני המצלמות - מריצת החילוץ בזיכרון, או מ-Cloudinary אם החילוץ רץ בתהליך אחר
+        faces_from_cloudinary, face_run = load_school_faces(school_index)
 
         if not faces_from_cloudinary:
             return {
@@ -358,11 +541,34 @@ def check_attendance_unified(school_index, is_specific_check=False, person_ids=N
                 'school_name': school.school_name
             }
 
-        print_status(f"נמצאו {len(faces_from_cloudinary)} פנים ב-Cloudinary של {school.school_name}", emoji="📊",
-                     level=1)
+        print_status(f"נמצאו {len(faces_from_cloudinary)} פנים של {school.school_name}", emoji="📊", level=1)
+
+        # קאש תמונות לריצה - כל פנים מהמצלמה יורדות פעם אחת בלבד (ופנים מהזיכרון לא יורדות כלל)
+        # פנים של ריצה מהזיכרון נטענות דרך הריצה - אף פעם לא מה-URL הקבוע שעלול להחזיק חיתוך ישן ב-CDN
+        image_cache = ImageCache(face_run.load_image if face_run is not None else download_image_to_memory)
+        face_embeddings = None
+        if face_run is not None:
+            face_run.prime(image_cache)
+            face_embeddings = face_run.embeddings
+
+        # חישוב כל ציוני הדמיון בבת אחת - מטריצה של אנשים × פנים לכל מודל
+        attendance_matrix = compute_attendance_matrix(school_index, people_to_check, faces_from_cloudinary,
+                                                      image_cache, face_embeddings, on_progress)
+        if not attendance_matrix['success']:
+            return {
+                'success': False,
+                'checked_people': 0,
+                'present_people': 0,
+                'absent_people': 0,
+                'message': attendance_matrix['message'],
+                'school_name': school.school_name
+            }
+        print_status(attendance_matrix['message'], emoji="📊", level=1)
 
         # 👈 🆕 מעקב על פנים מזוהים
         identified_faces = set()
+        _report_progress(on_progress, 'persist', 'started', people=len(people_to_check))
+        persist_start = time.perf_counter()
 
         # מונים
         checked_people = 0
@@ -385,46 +591,32 @@ def check_attendance_unified(school_index, is_specific_check=False, person_ids=N
                     checked_people += 1
                     continue
 
-                # קבלת התמונה הראשית (הראשונה ברשימה)
-                primary_image_url = person.image_urls[0]
-
-                # הורדת התמונה לזיכרון
-                print_status(f"מוריד תמונה לזיכרון: {person.first_name} {person.last_name}", emoji="📥", level=2)
-
-                person_image = download_image_to_memory(primary_image_url)
-                if person_image is None:
-                    print_status(f"לא ניתן להוריד תמונה עבור {person.first_name} {person.last_name}", emoji="❌",
+                # שורת האדם במטריצה (חסרה אם לא ניתן היה לחשב וקטור פנים)
+                person_row = attendance_matrix['row_by_person_id'].get(person.id_number)
+                if person_row is None:
+                    print_status(f"לא ניתן לחשב וקטור פנים עבור {person.first_name} {person.last_name}", emoji="❌",
                                  level=2)
                     person.set_presence(False)
                     checked_people += 1
                     continue
 
-                print_status(f"תמונה נטענה לזיכרון בהצלחה", emoji="💾", level=3)
-
-                # בדיקת נוכחות באמצעות הפונקציה המתקדמת - עבודה בזיכרון
-                is_present = check_single_image_with_detailed_analysis(
-                    person_image,
-                    faces_from_cloudinary,
+                # בדיקת נוכחות באמצעות הפונקציה המתקדמת - קריאת שורה מהמטריצה
+                check_result = check_single_image_with_detailed_analysis(
+                    attendance_matrix,
+                    person_row,
                     person.first_name,
                     person.last_name,
                     school_index,
-                    person.id_number
+                    person.id_number,
+                    image_cache
                 )
 
-                # 👈 🆕 אם נמצאה התאמה - עדכן מעקב פנים מזוהים
-                if is_present:
-                    # מצא איזה פנים התאימו לאדם הזה
-                    for face_data in faces_from_cloudinary:
-                        # בדוק שוב איזה פנים התאימו (פשטות - נבדוק שוב מהר)
-                        face_image = download_image_to_memory(face_data['url'])
-                        if face_image is not None:
-                            first_similarity = verify_face_primary(person_image, face_image)
-                            if first_similarity >= FIRST_THRESHOLD:
-                                second_similarity = verify_face_secondary(person_image, face_image)
-                                if second_similarity >= SECOND_THRESHOLD:
-                                    # זה פנים שזוהה!
-                                    identified_faces.add(face_data['filename'])
-                                    print_status(f"פנים {face_data['filename']} סומן כמזוהה", emoji="✅", level=4)
+                is_present = check_result['is_present']
+
+                # 👈 🆕 אם נמצאה התאמה - הפנים שהתאימו כבר מופיעים בתוצאה, בלי בדיקה נוספת
+                for matched_face in check_result['matched_faces']:
+                    identified_faces.add(matched_face['filename'])
+                    print_status(f"פנים {matched_face['filename']} סומן כמזוהה", emoji="✅", level=4)
 
                 # עדכון סטטוס נוכחות
                 person.set_presence(is_present)
@@ -445,13 +637,23 @@ def check_attendance_unified(school_index, is_specific_check=False, person_ids=N
                 checked_people += 1
                 continue
 
+        # סטטוס הנוכחות וזמן הבדיקה של כל הנבדקים נשמרים במאגר בטרנזקציה אחת
+        save_people(school_index, people_to_check)
+
         # 👈 🆕 שמירת פנים לא מזוהים
         print_status("=" * 30, level=0)
         print_status(f"מעבד פנים לא מזוהים...", emoji="🔍", level=0)
         unidentified_count = save_unidentified_faces_after_attendance(school_index, faces_from_cloudinary,
-                                                                      identified_faces)
+                                                                      identified_faces, image_cache)
+
+        cache_stats = image_cache.get_stats()
+        print_status(f"קאש תמונות: {cache_stats['misses']} הורדות, {cache_stats['hits']} שימושים חוזרים",
+                     emoji="💾", level=1)
 
         print_status(f"נמצאו {len(identified_faces)} פנים מזוהים", emoji="✅", level=1)
+        _report_progress(on_progress, 'persist', 'completed', present=present_people,
+                         absent=checked_people - present_people, unidentified_faces=unidentified_count,
+                         seconds=round(time.perf_counter() - persist_start, 3))
         print_status(f"נשמרו {unidentified_count} פנים לא מזוהים", emoji="❓", level=1)
 
         # סיכום כולל
@@ -459,6 +661,8 @@ def check_attendance_unified(school_index, is_specific_check=False, person_ids=N
         check_type = "ספציפית" if is_specific_check else "כללית"
         additional_text = "נבחרים" if is_specific_check else "אנשים"
         success_message = f"בדיקת נוכחות {check_type} הושלמה עבור {school.school_name}: {present_people} נוכחים, {absent_people} נעדרים מתוך {checked_people} {additional_text}"
+        if unknown_person_ids:
+            success_message += f" ({len(unknown_person_ids)} תעודות זהות לא נמצאו)"
 
         print_status("=" * 50, level=0)
         print_status(f"סיכום בדיקת נוכחות {check_type} - {school.school_name}:", emoji="📋", level=0)
@@ -476,6 +680,7 @@ def check_attendance_unified(school_index, is_specific_check=False, person_ids=N
             'absent_people': absent_people,
             'identified_faces': len(identified_faces),  # 👈 חדש
             'unidentified_faces': unidentified_count,  # 👈 חדש
+            'unknown_person_ids': unknown_person_ids,
             'message': success_message,
             'school_name': school.school_name
         }
@@ -0,0 +1,205 @@
+import os
+import time
+import threading
+import cv2
+import numpy as np
+from ultralytics import YOLO
+
+# נתיב מודל הפנים המקומי, ומודלים חלופיים אם הוא לא קיים
+FACE_MODEL_PATH = "face_yolov8n.pt"
+FALLBACK_MODEL_NAMES = ('yolov8n-face.pt', 'yolov8n.pt')
+
+# זיהוי באצוות: כמה תמונות בכל קריאה למודל, ולאיזה גודל אחיד הן מרופדות
+YOLO_BATCH_SIZE = int(os.getenv('ATTENDME_YOLO_BATCH_SIZE', '8'))
+YOLO_INPUT_SIZE = 640
+LETTERBOX_COLOR = (114, 114, 114)
+
+_yolo_model = None
+_yolo_lock = threading.Lock()
+_load_seconds = None
+
+# predict של ultralytics משתמש במצב פנימי משותף (predictor) ואינו thread-safe - קריאה אחת למודל בכל רגע
+_inference_lock = threading.Lock()
+
+
+def print_status(message, emoji="ℹ️", level=0):
+    """פונקציה להדפסת סטטוס עם רמות הזחה - בלי כפילות"""
+    indent = "  " * level
+    log_message = f"{indent}{emoji} {message}"
+    print(log_message)
+
+
+def _load_yolo_model():
+    """טוען את מודל ה-YOLO לפנים - קובץ מקומי אם קיים, אחרת מודל חלופי"""
+    if os.path.exists(FACE_MODEL_PATH):
+        print_status(f"נמצא מודל פנים מקומי", emoji="📁")
+        return YOLO(FACE_MODEL_PATH)
+
+    print_status("מודל פנים לא נמצא, מוריד מודל ספציפי לזיהוי פנים...", emoji="📥")
+    last_error = None
+    for model_name in FALLBACK_MODEL_NAMES:
+        try:
+            return YOLO(model_name)
+        except Exception as e:
+            last_error = e
+            print_status(f"לא ניתן לטעון {model_name}, מנסה מודל הבא...", emoji="🔄")
+    raise last_error
+
+
+def get_yolo_model():
+    """
+    מחזיר את מודל ה-YOLO המשותף לכל התהליך - נטען בפעם הראשונה בלבד (thread-safe)
+
+    Returns:
+        YOLO: המודל הטעון
+    """
+    global _yolo_model, _load_seconds
+
+    if _yolo_model is not None:
+        return _yolo_model
+
+    with _yolo_lock:
+        if _yolo_model is None:
+            start_time = time.perf_counter()
+            model = _load_yolo_model()
+            _load_seconds = time.perf_counter() - start_time
+            _yolo_model = model
+            print_status(f"מודל YOLO נטען בהצלחה ({_load_seconds:.1f}s)", emoji="✅")
+
+    return _yolo_model
+
+
+def run_yolo(source, **kwargs):
+    """
+    מריץ את מודל ה-YOLO המשותף על תמונה או רשימת תמונות, קריאה אחת בכל פעם (thread-safe)
+
+    Returns:
+        list: תוצאות ultralytics (Results) לכל תמונה
+    """
+    yolo_model = get_yolo_model()
+    with _inference_lock:
+        return yolo_model(source, **kwargs)
+
+
+def warm_up_yolo(run_inference=True):
+    """טוען את המודל מראש, ואופציונלית מריץ זיהוי על תמונה ריקה כדי לאתחל את המנוע"""
+    try:
+        get_yolo_model()
+        if run_inference:
+            run_yolo(np.zeros((640, 640, 3), dtype=np.uint8), verbose=False)
+        return True
+    except Exception as e:
+        print_status(f"שגיאה בטעינת מודל YOLO: {str(e)}", emoji="❌")
+        return False
+
+
+def get_yolo_status():
+    """מצב מודל ה-YOLO לבדיקת בריאות"""
+    return {
+        'loaded': _yolo_model is not None,
+        'load_seconds': round(_load_seconds, 2) if _load_seconds is not None else None
+    }
+
+
+def letterbox(image, size=YOLO_INPUT_SIZE):
+    """
+    משנה גודל תמונה לריבוע size×size תוך שמירת יחס, עם ריפוד
+
+    Returns:
+        tuple: (תמונה מרופדת, יחס הקטנה, (ריפוד x, ריפוד y))
+    """
+    height, width = image.shape[:2]
+    scale = min(size / height, size / width)
+    new_width, new_height = int(round(width * scale)), int(round(height * scale))
+
+    resized = cv2.resize(image, (new_width, new_height), interpolation=cv2.INTER_LINEAR)
+    pad_x = (size - new_width) // 2
+    pad_y = (size - new_height) // 2
+
+    padded = np.full((size, size, 3), LETTERBOX_COLOR, dtype=np.uint8)
+    padded[pad_y:pad_y + new_height, pad_x:pad_x + new_width] = resized
+    return padded, scale, (pad_x, pad_y)
+
+
+def _boxes_to_original(boxes, scale, padding, image_shape):
+    """ממפה תיבות מקואורדינטות התמונה המרופדת חזרה לתמונה המקורית"""
+    pad_x, pad_y = padding
+    height, width = image_shape[:2]
+    boxes = (boxes - np.array([pad_x, pad_y, pad_x, pad_y], dtype=np.float32)) / scale
+    boxes[:, [0, 2]] = boxes[:, [0, 2]].clip(0, width)
+    boxes[:, [1, 3]] = boxes[:, [1, 3]].clip(0, height)
+    return boxes.astype(int)
+
+
+def detect_faces_batch(images, batch_size=YOLO_BATCH_SIZE, input_size=YOLO_INPUT_SIZE):
+    """
+    מזהה פנים בכמה תמונות באצוות: כל התמונות מרופדות לגודל אחיד ועוברות במודל יחד
+
+    Args:
+        images (list): תמונות OpenCV
+        batch_size (int): מספר תמונות בכל קריאה למודל
+        input_size (int): הגודל האחיד (ריבוע) שאליו מרופדות התמונות
+
+    Returns:
+        list: לכל תמונה - מערך תיבות (N × 4) של x1, y1, x2, y2 בקואורדינטות המקוריות
+    """
+    all_boxes = []
+
+    for batch_start in range(0, len(images), batch_size):
+        batch_images = images[batch_start:batch_start + batch_size]
+        letterboxed = [letterbox(image, input_size) for image in batch_images]
+
+        results = run_yolo([padded for padded, _, _ in letterboxed], imgsz=input_size, verbose=False)
+
+        for image, (_, scale, padding), result in zip(batch_images, letterboxed, results):
+            if not hasattr(result, 'boxes') or result.boxes is None or len(result.boxes) == 0:
+                all_boxes.append(np.zeros((0, 4), dtype=int))
+                continue
+            boxes = result.boxes.xyxy.cpu().numpy().astype(np.float32)
+            all_boxes.append(_boxes_to_original(boxes, scale, padding, image.shape))
+
+    return all_boxes
+
+
+def benchmark_batched_inference(images, batch_size=YOLO_BATCH_SIZE, repeats=3):
+    """
+    משווה זיהוי תמונה-אחר-תמונה מול זיהוי באצוות (על המעבד הנוכחי)
+
+    Returns:
+        dict: זמנים ותפוקה (תמונות לשנייה) לכל שיטה
+    """
+    warm_up_yolo(run_inference=True)
+
+    start_time = time.perf_counter()
+    for _ in range(repeats):
+        for image in images:
+            run_yolo(image, verbose=False)
+    per_image_seconds = (time.perf_counter() - start_time) / repeats
+
+    start_time = time.perf_counter()
+    for _ in range(repeats):
+        detect_faces_batch(images, batch_size=batch_size)
+    batched_seconds = (time.perf_counter() - start_time) / repeats
+
+    return {
+        'images': len(images),
+        'batch_size': batch_size,
+        'per_image_seconds': per_image_seconds,
+        'batched_seconds': batched_seconds,
+        'per_image_fps': len(images) / per_image_seconds if per_image_seconds else 0,
+        'batched_fps': len(images) / batched_seconds if batched_seconds else 0
+    }
+
+
+if __name__ == '__main__':
+    from tabulate import tabulate
+
+    rng = np.random.default_rng(0)
+    frames = [rng.integers(0, 255, size=(720, 1280, 3), dtype=np.uint8) for _ in range(32)]
+
+    rows = []
+    for batch_size in (1, 4, 8, 16):
+        result = benchmark_batched_inference(frames, batch_size=batch_size)
+        rows.append([batch_size, f"{result['per_image_fps']:.1f}", f"{result['batched_fps']:.1f}",
+                     f"{result['per_image_seconds'] / result['batched_seconds']:.2f}x"])
+    print(tabulate(rows, headers=["batch size", "per-image fps", "batched fps", "speedup"], tablefmt="grid"))
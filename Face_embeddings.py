@@ -0,0 +1,174 @@
+from deepface import DeepFace
+import numpy as np
+
+import Enrollment_cache
+from Model_registry import get_model, DETECTOR_BACKEND
+
+# מודלים לחישוב וקטורי פנים - אותם מודלים ששימשו ב-DeepFace.verify
+PRIMARY_MODEL = 'VGG-Face'
+SECONDARY_MODEL = 'Facenet'
+EMBEDDING_MODELS = (PRIMARY_MODEL, SECONDARY_MODEL)
+
+# כמה תמונות מהגלריה של אדם משתתפות בציון (1 = התמונה הדומה ביותר, יותר = ממוצע top-k מחמיר)
+GALLERY_TOP_K = 1
+
+
+def print_status(message, emoji="ℹ️", level=0):
+    """פונקציה להדפסת סטטוס עם רמות הזחה - בלי כפילות"""
+    indent = "  " * level
+    log_message = f"{indent}{emoji} {message}"
+    print(log_message)
+
+
+def compute_embedding(image, model_name):
+    """
+    מחשב וקטור פנים מנורמל (אורך 1) עבור תמונה בזיכרון
+
+    Args:
+        image (numpy.ndarray): תמונת OpenCV
+        model_name (str): שם המודל ב-DeepFace
+
+    Returns:
+        numpy.ndarray: וקטור מנורמל, או None אם החישוב נכשל
+    """
+    try:
+        if image is None:
+            return None
+
+        # המודל טעון פעם אחת לתהליך (בדרך כלל כבר בעליית ה-worker)
+        get_model(model_name)
+
+        representations = DeepFace.represent(
+            img_path=image,
+            model_name=model_name,
+            enforce_detection=False,
+            detector_backend=DETECTOR_BACKEND,
+            align=True
+        )
+        if not representations:
+            return None
+
+        vector = np.asarray(representations[0]['embedding'], dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        if norm == 0:
+            return None
+        return vector / norm
+
+    except Exception as e:
+        print_status(f"שגיאה בחישוב וקטור פנים ({model_name}): {str(e)}", emoji="⚠️", level=2)
+        return None
+
+
+def compute_embeddings(image):
+    """מחשב וקטורים לכל המודלים. מחזיר מילון {שם מודל: וקטור} או None אם חסר וקטור"""
+    embeddings = {}
+    for model_name in EMBEDDING_MODELS:
+        vector = compute_embedding(image, model_name)
+        if vector is None:
+            return None
+        embeddings[model_name] = vector
+    return embeddings
+
+
+def gallery_similarity_matrix(galleries, faces_matrix, model_name, top_k=GALLERY_TOP_K):
+    """
+    מחשב ציון דמיון (אנשים × פנים) מול גלריית התמונות של כל אדם, בפעולה וקטורית אחת
+
+    Args:
+        galleries (list): לכל אדם - רשימת מילוני וקטורים {שם מודל: וקטור}, לפחות אחד
+        faces_matrix (numpy.ndarray): וקטורי הפנים מהמצלמות (פנים × מימד)
+        model_name (str): המודל שעבורו מחושב הציון
+        top_k (int): ממוצע של k התמונות הדומות ביותר בגלריה (1 = מקסימום)
+
+    Returns:
+        numpy.ndarray: מטריצת ציונים (אנשים × פנים)
+    """
+    people_count = len(galleries)
+    faces_count = faces_matrix.shape[0]
+    if people_count == 0 or faces_count == 0:
+        return np.zeros((people_count, faces_count), dtype=np.float32)
+
+    # טנזור מרופד (אנשים × תמונות בגלריה × מימד) עם מסכה לתמונות קיימות
+    max_gallery = max(len(gallery) for gallery in galleries)
+    gallery_tensor = np.zeros((people_count, max_gallery, faces_matrix.shape[1]), dtype=np.float32)
+    gallery_mask = np.zeros((people_count, max_gallery), dtype=bool)
+    for row, gallery in enumerate(galleries):
+        gallery_tensor[row, :len(gallery)] = np.vstack([vectors[model_name] for vectors in gallery])
+        gallery_mask[row, :len(gallery)] = True
+
+    # דמיון כל תמונה בגלריה מול כל פנים: (אנשים × גלריה × פנים), מיון יורד לאורך הגלריה
+    similarities = gallery_tensor @ faces_matrix.T
+    similarities = np.where(gallery_mask[:, :, None], similarities, -np.inf)
+    similarities = -np.sort(-similarities, axis=1)
+
+    # ממוצע של top-k, כאשר k מוגבל לגודל הגלריה של כל אדם
+    top_k = min(top_k, max_gallery)
+    k_per_person = np.minimum(gallery_mask.sum(axis=1), top_k)
+    top_similarities = similarities[:, :top_k, :]
+    valid = np.arange(top_k)[None, :] < k_per_person[:, None]
+    top_similarities = np.where(valid[:, :, None], top_similarities, 0)
+    return top_similarities.sum(axis=1) / k_per_person[:, None]
+
+
+class EmbeddingStore:
+    """
+    מאגר וקטורי פנים בזיכרון לפי מפתח - כל תמונה עוברת את המודלים פעם אחת בלבד.
+    משמש לפנים מהמצלמות בריצה אחת, עם ה-public_id כמפתח.
+    """
+
+    def __init__(self):
+        self._embeddings = {}
+
+    def get(self, key, image_loader):
+        """
+        מחזיר את הוקטורים של המפתח; בפעם הראשונה טוען את התמונה דרך image_loader ומחשב
+
+        Args:
+            key (str): מפתח התמונה
+            image_loader (callable): פונקציה ללא פרמטרים שמחזירה את התמונה בזיכרון
+
+        Returns:
+            dict: {שם מודל: וקטור} או None אם לא ניתן לחשב
+        """
+        if key in self._embeddings:
+            return self._embeddings[key]
+
+        image = image_loader()
+        embeddings = compute_embeddings(image) if image is not None else None
+
+        # שמירה רק של הצלחות - כישלון הורדה זמני ינוסה שוב בפעם הבאה
+        if embeddings is not None:
+            self._embeddings[key] = embeddings
+        return embeddings
+
+    def clear(self):
+        self._embeddings.clear()
+
+    def __len__(self):
+        return len(self._embeddings)
+
+    def __contains__(self, key):
+        return key in self._embeddings
+
+
+class PersonEmbeddingStore:
+    """
+    מאגר וקטורים לתמונות רישום, מעל הקאש המקומי (זיכרון + דיסק) של Enrollment_cache.
+    בריצה "חמה" אין גישה לרשת עבור אנשים רשומים - הכל נקרא מהקאש.
+    """
+
+    def get(self, image_url, image_loader):
+        """מחזיר וקטורים מהקאש, או מוריד את התמונה פעם אחת, מחשב ושומר"""
+        embeddings = Enrollment_cache.load_embeddings(image_url, EMBEDDING_MODELS)
+        if embeddings is not None:
+            return embeddings
+
+        image = image_loader()
+        embeddings = compute_embeddings(image) if image is not None else None
+        if embeddings is not None:
+            Enrollment_cache.save_entry(image_url, embeddings)
+        return embeddings
+
+
+# מאגר וקטורים של תמונות רישום - משותף לכל הבדיקות בתהליך ונשמר בין הפעלות
+person_embeddings = PersonEmbeddingStore()
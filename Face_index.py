@@ -0,0 +1,205 @@
+import os
+import sqlite3
+import threading
+from datetime import datetime, timezone
+
+# אינדקס מקומי של כל תמונה שהמערכת שומרת (פנים מהמצלמות, התאמות, פנים לא מזוהים)
+FACE_INDEX_PATH = os.getenv('ATTENDME_FACE_INDEX_PATH',
+                            os.path.join(os.path.dirname(os.path.abspath(__file__)), 'face_index.sqlite3'))
+
+KIND_FACE = 'face'
+KIND_MATCH = 'match'
+KIND_UNKNOWN = 'unknown'
+GALLERY_KINDS = (KIND_MATCH, KIND_UNKNOWN)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS stored_images (
+    public_id TEXT PRIMARY KEY,
+    school_index INTEGER NOT NULL,
+    kind TEXT NOT NULL,
+    camera_number INTEGER,
+    person_id TEXT,
+    first_name TEXT,
+    last_name TEXT,
+    primary_score REAL,
+    secondary_score REAL,
+    final_score REAL,
+    url TEXT NOT NULL,
+    run_id TEXT,
+    created_at TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_stored_images_gallery ON stored_images (school_index, kind, created_at DESC);
+CREATE TABLE IF NOT EXISTS backfilled_schools (
+    school_index INTEGER PRIMARY KEY,
+    backfilled_at TEXT NOT NULL
+);
+"""
+
+_COLUMNS = ('public_id', 'school_index', 'kind', 'camera_number', 'person_id', 'first_name', 'last_name',
+            'primary_score', 'secondary_score', 'final_score', 'url', 'run_id', 'created_at')
+
+_connection = None
+# התהליך שפתח את החיבור - חיבור SQLite לא עובר fork (ה-master של --preload, workers שמוחלפים ב---max-requests)
+_connection_pid = None
+_lock = threading.Lock()
+
+
+def print_status(message, emoji="ℹ️", level=0):
+    """פונקציה להדפסת סטטוס עם רמות הזחה - בלי כפילות"""
+    indent = "  " * level
+    log_message = f"{indent}{emoji} {message}"
+    print(log_message)
+
+
+def _get_connection():
+    """
+    חיבור SQLite משותף לתהליך (נפתח בשימוש הראשון), במצב WAL כדי שקוראים לא יחכו לכותבים.
+    תהליך שנוצר ב-fork פותח חיבור משלו ולא ממשיך להשתמש בחיבור שירש מהתהליך שיצר אותו.
+    """
+    global _connection, _connection_pid
+    if _connection is None or _connection_pid != os.getpid():
+        directory = os.path.dirname(FACE_INDEX_PATH)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        connection = sqlite3.connect(FACE_INDEX_PATH, check_same_thread=False, timeout=30)
+        connection.row_factory = sqlite3.Row
+        connection.execute('PRAGMA journal_mode=WAL')
+        connection.executescript(_SCHEMA)
+        _connection = connection
+        _connection_pid = os.getpid()
+    return _connection
+
+
+def now_timestamp():
+    """חותמת זמן באותו פורמט כמו created_at של Cloudinary"""
+    return datetime.now(timezone.utc).strftime('%Y-%m-%dT%H:%M:%SZ')
+
+
+def record_image(public_id, school_index, kind, url, created_at=None, **fields):
+    """
+    מוסיף (או מעדכן) תמונה באינדקס - נקרא מיד אחרי שמירה מוצלחת
+
+    Args:
+        public_id (str): המזהה המלא ב-Cloudinary
+        school_index (int): מספר בית הספר
+        kind (str): 'face' / 'match' / 'unknown'
+        url (str): כתובת התמונה
+        created_at (str, optional): חותמת זמן ISO (ברירת מחדל - עכשיו)
+        **fields: camera_number, person_id, first_name, last_name, primary_score, secondary_score,
+                  final_score, run_id
+    """
+    record_images([{'public_id': public_id, 'school_index': school_index, 'kind': kind, 'url': url,
+                    'created_at': created_at or now_timestamp(), **fields}])
+
+
+def record_images(rows):
+    """מוסיף כמה תמונות בטרנזקציה אחת"""
+    if not rows:
+        return
+    values = [tuple(row.get(column) for column in _COLUMNS) for row in rows]
+    try:
+        with _lock:
+            connection = _get_connection()
+            with connection:
+                connection.executemany(
+                    f"INSERT OR REPLACE INTO stored_images ({', '.join(_COLUMNS)}) "
+                    f"VALUES ({', '.join('?' for _ in _COLUMNS)})",
+                    values
+                )
+    except Exception as e:
+        print_status(f"שגיאה בעדכון אינדקס התמונות: {str(e)}", emoji="⚠️", level=2)
+
+
+def remove_images(school_index, kinds=None):
+    """מוחק מהאינדקס את תמונות בית הספר (אופציונלית רק סוגים מסוימים). מחזיר כמה נמחקו"""
+    try:
+        with _lock:
+            connection = _get_connection()
+            with connection:
+                if kinds is None:
+                    cursor = connection.execute("DELETE FROM stored_images WHERE school_index = ?", (school_index,))
+                else:
+                    kinds = tuple(kinds)
+                    cursor = connection.execute(
+                        f"DELETE FROM stored_images WHERE school_index = ? "
+                        f"AND kind IN ({', '.join('?' for _ in kinds)})",
+                        (school_index, *kinds)
+                    )
+                return cursor.rowcount
+    except Exception as e:
+        print_status(f"שגיאה במחיקה מאינדקס התמונות: {str(e)}", emoji="⚠️", level=2)
+        return 0
+
+
+def is_backfilled(school_index):
+    """האם האינדקס של בית הספר כבר מולא מ-Cloudinary (או נבנה מאפס דרך המערכת)"""
+    with _lock:
+        row = _get_connection().execute(
+            "SELECT 1 FROM backfilled_schools WHERE school_index = ?", (school_index,)).fetchone()
+    return row is not None
+
+
+def mark_backfilled(school_index):
+    with _lock:
+        connection = _get_connection()
+        with connection:
+            connection.execute("INSERT OR REPLACE INTO backfilled_schools (school_index, backfilled_at) VALUES (?, ?)",
+                               (school_index, now_timestamp()))
+
+
+def _row_to_gallery_item(row):
+    """שורה באינדקס → פריט בגלריה, באותו מבנה שהממשק מצפה לו"""
+    filename = row['public_id'].split('/')[-1]
+    if row['kind'] == KIND_MATCH:
+        return {
+            'url': row['url'],
+            'created_at': row['created_at'],
+            'is_identified': True,
+            'type': 'identified',
+            'filename': filename,
+            'first_name': row['first_name'] or '',
+            'last_name': row['last_name'] or '',
+            'person_id': row['person_id'] or '',
+            'final_score': row['final_score']
+        }
+    return {
+        'url': row['url'],
+        'created_at': row['created_at'],
+        'is_identified': False,
+        'type': 'unidentified',
+        'filename': filename,
+        'first_name': 'לא מזוהה',
+        'last_name': '',
+        'person_id': ''
+    }
+
+
+def query_gallery(school_index, include_unidentified=True, limit=100, offset=0):
+    """
+    עמוד מהגלריה של בית הספר: התאמות מזוהות קודם, ובכל סוג - החדשות ראשונות
+
+    Returns:
+        dict: {'faces': [...], 'total': int, 'total_identified': int, 'total_unidentified': int}
+    """
+    kinds = GALLERY_KINDS if include_unidentified else (KIND_MATCH,)
+    placeholders = ', '.join('?' for _ in kinds)
+
+    with _lock:
+        connection = _get_connection()
+        counts = dict(connection.execute(
+            f"SELECT kind, COUNT(*) FROM stored_images WHERE school_index = ? AND kind IN ({placeholders}) "
+            f"GROUP BY kind",
+            (school_index, *kinds)
+        ).fetchall())
+        rows = connection.execute(
+            f"SELECT * FROM stored_images WHERE school_index = ? AND kind IN ({placeholders}) "
+            f"ORDER BY kind = ? DESC, created_at DESC LIMIT ? OFFSET ?",
+            (school_index, *kinds, KIND_MATCH, limit, offset)
+        ).fetchall()
+
+    return {
+        'faces': [_row_to_gallery_item(row) for row in rows],
+        'total': sum(counts.values()),
+        'total_identified': counts.get(KIND_MATCH, 0),
+        'total_unidentified': counts.get(KIND_UNKNOWN, 0)
+    }
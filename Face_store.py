@@ -0,0 +1,207 @@
+import os
+import time
+import uuid
+import threading
+from collections import OrderedDict
+
+from Face_embeddings import EmbeddingStore
+from Storage import get_storage
+
+# כמה בתים של חיתוכי פנים מוחזקים בזיכרון בכל התהליך (כל בתי הספר). מעבר לכך - הריצות הישנות משוחררות
+# ראשונות, ופנים שלא נכנסות נקראות מהאחסון
+FACE_STORE_MAX_BYTES = int(os.getenv('ATTENDME_FACE_STORE_MB', '256')) * 1024 * 1024
+
+_runs_by_school = {}
+_held_bytes = 0
+_lock = threading.Lock()
+
+
+def print_status(message, emoji="ℹ️", level=0):
+    """פונקציה להדפסת סטטוס עם רמות הזחה - בלי כפילות"""
+    indent = "  " * level
+    log_message = f"{indent}{emoji} {message}"
+    print(log_message)
+
+
+def face_url(public_id, folder="attendance_faces"):
+    """ה-URL הצפוי של פנים באחסון, בלי לחכות לסיום ההעלאה"""
+    return get_storage().url(f"{folder}/{public_id}")
+
+
+class FaceRun:
+    """
+    ריצת חילוץ אחת של בית ספר: חיתוכי הפנים עצמם (בזיכרון, עד FACE_STORE_MAX_BYTES), הוקטורים שלהם,
+    וה-Futures של ההעלאה ל-Cloudinary שרצה ברקע כארכיון בלבד.
+    """
+
+    def __init__(self, school_index):
+        self.run_id = uuid.uuid4().hex[:12]
+        self.school_index = school_index
+        self.created_at = time.time()
+        self.completed = False
+        self.failed = False
+        self.faces = []
+        self.images = {}
+        self.image_bytes = 0
+        self.upload_futures = []
+        self._upload_by_url = {}
+        # וקטורי הפנים מחושבים פעם אחת לריצה, ומשותפים לכל הבדיקות שאחריה
+        self.embeddings = EmbeddingStore()
+
+    def add_face(self, public_id, image, upload_future=None, folder="attendance_faces"):
+        """
+        מוסיף חיתוך פנים לריצה
+
+        Args:
+            public_id (str): מזהה הפנים בתוך התיקיה (school_X/face_N_camY)
+            image (numpy.ndarray): חיתוך הפנים
+            upload_future (Future, optional): ההעלאה לארכיון ב-Cloudinary
+            folder (str): תיקיית Cloudinary
+
+        Returns:
+            dict: {'public_id', 'url', 'filename'} - באותו מבנה כמו רשימת הפנים מ-Cloudinary
+        """
+        full_public_id = f"{folder}/{public_id}"
+        face_data = {
+            'public_id': full_public_id,
+            'url': face_url(public_id, folder),
+            'filename': full_public_id.split('/')[-1] + '.jpg'
+        }
+        self.faces.append(face_data)
+        if upload_future is not None:
+            self.upload_futures.append(upload_future)
+            self._upload_by_url[face_data['url']] = upload_future
+        _hold_image(self, face_data['url'], image)
+        return face_data
+
+    def prime(self, image_cache):
+        """מכניס את כל חיתוכי הריצה שבזיכרון לקאש התמונות - בלי הורדה מ-Cloudinary"""
+        for url, image in list(self.images.items()):
+            image_cache.put(url, image)
+
+    def load_image(self, url):
+        """
+        טוען פנים של הריצה (loader של ImageCache): מהזיכרון, ואם החיתוך שוחרר - מה-URL עם הגרסה שחזר
+        מההעלאה. ה-public_id של הפנים חוזר בכל ריצה, כך שה-URL הקבוע עלול להחזיר מה-CDN חיתוך של ריצה קודמת.
+        """
+        image = self.images.get(url)
+        if image is not None:
+            return image
+
+        upload_future = self._upload_by_url.get(url)
+        if upload_future is not None:
+            uploaded = upload_future.result()
+            if uploaded is None:
+                return None
+            url = uploaded['url']
+        return get_storage().read_image(url)
+
+    def release_images(self):
+        """משחרר את חיתוכי הפנים מהזיכרון (הוקטורים נשארים). נקרא תחת _lock; מחזיר כמה בתים שוחררו"""
+        released_bytes = self.image_bytes
+        self.images = {}
+        self.image_bytes = 0
+        return released_bytes
+
+    def pending_uploads(self):
+        return sum(1 for future in self.upload_futures if not future.done())
+
+    def wait_for_uploads(self):
+        """ממתין לסיום כל ההעלאות לארכיון. מחזיר (הצליחו, נכשלו)"""
+        uploaded = 0
+        failed = 0
+        for future in self.upload_futures:
+            if future.result() is not None:
+                uploaded += 1
+            else:
+                failed += 1
+        return uploaded, failed
+
+
+def start_run(school_index):
+    """
+    פותח ריצת חילוץ חדשה לבית ספר (ממתין קודם לארכוב הריצות הקודמות).
+    מרגע זה הריצות הקודמות מוחלפות - הפנים שלהן נמחקות מהאחסון ובדיקת הנוכחות לא תקרא מהן.
+    """
+    wait_for_archival(school_index)
+
+    global _held_bytes
+
+    run = FaceRun(school_index)
+    with _lock:
+        # הריצות הקודמות כבר הועלו לארכיון ולא ייקראו שוב - רק הריצה החדשה נשמרת
+        for previous_run in _runs_by_school.get(school_index, {}).values():
+            _held_bytes -= previous_run.release_images()
+        _runs_by_school[school_index] = OrderedDict([(run.run_id, run)])
+    return run
+
+
+def _hold_image(run, url, image):
+    """
+    שומר חיתוך של run בזיכרון בתוך FACE_STORE_MAX_BYTES: כשאין מקום משוחררות קודם ריצות אחרות,
+    מהישנה לחדשה. מחזיר False אם עדיין אין מקום (החיתוך לא נשמר ויקרא מהאחסון)
+    """
+    global _held_bytes
+
+    image_bytes = image.nbytes
+    with _lock:
+        if _held_bytes + image_bytes > FACE_STORE_MAX_BYTES:
+            other_runs = sorted((other for runs in _runs_by_school.values() for other in runs.values()
+                                 if other is not run and other.image_bytes),
+                                key=lambda other: other.created_at)
+            for other in other_runs:
+                _held_bytes -= other.release_images()
+                print_status(f"חיתוכי ריצה {other.run_id} שוחררו מהזיכרון", emoji="🧹", level=2)
+                if _held_bytes + image_bytes <= FACE_STORE_MAX_BYTES:
+                    break
+
+        if _held_bytes + image_bytes > FACE_STORE_MAX_BYTES:
+            return False
+        run.images[url] = image
+        run.image_bytes += image_bytes
+        _held_bytes += image_bytes
+        return True
+
+
+def finish_run(run):
+    """מסמן ריצה כשלמה - מעכשיו בדיקת הנוכחות תקרא ממנה"""
+    run.completed = True
+    print_status(f"ריצת חילוץ {run.run_id} נשמרה בזיכרון: {len(run.faces)} פנים", emoji="💾", level=1)
+
+
+def fail_run(run, reason=None):
+    """מסמן ריצה שנכשלה - בדיקת הנוכחות לא תקרא ממנה ותחזור לאחסון"""
+    if run is None:
+        return
+    run.failed = True
+    print_status(f"ריצת חילוץ {run.run_id} נכשלה" + (f": {reason}" if reason else ""), emoji="⚠️", level=1)
+
+
+def get_latest_run(school_index):
+    """
+    הריצה האחרונה של בית הספר בתהליך הזה אם הושלמה בהצלחה, אחרת None.
+    ריצה קודמת לא מוחזרת גם אם הושלמה: החדשה כבר מחקה את הפנים שלה מהאחסון.
+    """
+    with _lock:
+        runs = _runs_by_school.get(school_index)
+        run = next(reversed(runs.values()), None) if runs else None
+    if run is None or not run.completed or run.failed:
+        return None
+    return run
+
+
+def wait_for_archival(school_index):
+    """ממתין שכל ההעלאות של בית הספר יסתיימו (למשל לפני מחיקת התיקיה ב-Cloudinary)"""
+    with _lock:
+        runs = list(_runs_by_school.get(school_index, {}).values())
+    for run in runs:
+        run.wait_for_uploads()
+
+
+def clear_school(school_index):
+    """מוחק את ריצות בית הספר מהזיכרון"""
+    global _held_bytes
+
+    with _lock:
+        for run in _runs_by_school.pop(school_index, {}).values():
+            _held_bytes -= run.release_images()
@@ -0,0 +1,133 @@
+import os
+import threading
+import cv2
+import numpy as np
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+# מדיניות זמנים אחידה לכל הורדות התמונות: (התחברות, קריאה) בשניות
+CONNECT_TIMEOUT = float(os.getenv('ATTENDME_HTTP_CONNECT_TIMEOUT', '3.05'))
+READ_TIMEOUT = float(os.getenv('ATTENDME_HTTP_READ_TIMEOUT', '10'))
+DEFAULT_TIMEOUT = (CONNECT_TIMEOUT, READ_TIMEOUT)
+
+# גודל מאגר החיבורים הפתוחים (keep-alive) לכל שרת - לפחות כמספר ההורדות המקבילות
+HTTP_POOL_SIZE = int(os.getenv('ATTENDME_HTTP_POOL_SIZE', '16'))
+
+# ניסיונות חוזרים עם המתנה הולכת וגדלה (0.3s, 0.6s, 1.2s...) לשגיאות רשת ושגיאות שרת זמניות
+HTTP_RETRIES = int(os.getenv('ATTENDME_HTTP_RETRIES', '3'))
+RETRY_BACKOFF_FACTOR = 0.3
+RETRY_STATUS_CODES = (429, 500, 502, 503, 504)
+
+# קריאה בזרימה: גודל כל חתיכה, וגודל התחלתי של המאגר כשהשרת לא שולח Content-Length
+CHUNK_SIZE = 64 * 1024
+DEFAULT_BUFFER_BYTES = 512 * 1024
+MAX_IMAGE_BYTES = 50 * 1024 * 1024
+
+_session = None
+_session_lock = threading.Lock()
+
+
+def print_status(message, emoji="ℹ️", level=0):
+    """פונקציה להדפסת סטטוס עם רמות הזחה - בלי כפילות"""
+    indent = "  " * level
+    log_message = f"{indent}{emoji} {message}"
+    print(log_message)
+
+
+def _create_session():
+    """יוצר Session עם מאגר חיבורים וניסיונות חוזרים"""
+    retry = Retry(
+        total=HTTP_RETRIES,
+        connect=HTTP_RETRIES,
+        read=HTTP_RETRIES,
+        status=HTTP_RETRIES,
+        backoff_factor=RETRY_BACKOFF_FACTOR,
+        status_forcelist=RETRY_STATUS_CODES,
+        allowed_methods=frozenset(['GET', 'HEAD']),
+        raise_on_status=False
+    )
+    adapter = HTTPAdapter(pool_connections=HTTP_POOL_SIZE, pool_maxsize=HTTP_POOL_SIZE,
+                          max_retries=retry, pool_block=False)
+
+    session = requests.Session()
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    return session
+
+
+def get_session():
+    """
+    מחזיר את ה-Session המשותף לכל התהליך - חיבורי TCP+TLS ל-CDN נשמרים בין הורדות
+
+    Returns:
+        requests.Session: ה-Session המשותף
+    """
+    global _session
+
+    if _session is not None:
+        return _session
+
+    with _session_lock:
+        if _session is None:
+            _session = _create_session()
+    return _session
+
+
+def fetch_bytes(url, timeout=None):
+    """
+    מוריד תוכן מ-URL בזרימה, לתוך מאגר שהוקצה מראש לפי Content-Length
+
+    Args:
+        url (str): כתובת ההורדה
+        timeout (tuple): (התחברות, קריאה) - ברירת מחדל DEFAULT_TIMEOUT
+
+    Returns:
+        memoryview: התוכן שהורד, או None אם השרת לא החזיר 200 או שהקובץ גדול מדי
+
+    Raises:
+        requests.RequestException: שגיאת רשת לאחר כל הניסיונות החוזרים
+    """
+    with get_session().get(url, stream=True, timeout=timeout or DEFAULT_TIMEOUT) as response:
+        if response.status_code != 200:
+            return None
+
+        content_length = response.headers.get('Content-Length', '')
+        expected_bytes = int(content_length) if content_length.isdigit() else 0
+        if expected_bytes > MAX_IMAGE_BYTES:
+            return None
+
+        buffer = bytearray(expected_bytes or DEFAULT_BUFFER_BYTES)
+        size = 0
+        for chunk in response.iter_content(CHUNK_SIZE):
+            end = size + len(chunk)
+            if end > len(buffer):
+                # תוכן דחוס או ללא Content-Length - הגדלה פי 2
+                if end > MAX_IMAGE_BYTES:
+                    return None
+                buffer.extend(bytes(max(end, len(buffer) * 2) - len(buffer)))
+            buffer[size:end] = chunk
+            size = end
+
+        return memoryview(buffer)[:size]
+
+
+def decode_image(data):
+    """מפענח תמונה מ-bytes לתמונת OpenCV (None אם לא ניתן לפענח)"""
+    if data is None or len(data) == 0:
+        return None
+    image_array = np.frombuffer(data, np.uint8)
+    return cv2.imdecode(image_array, cv2.IMREAD_COLOR)
+
+
+def download_image(url, timeout=None):
+    """
+    מוריד ומפענח תמונה דרך ה-Session המשותף
+
+    Returns:
+        numpy.ndarray: תמונת OpenCV, או None אם ההורדה או הפענוח נכשלו
+
+    Raises:
+        requests.RequestException: שגיאת רשת לאחר כל הניסיונות החוזרים
+    """
+    return decode_image(fetch_bytes(url, timeout=timeout))
@@ -0,0 +1,73 @@
+from collections import OrderedDict
+import threading
+
+# גודל מקסימלי לקאש תמונות של ריצה אחת (בבתים)
+IMAGE_CACHE_MAX_BYTES = 256 * 1024 * 1024
+
+
+class ImageCache:
+    """
+    קאש תמונות מפוענחות לריצה אחת (בדיקת נוכחות), מוגבל בבתים עם פינוי LRU.
+    כל פנים מהמצלמה יורדות מהרשת פעם אחת בלבד, וכל שלבי הריצה קוראים מאותו קאש.
+    """
+
+    def __init__(self, loader, max_bytes=IMAGE_CACHE_MAX_BYTES):
+        """
+        Args:
+            loader (callable): פונקציה שמקבלת URL ומחזירה תמונת OpenCV (או None)
+            max_bytes (int): גודל מקסימלי בבתים
+        """
+        self._loader = loader
+        self._max_bytes = max_bytes
+        self._images = OrderedDict()
+        self._current_bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, url):
+        """מחזיר את התמונה מהקאש, או מוריד אותה פעם אחת ושומר"""
+        with self._lock:
+            image = self._images.get(url)
+            if image is not None:
+                self._images.move_to_end(url)
+                self.hits += 1
+                return image
+            self.misses += 1
+
+        image = self._loader(url)
+        if image is not None:
+            self.put(url, image)
+        return image
+
+    def put(self, url, image):
+        """מוסיף תמונה לקאש ומפנה את הישנות ביותר לפי הצורך"""
+        image_bytes = image.nbytes
+        if image_bytes > self._max_bytes:
+            return
+
+        with self._lock:
+            old_image = self._images.pop(url, None)
+            if old_image is not None:
+                self._current_bytes -= old_image.nbytes
+
+            self._images[url] = image
+            self._current_bytes += image_bytes
+
+            while self._current_bytes > self._max_bytes:
+                _, evicted = self._images.popitem(last=False)
+                self._current_bytes -= evicted.nbytes
+
+    def get_stats(self):
+        """סטטיסטיקות שימוש בקאש"""
+        with self._lock:
+            return {
+                'images': len(self._images),
+                'bytes': self._current_bytes,
+                'max_bytes': self._max_bytes,
+                'hits': self.hits,
+                'misses': self.misses
+            }
+
+    def __len__(self):
+        return len(self._images)
@@ -0,0 +1,238 @@
+import os
+import time
+import uuid
+import threading
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+
+# מספר משימות שרצות במקביל, וכמה משימות שהסתיימו נשמרות לשאילתות סטטוס/תוצאות
+JOB_WORKERS = int(os.getenv('ATTENDME_JOB_WORKERS', '2'))
+JOB_HISTORY_LIMIT = 200
+JOB_EVENTS_LIMIT = 200
+
+JOB_QUEUED = 'queued'
+JOB_RUNNING = 'running'
+JOB_COMPLETED = 'completed'
+JOB_FAILED = 'failed'
+
+_manager = None
+_manager_lock = threading.Lock()
+
+
+def print_status(message, emoji="ℹ️", level=0):
+    """פונקציה להדפסת סטטוס עם רמות הזחה - בלי כפילות"""
+    indent = "  " * level
+    log_message = f"{indent}{emoji} {message}"
+    print(log_message)
+
+
+class Job:
+    """משימת רקע אחת (חילוץ פנים / בדיקת נוכחות / ריצה מלאה) - סטטוס, זמני שלבים ותוצאה"""
+
+    def __init__(self, job_type, school_index, params=None, listener=None):
+        self.job_id = uuid.uuid4().hex
+        self.job_type = job_type
+        self.school_index = school_index
+        self.params = params or {}
+        self.status = JOB_QUEUED
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self.stages = OrderedDict()
+        self.events = deque(maxlen=JOB_EVENTS_LIMIT)
+        self.result = None
+        self.error = None
+        self._listener = listener
+        self._lock = threading.Lock()
+
+    def report(self, event):
+        """
+        מקבל אירוע התקדמות {'stage', 'status', ...} מהריצה: מעדכן את זמני השלב ומעביר למאזין (SSE)
+        """
+        now = time.time()
+        event = {'job_id': self.job_id, 'time': now, **event}
+
+        with self._lock:
+            if event['stage'] != 'result':
+                stage = self.stages.setdefault(event['stage'], {'status': None, 'started_at': None, 'seconds': None})
+                stage['status'] = event['status']
+                if event['status'] == 'started':
+                    stage['started_at'] = now
+                elif event['status'] in ('completed', 'failed') and stage['started_at'] is not None:
+                    stage['seconds'] = round(now - stage['started_at'], 3)
+                stage.update({key: value for key, value in event.items()
+                              if key not in ('job_id', 'time', 'stage', 'status')})
+            self.events.append(event)
+
+        if self._listener is not None:
+            try:
+                self._listener(event)
+            except Exception as e:
+                print_status(f"שגיאה במאזין של משימה {self.job_id}: {str(e)}", emoji="⚠️", level=1)
+
+    def run(self, func):
+        """מריץ את המשימה - func מקבל on_progress ומחזיר מילון תוצאה עם 'success' ו-'message'"""
+        self.status = JOB_RUNNING
+        self.started_at = time.time()
+        print_status(f"משימה {self.job_id} ({self.job_type}) התחילה", emoji="🏃")
+
+        try:
+            result = func(on_progress=self.report)
+            self.result = result
+            if result.get('success'):
+                self.status = JOB_COMPLETED
+            else:
+                self.status = JOB_FAILED
+                self.error = result.get('message') or result.get('error')
+        except Exception as e:
+            self.status = JOB_FAILED
+            self.error = str(e)
+            self.result = {'success': False, 'message': str(e)}
+            print_status(f"משימה {self.job_id} נכשלה: {str(e)}", emoji="❌")
+
+        self.finished_at = time.time()
+        self.report({'stage': 'result', 'status': self.status, 'result': self.result})
+        print_status(f"משימה {self.job_id} הסתיימה: {self.status} ({self.finished_at - self.started_at:.1f}s)",
+                     emoji="🏁")
+
+    def is_finished(self):
+        return self.status in (JOB_COMPLETED, JOB_FAILED)
+
+    def to_dict(self, include_result=False):
+        """מצב המשימה ל-JSON"""
+        with self._lock:
+            stages = {name: dict(stage) for name, stage in self.stages.items()}
+
+        queued_seconds = None
+        if self.started_at is not None:
+            queued_seconds = round(self.started_at - self.created_at, 3)
+        elapsed_seconds = None
+        if self.started_at is not None:
+            elapsed_seconds = round((self.finished_at or time.time()) - self.started_at, 3)
+
+        job_data = {
+            'job_id': self.job_id,
+            'job_type': self.job_type,
+            'school_index': self.school_index,
+            'params': self.params,
+            'status': self.status,
+            'created_at': self.created_at,
+            'started_at': self.started_at,
+            'finished_at': self.finished_at,
+            'queued_seconds': queued_seconds,
+            'elapsed_seconds': elapsed_seconds,
+            'stages': stages,
+            'error': self.error
+        }
+        if include_result:
+            job_data['result'] = self.result
+        return job_data
+
+
+class JobManager:
+    """
+    תור משימות עם מאגר workers - בקשת ה-HTTP חוזרת מיד עם מזהה משימה.
+    משימות של אותו בית ספר רצות אחת אחרי השנייה (חילוץ שני היה מוחק את הפנים של הראשון באמצע),
+    בלי לתפוס worker בזמן ההמתנה; בתי ספר שונים רצים במקביל.
+    """
+
+    def __init__(self, max_workers=JOB_WORKERS):
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='attendance-job')
+        self._jobs = OrderedDict()
+        # בתי ספר עם משימה רצה, והמשימות שממתינות אחריה לכל בית ספר
+        self._active_schools = set()
+        self._waiting_by_school = {}
+        self._lock = threading.Lock()
+
+    def submit(self, job_type, school_index, func, params=None, listener=None):
+        """
+        מכניס משימה לתור
+
+        Args:
+            job_type (str): סוג המשימה ('extract_faces' / 'check_all' / 'check_specific' / 'pipeline')
+            school_index (int): מספר בית הספר
+            func (callable): מקבל on_progress ומחזיר מילון תוצאה
+            params (dict, optional): פרמטרים לתצוגה בסטטוס
+            listener (callable, optional): מקבל כל אירוע התקדמות (למשל תור של זרם SSE)
+
+        Returns:
+            Job: המשימה שנוצרה
+        """
+        job = Job(job_type, school_index, params, listener)
+        with self._lock:
+            self._jobs[job.job_id] = job
+            self._trim_history()
+            is_waiting = school_index in self._active_schools
+            if is_waiting:
+                self._waiting_by_school.setdefault(school_index, deque()).append((job, func))
+            else:
+                self._active_schools.add(school_index)
+
+        if is_waiting:
+            print_status(f"משימה {job.job_id} ({job_type}) ממתינה לסיום המשימה הקודמת של בית ספר {school_index}",
+                         emoji="⏳")
+        else:
+            self._executor.submit(self._run, job, func)
+            print_status(f"משימה {job.job_id} ({job_type}) נכנסה לתור עבור בית ספר {school_index}", emoji="📥")
+        return job
+
+    def _run(self, job, func):
+        """מריץ משימה, ובסיומה מעביר ל-workers את המשימה הבאה שממתינה לאותו בית ספר"""
+        try:
+            job.run(func)
+        finally:
+            with self._lock:
+                waiting = self._waiting_by_school.get(job.school_index)
+                next_job = waiting.popleft() if waiting else None
+                if not waiting:
+                    self._waiting_by_school.pop(job.school_index, None)
+                if next_job is None:
+                    self._active_schools.discard(job.school_index)
+            if next_job is not None:
+                self._executor.submit(self._run, *next_job)
+
+    def _trim_history(self):
+        """מוחק את המשימות הישנות ביותר שהסתיימו מעבר למגבלה"""
+        if len(self._jobs) <= JOB_HISTORY_LIMIT:
+            return
+        for job_id in [job_id for job_id, job in self._jobs.items() if job.is_finished()]:
+            if len(self._jobs) <= JOB_HISTORY_LIMIT:
+                break
+            del self._jobs[job_id]
+
+    def get(self, job_id):
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def get_recent(self, school_index=None, limit=20):
+        """המשימות האחרונות (החדשה ראשונה), אופציונלית רק של בית ספר אחד"""
+        with self._lock:
+            jobs = list(self._jobs.values())
+        if school_index is not None:
+            jobs = [job for job in jobs if job.school_index == school_index]
+        return list(reversed(jobs))[:limit]
+
+
+def get_job_manager():
+    """מחזיר את מנהל המשימות המשותף לתהליך (נוצר בשימוש הראשון, אחרי fork של gunicorn)"""
+    global _manager
+
+    if _manager is not None:
+        return _manager
+
+    with _manager_lock:
+        if _manager is None:
+            _manager = JobManager()
+    return _manager
+
+
+def submit_job(job_type, school_index, func, params=None, listener=None):
+    return get_job_manager().submit(job_type, school_index, func, params, listener)
+
+
+def get_job(job_id):
+    return get_job_manager().get(job_id)
+
+
+def list_jobs(school_index=None, limit=20):
+    return get_job_manager().get_recent(school_index, limit)
@@ -0,0 +1,99 @@
+from deepface import DeepFace
+import os
+import time
+import threading
+import numpy as np
+import psutil
+
+# המודלים שבשימוש בהשוואת הפנים - נטענים פעם אחת לכל תהליך
+FACE_MODELS = ('VGG-Face', 'Facenet')
+DETECTOR_BACKEND = 'opencv'
+
+_models = {}
+_load_seconds = {}
+_lock = threading.Lock()
+_warm_up_info = {'started_at': None, 'finished_at': None, 'error': None}
+
+
+def print_status(message, emoji="ℹ️", level=0):
+    """פונקציה להדפסת סטטוס עם רמות הזחה - בלי כפילות"""
+    indent = "  " * level
+    log_message = f"{indent}{emoji} {message}"
+    print(log_message)
+
+
+def _load_detector():
+    """טוען את גלאי הפנים של DeepFace לקאש הפנימי שלו"""
+    from deepface.detectors import FaceDetector
+    return FaceDetector.build_model(DETECTOR_BACKEND)
+
+
+def get_model(model_name):
+    """
+    מחזיר מודל DeepFace טעון (VGG-Face / Facenet / 'detector').
+    הטעינה קורית פעם אחת לתהליך; DeepFace.represent משתמש באותו אובייקט מהקאש של DeepFace.
+    """
+    model = _models.get(model_name)
+    if model is not None:
+        return model
+
+    with _lock:
+        if model_name in _models:
+            return _models[model_name]
+
+        start_time = time.perf_counter()
+        if model_name == 'detector':
+            model = _load_detector()
+        else:
+            model = DeepFace.build_model(model_name)
+        _load_seconds[model_name] = time.perf_counter() - start_time
+        _models[model_name] = model
+
+        print_status(f"מודל {model_name} נטען ({_load_seconds[model_name]:.1f}s)", emoji="🧠")
+        return model
+
+
+def warm_up_models(run_inference=False):
+    """
+    טוען את כל המודלים מראש - לקריאה בעליית ה-worker (או ב-master עם gunicorn --preload,
+    כך שכל ה-workers יורשים את המודלים הטעונים)
+
+    Args:
+        run_inference (bool): להריץ גם חישוב וקטור על תמונה ריקה כדי לאתחל את הגרף
+    """
+    _warm_up_info['started_at'] = time.time()
+    try:
+        get_model('detector')
+        for model_name in FACE_MODELS:
+            get_model(model_name)
+
+        if run_inference:
+            blank_image = np.zeros((160, 160, 3), dtype=np.uint8)
+            for model_name in FACE_MODELS:
+                DeepFace.represent(img_path=blank_image, model_name=model_name, enforce_detection=False,
+                                   detector_backend=DETECTOR_BACKEND)
+
+        print_status("כל מודלי הפנים טעונים", emoji="✅")
+
+    except Exception as e:
+        _warm_up_info['error'] = str(e)
+        print_status(f"שגיאה בטעינת מודלי פנים: {str(e)}", emoji="❌")
+
+    _warm_up_info['finished_at'] = time.time()
+
+
+def get_models_status():
+    """מצב המודלים לבדיקת בריאות: מה טעון, זמני טעינה וזיכרון התהליך"""
+    process = psutil.Process(os.getpid())
+    warm_up_seconds = None
+    if _warm_up_info['started_at'] and _warm_up_info['finished_at']:
+        warm_up_seconds = round(_warm_up_info['finished_at'] - _warm_up_info['started_at'], 2)
+
+    return {
+        'loaded': [name for name in _models],
+        'ready': all(name in _models for name in FACE_MODELS),
+        'load_seconds': {name: round(seconds, 2) for name, seconds in _load_seconds.items()},
+        'warm_up_seconds': warm_up_seconds,
+        'warm_up_error': _warm_up_info['error'],
+        'rss_mb': round(process.memory_info().rss / (1024 * 1024), 1)
+    }
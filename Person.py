@@ -1,21 +1,79 @@
+import sys
 from datetime import datetime
 
+from Attendance_table import format_check_time
+
+
+def _intern(value):
+    """מחרוזת משותפת לכל המופעים (שמות פרטיים ו-URL-ים חוזרים נשמרים פעם אחת בזיכרון)"""
+    return sys.intern(value) if type(value) is str else value
+
 
 class Person:
+    # בלי __dict__ לכל אדם - חיסכון משמעותי בזיכרון ברשימות של עשרות אלפי תלמידים
+    __slots__ = ('first_name', 'last_name', 'id_number', 'image_urls', '_is_present', '_check_time', '_attendance')
+
     def __init__(self, first_name, last_name, id_number, images_url):
         # מידע אישי
-        self.first_name = first_name
-        self.last_name = last_name
+        self.first_name = _intern(first_name)
+        self.last_name = _intern(last_name)
         self.id_number = id_number
-        self.image_urls = images_url
-        self.is_present = False
-        self.check_time = None
+        # tuple ולא list - קטן יותר, ואי אפשר לשנות בטעות מבחוץ (הוספה רק דרך add_image_url)
+        self.image_urls = tuple(_intern(url) for url in images_url or ())
+        self._is_present = False
+        self._check_time = None
+        # טבלת הנוכחות של בית הספר (אחרי ההוספה לבית ספר) - מצב הנוכחות נקרא ונכתב דרכה
+        self._attendance = None
+
+    # --- נוכחות (דרך טבלת הנוכחות של בית הספר) ---
+    @property
+    def is_present(self):
+        if self._attendance is not None:
+            return self._attendance.is_present(self.id_number)
+        return self._is_present
+
+    @is_present.setter
+    def is_present(self, status):
+        if self._attendance is not None:
+            self._attendance.set_present(self.id_number, status)
+        else:
+            self._is_present = bool(status)
+
+    @property
+    def check_time(self):
+        if self._attendance is not None:
+            return self._attendance.get_check_time(self.id_number)
+        return self._check_time
+
+    @check_time.setter
+    def check_time(self, check_time):
+        """מקבל מחרוזת בפורמט התצוגה, epoch seconds, או None"""
+        if self._attendance is not None:
+            self._attendance.set_check_time(self.id_number, check_time)
+        elif isinstance(check_time, (int, float)):
+            self._check_time = format_check_time(check_time)
+        else:
+            self._check_time = check_time
+
+    def attach_attendance(self, attendance_table):
+        """מעביר את מצב הנוכחות לטבלת הנוכחות של בית הספר"""
+        attendance_table.add_row(self.id_number, self._is_present, self._check_time)
+        self._attendance = attendance_table
+
+    def detach_attendance(self):
+        """מחזיר את מצב הנוכחות לאובייקט ומוחק את השורה מהטבלה (כשהאדם יוצא מבית הספר)"""
+        if self._attendance is None:
+            return
+        removed = self._attendance.remove_row(self.id_number)
+        if removed is not None:
+            self._is_present, self._check_time = removed
+        self._attendance = None
 
     # --- פונקציות חדשות לניהול URL-ים ---
     def add_image_url(self, url):
         """מוסיפה URL של תמונה חדשה לרשימה של האדם."""
         if url and url not in self.image_urls:
-            self.image_urls.append(url)
+            self.image_urls = self.image_urls + (_intern(url),)
             return True
         return False
 
@@ -25,7 +83,7 @@ class Person:
 
     def get_all_image_urls(self):
         """מחזירה את כל רשימת ה-URL-ים של התמונות."""
-        return self.image_urls
+        return list(self.image_urls)
 
     # --- פונקציות קיימות שנשארו ---
     def mark_present(self):
@@ -50,7 +108,7 @@ class Person:
 
     def update_check_time(self):
         """מעדכן את זמן הבדיקה."""
-        self.check_time = datetime.now().strftime("%d/%m/%y %H:%M")
+        self.check_time = datetime.now().timestamp()
 
     def get_person_details(self):
         """מחזיר את כל פרטי האדם כמילון, מותאם לעבודה עם ענן."""
@@ -59,7 +117,63 @@ class Person:
             "last_name": self.last_name,
             "id_number": self.id_number,
             "is_present": self.is_present,
-            "image_urls": self.image_urls,
+            "image_urls": list(self.image_urls),
             "image_count": len(self.image_urls),
             "check_time": self.check_time
         }
+
+
+def benchmark_person_memory(people_count=10000, images_per_person=3):
+    """
+    מודד זיכרון לאדם ברשימה גדולה: Person (slots) מול אובייקט רגיל עם __dict__ ורשימת URL-ים
+
+    Returns:
+        dict: {'people', 'slotted_bytes_per_person', 'dict_bytes_per_person'}
+    """
+    import tracemalloc
+
+    class _DictPerson:
+        def __init__(self, first_name, last_name, id_number, images_url):
+            self.first_name = first_name
+            self.last_name = last_name
+            self.id_number = id_number
+            self.image_urls = images_url
+            self.is_present = False
+            self.check_time = None
+
+    first_names = ['יוסי', 'דנה', 'משה', 'נועה', 'אברהם', 'שרה', 'דוד', 'מיכל', 'איתי', 'תמר']
+    last_names = ['כהן', 'לוי', 'מזרחי', 'פרץ', 'ביטון', 'אברהם', 'פרידמן', 'דהן']
+
+    def rows():
+        for person in range(people_count):
+            # מחרוזות חדשות לכל אדם, כמו שמגיעות מבקשות HTTP או מהמאגר
+            yield ((first_names[person % len(first_names)] + '.')[:-1],
+                   (last_names[person % len(last_names)] + '.')[:-1],
+                   str(100000000 + person),
+                   [f"https://res.cloudinary.com/demo/image/upload/v1/people/{person}/image_{image}.jpg"
+                    for image in range(images_per_person)])
+
+    def measure(person_class):
+        tracemalloc.start()
+        people = [person_class(*row) for row in rows()]
+        used_bytes, _ = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        del people
+        return used_bytes / people_count
+
+    return {
+        'people': people_count,
+        'slotted_bytes_per_person': measure(Person),
+        'dict_bytes_per_person': measure(_DictPerson)
+    }
+
+
+if __name__ == '__main__':
+    from tabulate import tabulate
+
+    rows = []
+    for people in (10000, 100000):
+        result = benchmark_person_memory(people_count=people)
+        rows.append([people, f"{result['dict_bytes_per_person']:.0f}", f"{result['slotted_bytes_per_person']:.0f}",
+                     f"{result['dict_bytes_per_person'] / result['slotted_bytes_per_person']:.2f}x"])
+    print(tabulate(rows, headers=["people", "dict bytes/person", "slots bytes/person", "saving"], tablefmt="grid"))
@@ -1,9 +1,12 @@
+import threading
 from datetime import datetime
 
+from Attendance_table import AttendanceTable
+
 
 class School:
     def __init__(self, school_name, school_email, school_phone, school_address,
-                 admin_username, admin_password, school_index=None):
+                 admin_username, admin_password, school_index=None, created_at=None, loader=None):
 
         self.school_name = school_name
         self.school_email = school_email
@@ -11,10 +14,128 @@ class School:
         self.school_address = school_address
         self.admin_username = admin_username
         self.admin_password = admin_password
-        self.created_at = self._get_current_time()
+        self.created_at = created_at or self._get_current_time()
         self.school_index = school_index
-        self.people_vector = []
-        self.targets_vector = []
+        self._people_vector = []
+        self._targets_vector = []
+        # אינדקסים לחיפוש ב-O(1) - מתעדכנים יחד עם הרשימות בכל הוספה/מחיקה
+        self._people_by_id = {}
+        self._targets_by_camera = {}
+        # מצב הנוכחות של כל האנשים כעמודות (שורה לכל אדם) - לפעולות על כל בית הספר בבת אחת
+        self.attendance = AttendanceTable()
+
+        # טעינה עצלה מהמאגר: loader(school_index) מחזיר (people, targets) בגישה הראשונה לבית הספר
+        self._loader = loader
+        self._load_lock = threading.Lock()
+
+    def _ensure_loaded(self):
+        if self._loader is None:
+            return
+        with self._load_lock:
+            if self._loader is not None:
+                self._people_vector, self._targets_vector = self._loader(self.school_index)
+                self._people_by_id = {person.id_number: person for person in self._people_vector}
+                for person in self._people_vector:
+                    person.attach_attendance(self.attendance)
+                self._targets_by_camera = {target.camera_number: target for target in self._targets_vector}
+                self._loader = None
+
+    @property
+    def people_vector(self):
+        self._ensure_loaded()
+        return self._people_vector
+
+    @property
+    def targets_vector(self):
+        self._ensure_loaded()
+        return self._targets_vector
+
+    # --- אנשים ---
+    def get_person(self, id_number):
+        """מחזיר אדם לפי תעודת זהות, או None"""
+        self._ensure_loaded()
+        return self._people_by_id.get(id_number)
+
+    def get_people(self, id_numbers):
+        """
+        מחזיר את האנשים לפי רשימת תעודות זהות, דרך האינדקס (בלי מעבר על כל בית הספר)
+
+        Returns:
+            tuple: (אנשים שנמצאו לפי סדר הבקשה, תעודות זהות שלא נמצאו)
+        """
+        self._ensure_loaded()
+        people = []
+        unknown_ids = []
+        for id_number in dict.fromkeys(id_numbers):
+            person = self._people_by_id.get(id_number)
+            if person is None:
+                unknown_ids.append(id_number)
+            else:
+                people.append(person)
+        return people, unknown_ids
+
+    def get_attendance(self):
+        """טבלת הנוכחות של בית הספר (אחרי טעינת האנשים)"""
+        self._ensure_loaded()
+        return self.attendance
+
+    def has_person(self, id_number):
+        self._ensure_loaded()
+        return id_number in self._people_by_id
+
+    def add_person(self, person):
+        """מוסיף אדם. מחזיר False אם כבר קיים אדם עם אותה תעודת זהות"""
+        self._ensure_loaded()
+        if person.id_number in self._people_by_id:
+            return False
+        self._people_vector.append(person)
+        self._people_by_id[person.id_number] = person
+        person.attach_attendance(self.attendance)
+        return True
+
+    def remove_person(self, id_number):
+        """מוחק אדם לפי תעודת זהות ומחזיר אותו, או None אם לא נמצא"""
+        self._ensure_loaded()
+        person = self._people_by_id.pop(id_number, None)
+        if person is not None:
+            self._people_vector.remove(person)
+            person.detach_attendance()
+        return person
+
+    # --- מטרות (מצלמות) ---
+    def get_target(self, camera_number):
+        """מחזיר מטרה לפי מספר מצלמה, או None"""
+        self._ensure_loaded()
+        return self._targets_by_camera.get(camera_number)
+
+    def has_target(self, camera_number):
+        self._ensure_loaded()
+        return camera_number in self._targets_by_camera
+
+    def add_target(self, target):
+        """מוסיף מטרה. מחזיר False אם כבר קיימת מצלמה עם אותו מספר"""
+        self._ensure_loaded()
+        if target.camera_number in self._targets_by_camera:
+            return False
+        self._targets_vector.append(target)
+        self._targets_by_camera[target.camera_number] = target
+        return True
+
+    def remove_target(self, camera_number):
+        """מוחק מטרה לפי מספר מצלמה ומחזיר אותה, או None אם לא נמצאה"""
+        self._ensure_loaded()
+        target = self._targets_by_camera.pop(camera_number, None)
+        if target is not None:
+            self._targets_vector.remove(target)
+        return target
+
+    def clear_targets(self):
+        """מוחק את כל המטרות ומחזיר כמה נמחקו"""
+        self._ensure_loaded()
+        count = len(self._targets_vector)
+        self._targets_vector.clear()
+        self._targets_by_camera.clear()
+        return count
 
     def _get_current_time(self):
         return datetime.now().strftime("%Y-%m-%d %H:%M:%S")
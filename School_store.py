@@ -0,0 +1,259 @@
+import os
+import json
+import sqlite3
+import threading
+
+from Person import Person
+from Target import Target
+from School import School
+
+# מאגר קבוע של בתי הספר, האנשים והמטרות - שורד הפעלה מחדש של gunicorn (וגם --max-requests)
+SCHOOL_DB_PATH = os.getenv('ATTENDME_SCHOOL_DB_PATH',
+                           os.path.join(os.path.dirname(os.path.abspath(__file__)), 'school_data.sqlite3'))
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS schools (
+    school_index INTEGER PRIMARY KEY,
+    school_name TEXT NOT NULL,
+    school_email TEXT NOT NULL,
+    school_phone TEXT,
+    school_address TEXT,
+    admin_username TEXT NOT NULL UNIQUE,
+    admin_password TEXT NOT NULL,
+    created_at TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS people (
+    school_index INTEGER NOT NULL,
+    id_number TEXT NOT NULL,
+    first_name TEXT NOT NULL,
+    last_name TEXT NOT NULL,
+    image_urls TEXT NOT NULL,
+    is_present INTEGER NOT NULL DEFAULT 0,
+    check_time TEXT,
+    position INTEGER NOT NULL,
+    PRIMARY KEY (school_index, id_number)
+);
+CREATE TABLE IF NOT EXISTS targets (
+    school_index INTEGER NOT NULL,
+    camera_number INTEGER NOT NULL,
+    image_url TEXT NOT NULL,
+    faces_count INTEGER NOT NULL DEFAULT 0,
+    extracted_faces TEXT NOT NULL,
+    is_checked INTEGER NOT NULL DEFAULT 0,
+    position INTEGER NOT NULL,
+    PRIMARY KEY (school_index, camera_number)
+);
+"""
+
+_connection = None
+# התהליך שפתח את החיבור - חיבור SQLite לא עובר fork (ה-master של --preload, workers שמוחלפים ב---max-requests)
+_connection_pid = None
+_lock = threading.Lock()
+
+
+def print_status(message, emoji="ℹ️", level=0):
+    """פונקציה להדפסת סטטוס עם רמות הזחה - בלי כפילות"""
+    indent = "  " * level
+    log_message = f"{indent}{emoji} {message}"
+    print(log_message)
+
+
+def _get_connection():
+    """
+    חיבור SQLite משותף לתהליך (נפתח בשימוש הראשון), במצב WAL כדי שקוראים לא יחכו לכותבים.
+    תהליך שנוצר ב-fork פותח חיבור משלו ולא ממשיך להשתמש בחיבור שירש מהתהליך שיצר אותו.
+    """
+    global _connection, _connection_pid
+    if _connection is None or _connection_pid != os.getpid():
+        directory = os.path.dirname(SCHOOL_DB_PATH)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        connection = sqlite3.connect(SCHOOL_DB_PATH, check_same_thread=False, timeout=30)
+        connection.row_factory = sqlite3.Row
+        connection.execute('PRAGMA journal_mode=WAL')
+        connection.execute('PRAGMA synchronous=NORMAL')
+        connection.executescript(_SCHEMA)
+        _connection = connection
+        _connection_pid = os.getpid()
+    return _connection
+
+
+def _write(statements, description):
+    """מריץ רשימת (sql, params) בטרנזקציה אחת. מחזיר True בהצלחה"""
+    try:
+        with _lock:
+            connection = _get_connection()
+            with connection:
+                for sql, params in statements:
+                    if isinstance(params, list):
+                        connection.executemany(sql, params)
+                    else:
+                        connection.execute(sql, params)
+        return True
+    except Exception as e:
+        print_status(f"שגיאה בשמירת {description} במאגר: {str(e)}", emoji="⚠️", level=1)
+        return False
+
+
+# ==================== טעינה ====================
+
+def load_schools():
+    """
+    טוען את כותרות כל בתי הספר (בלי אנשים ומטרות) - ההפעלה מהירה גם עם אלפי תלמידים.
+    האנשים והמטרות של כל בית ספר נטענים רק בגישה הראשונה אליו.
+
+    Returns:
+        list: אובייקטי School לפי school_index
+    """
+    with _lock:
+        rows = _get_connection().execute("SELECT * FROM schools ORDER BY school_index").fetchall()
+
+    schools = [
+        School(
+            school_name=row['school_name'],
+            school_email=row['school_email'],
+            school_phone=row['school_phone'],
+            school_address=row['school_address'],
+            admin_username=row['admin_username'],
+            admin_password=row['admin_password'],
+            school_index=row['school_index'],
+            created_at=row['created_at'],
+            loader=load_school_contents
+        )
+        for row in rows
+    ]
+    if schools:
+        print_status(f"נטענו {len(schools)} בתי ספר מהמאגר", emoji="🗄️")
+    return schools
+
+
+def _person_from_row(row):
+    person = Person(row['first_name'], row['last_name'], row['id_number'], json.loads(row['image_urls']))
+    person.is_present = bool(row['is_present'])
+    person.check_time = row['check_time']
+    return person
+
+
+def _target_from_row(row):
+    target = Target(row['camera_number'], json.loads(row['image_url']))
+    target.faces_count = row['faces_count']
+    target.extracted_faces = json.loads(row['extracted_faces'])
+    target.is_checked = bool(row['is_checked'])
+    return target
+
+
+def load_school_contents(school_index):
+    """
+    טוען את האנשים והמטרות של בית ספר אחד
+
+    Returns:
+        tuple: (people, targets) - לפי סדר ההוספה
+    """
+    with _lock:
+        connection = _get_connection()
+        people_rows = connection.execute(
+            "SELECT * FROM people WHERE school_index = ? ORDER BY position", (school_index,)).fetchall()
+        target_rows = connection.execute(
+            "SELECT * FROM targets WHERE school_index = ? ORDER BY position", (school_index,)).fetchall()
+
+    people = [_person_from_row(row) for row in people_rows]
+    targets = [_target_from_row(row) for row in target_rows]
+    print_status(f"בית ספר {school_index} נטען מהמאגר: {len(people)} אנשים, {len(targets)} מטרות", emoji="🗄️",
+                 level=1)
+    return people, targets
+
+
+# ==================== שמירה ====================
+
+def save_school(school):
+    return _write([(
+        "INSERT OR REPLACE INTO schools (school_index, school_name, school_email, school_phone, school_address, "
+        "admin_username, admin_password, created_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+        (school.school_index, school.school_name, school.school_email, school.school_phone, school.school_address,
+         school.admin_username, school.admin_password, school.created_at)
+    )], f"בית הספר {school.school_name}")
+
+
+def _person_values(school_index, person):
+    return {'school_index': school_index, 'id_number': person.id_number, 'first_name': person.first_name,
+            'last_name': person.last_name, 'image_urls': json.dumps(person.image_urls),
+            'is_present': int(bool(person.is_present)), 'check_time': person.check_time}
+
+
+# מיקום חדש נשמר רק בהוספה; עדכון של אדם קיים שומר על מקומו ברשימה
+_UPSERT_PERSON = (
+    "INSERT INTO people (school_index, id_number, first_name, last_name, image_urls, is_present, check_time, position) "
+    "VALUES (:school_index, :id_number, :first_name, :last_name, :image_urls, :is_present, :check_time, "
+    "(SELECT COALESCE(MAX(position), -1) + 1 FROM people WHERE school_index = :school_index)) "
+    "ON CONFLICT (school_index, id_number) DO UPDATE SET first_name = excluded.first_name, "
+    "last_name = excluded.last_name, image_urls = excluded.image_urls, is_present = excluded.is_present, "
+    "check_time = excluded.check_time"
+)
+
+
+def save_person(school_index, person):
+    """שומר אדם (הוספה או עדכון)"""
+    return _write([(_UPSERT_PERSON, _person_values(school_index, person))],
+                  f"האדם {person.get_full_name_and_id()}")
+
+
+def save_people(school_index, people):
+    """שומר כמה אנשים בטרנזקציה אחת (למשל סטטוס הנוכחות אחרי בדיקה)"""
+    if not people:
+        return True
+    return _write([(_UPSERT_PERSON, [_person_values(school_index, person) for person in people])],
+                  f"{len(people)} אנשים")
+
+
+def save_presence(school_index, is_present, id_numbers=None, check_time=None):
+    """
+    מעדכן רק את סטטוס הנוכחות - לכל בית הספר בפקודה אחת, או לרשימת תעודות זהות.
+    check_time (מחרוזת בפורמט התצוגה) נשמר יחד איתו אם ניתן; None = זמן הבדיקה השמור לא משתנה.
+    """
+    assignments = "is_present = :is_present"
+    if check_time is not None:
+        assignments += ", check_time = :check_time"
+    values = {'is_present': int(bool(is_present)), 'check_time': check_time, 'school_index': school_index}
+
+    if id_numbers is None:
+        return _write([(f"UPDATE people SET {assignments} WHERE school_index = :school_index", values)],
+                      f"נוכחות בית ספר {school_index}")
+    return _write([(f"UPDATE people SET {assignments} WHERE school_index = :school_index AND id_number = :id_number",
+                    [{**values, 'id_number': id_number} for id_number in id_numbers])],
+                  f"נוכחות של {len(id_numbers)} אנשים")
+
+
+def delete_person(school_index, id_number):
+    return _write([("DELETE FROM people WHERE school_index = ? AND id_number = ?", (school_index, id_number))],
+                  f"מחיקת האדם {id_number}")
+
+
+def save_target(school_index, target):
+    """שומר מטרה (הוספה או עדכון)"""
+    return _write([(
+        "INSERT INTO targets (school_index, camera_number, image_url, faces_count, extracted_faces, is_checked, "
+        "position) VALUES (:school_index, :camera_number, :image_url, :faces_count, :extracted_faces, :is_checked, "
+        "(SELECT COALESCE(MAX(position), -1) + 1 FROM targets WHERE school_index = :school_index)) "
+        "ON CONFLICT (school_index, camera_number) DO UPDATE SET image_url = excluded.image_url, "
+        "faces_count = excluded.faces_count, extracted_faces = excluded.extracted_faces, "
+        "is_checked = excluded.is_checked",
+        {'school_index': school_index, 'camera_number': target.camera_number,
+         'image_url': json.dumps(target.image_url), 'faces_count': target.faces_count,
+         'extracted_faces': json.dumps(target.extracted_faces), 'is_checked': int(bool(target.is_checked))}
+    )], f"מצלמה {target.camera_number}")
+
+
+def delete_target(school_index, camera_number):
+    return _write([("DELETE FROM targets WHERE school_index = ? AND camera_number = ?",
+                    (school_index, camera_number))], f"מחיקת מצלמה {camera_number}")
+
+
+def delete_targets(school_index):
+    return _write([("DELETE FROM targets WHERE school_index = ?", (school_index,))],
+                  f"מחיקת המטרות של בית ספר {school_index}")
+
+
+def clear_store():
+    """מוחק את כל הנתונים מהמאגר"""
+    return _write([("DELETE FROM people", ()), ("DELETE FROM targets", ()), ("DELETE FROM schools", ())],
+                  "ניקוי המאגר")
@@ -0,0 +1,318 @@
+import os
+import mmap
+import time
+import threading
+from urllib.parse import quote, unquote
+from concurrent.futures import ThreadPoolExecutor, as_completed
+import cloudinary
+import cloudinary.api
+import cloudinary.uploader
+import cloudinary.utils
+
+from Http_client import fetch_bytes, decode_image, download_image
+
+# הגודל המקסימלי של עמוד ב-Admin API של Cloudinary
+CLOUDINARY_PAGE_SIZE = 500
+
+# מספר prefixes שנמחקים במקביל
+DELETE_CONCURRENCY = 4
+
+# אחסון התמונות: 'cloudinary' (ברירת מחדל) או 'local' - תיקיה בדיסק המקומי, מוגשת דרך /storage
+STORAGE_BACKEND = os.getenv('ATTENDME_STORAGE', 'cloudinary')
+LOCAL_STORAGE_ROOT = os.getenv('ATTENDME_STORAGE_ROOT',
+                               os.path.join(os.path.dirname(os.path.abspath(__file__)), 'storage'))
+LOCAL_STORAGE_URL_PREFIX = '/storage/'
+
+_storage = None
+_storage_lock = threading.Lock()
+
+
+def print_status(message, emoji="ℹ️", level=0):
+    """פונקציה להדפסת סטטוס עם רמות הזחה - בלי כפילות"""
+    indent = "  " * level
+    log_message = f"{indent}{emoji} {message}"
+    print(log_message)
+
+
+def _iter_cloudinary_resources(prefix, page_size=CLOUDINARY_PAGE_SIZE):
+    """
+    עובר על כל המשאבים תחת prefix ב-Cloudinary, עמוד אחר עמוד לפי next_cursor
+
+    Args:
+        prefix (str): תחילית ה-public_id (למשל "detected_matches/school_0/")
+        page_size (int): משאבים בכל קריאה (עד 500)
+
+    Yields:
+        dict: משאב כפי שמוחזר מ-cloudinary.api.resources
+    """
+    params = {'type': 'upload', 'prefix': prefix, 'max_results': page_size}
+
+    next_cursor = None
+    while True:
+        if next_cursor:
+            params['next_cursor'] = next_cursor
+        result = cloudinary.api.resources(**params)
+
+        yield from result.get('resources', [])
+
+        next_cursor = result.get('next_cursor')
+        if not next_cursor:
+            break
+
+
+def _delete_paged(delete_call, target):
+    """מריץ קריאת מחיקה שוב ושוב כל עוד Cloudinary מחזיר partial (עד 1000 משאבים לקריאה)"""
+    start_time = time.perf_counter()
+    deleted_count = 0
+    calls = 0
+    next_cursor = None
+
+    while True:
+        params = {'next_cursor': next_cursor} if next_cursor else {}
+        result = delete_call(target, **params)
+        calls += 1
+        deleted_count += sum(1 for status in result.get('deleted', {}).values() if status == 'deleted')
+
+        next_cursor = result.get('next_cursor')
+        if not result.get('partial'):
+            break
+
+    return {
+        'target': target,
+        'deleted': deleted_count,
+        'calls': calls,
+        'seconds': round(time.perf_counter() - start_time, 3)
+    }
+
+
+class CloudinaryStorage:
+    """
+    אחסון ב-Cloudinary. המפתח של כל תמונה הוא ה-public_id המלא (תיקיה/שם, בלי סיומת).
+    כל הפעולות מחזירות משאבים באותו מבנה: {'public_id', 'url', 'created_at'}
+    """
+
+    name = 'cloudinary'
+
+    def put(self, key, data, overwrite=True, tags=None, image_format="jpg"):
+        """
+        שומר תמונה מקודדת (bytes או קובץ פתוח)
+
+        Args:
+            key (str): המפתח המלא (למשל "attendance_faces/school_0/face_1_cam2")
+            data (bytes): תוכן התמונה
+            overwrite (bool): האם לדרוס תמונה קיימת
+            tags (list, optional): תגים לתמונה
+            image_format (str, optional): פורמט השמירה (None = הפורמט המקורי)
+
+        Returns:
+            dict: {'public_id', 'url', 'created_at'}
+        """
+        options = {'public_id': key, 'overwrite': overwrite, 'resource_type': "image"}
+        if image_format:
+            options['format'] = image_format
+        if tags:
+            options['tags'] = tags
+        result = cloudinary.uploader.upload(data, **options)
+        return {'public_id': result['public_id'], 'url': result['secure_url'], 'created_at': result.get('created_at')}
+
+    def get(self, key):
+        """תוכן התמונה (memoryview), או None אם היא לא קיימת"""
+        return fetch_bytes(self.url(key))
+
+    def url(self, key):
+        """ה-URL של התמונה - מחושב מקומית, בלי קריאה ל-Cloudinary"""
+        url, _ = cloudinary.utils.cloudinary_url(key, format="jpg", secure=True)
+        return url
+
+    def read_image(self, url):
+        """מוריד ומפענח תמונה לפי URL"""
+        return download_image(url)
+
+    def list(self, prefix):
+        """עובר על כל המשאבים תחת prefix"""
+        for resource in _iter_cloudinary_resources(prefix):
+            yield {'public_id': resource['public_id'], 'url': resource['secure_url'],
+                   'created_at': resource.get('created_at')}
+
+    def delete(self, key):
+        """מוחק תמונה אחת. מחזיר True אם נמחקה"""
+        return cloudinary.uploader.destroy(key).get('result') == 'ok'
+
+    def delete_prefix(self, prefix):
+        """
+        מוחק את כל המשאבים תחת prefix ישירות, בלי לרשום אותם קודם
+
+        Returns:
+            dict: {'target': prefix, 'deleted': int, 'calls': int, 'seconds': float}
+        """
+        return _delete_paged(cloudinary.api.delete_resources_by_prefix, prefix)
+
+
+class LocalStorage:
+    """
+    אחסון בתיקיה בדיסק המקומי: כל מפתח נשמר כקובץ <root>/<key>.jpg ומוגש דרך /storage/<key>.jpg.
+    בלי רשת בכלל - להתקנות on-prem עם SSD מקומי, ולבדיקות ומדידות ביצועים בלי Cloudinary.
+    """
+
+    name = 'local'
+
+    def __init__(self, root=LOCAL_STORAGE_ROOT, url_prefix=LOCAL_STORAGE_URL_PREFIX):
+        self.root = os.path.abspath(root)
+        self.url_prefix = url_prefix
+        os.makedirs(self.root, exist_ok=True)
+
+    def _path(self, key):
+        """הנתיב של מפתח בדיסק - מפתח שיוצא מתיקיית השורש נדחה"""
+        path = os.path.abspath(os.path.join(self.root, f"{key}.jpg"))
+        if os.path.commonpath([self.root, path]) != self.root:
+            raise ValueError(f"מפתח אחסון לא חוקי: {key}")
+        return path
+
+    def _key_from_path(self, path):
+        return os.path.relpath(path, self.root)[:-len('.jpg')].replace(os.sep, '/')
+
+    def _resource(self, key, path):
+        created_at = time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime(os.path.getmtime(path)))
+        return {'public_id': key, 'url': self.url(key), 'created_at': created_at}
+
+    def put(self, key, data, overwrite=True, tags=None, image_format="jpg"):
+        """שומר את התמונה כקובץ (כתיבה לקובץ זמני והחלפה, כך שקורא לא רואה קובץ חלקי)"""
+        path = self._path(key)
+        if not overwrite and os.path.exists(path):
+            return self._resource(key, path)
+
+        if hasattr(data, 'read'):
+            data = data.read()
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        temp_path = f"{path}.{threading.get_ident()}.tmp"
+        with open(temp_path, 'wb') as file:
+            file.write(data)
+        os.replace(temp_path, path)
+        return self._resource(key, path)
+
+    def get(self, key):
+        """תוכן התמונה (bytes), או None אם היא לא קיימת"""
+        try:
+            with open(self._path(key), 'rb') as file:
+                return file.read()
+        except FileNotFoundError:
+            return None
+
+    def url(self, key):
+        return f"{self.url_prefix}{quote(key)}.jpg"
+
+    def read_image(self, url):
+        """
+        מפענח תמונה מקומית ישירות מהקובץ הממופה לזיכרון (mmap) - בלי העתקה לזיכרון של התהליך.
+        URL שאינו של האחסון המקומי (למשל תמונות ישנות ב-Cloudinary) מורד כרגיל
+        """
+        if not url.startswith(self.url_prefix):
+            return download_image(url)
+
+        key = unquote(url[len(self.url_prefix):])[:-len('.jpg')]
+        try:
+            with open(self._path(key), 'rb') as file:
+                if os.fstat(file.fileno()).st_size == 0:
+                    return None
+                with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                    return decode_image(mapped)
+        except FileNotFoundError:
+            return None
+
+    def list(self, prefix):
+        """עובר על כל הקבצים שהמפתח שלהם מתחיל ב-prefix"""
+        directory = os.path.join(self.root, *prefix.split('/')[:-1])
+        for dirpath, _, filenames in os.walk(directory):
+            for filename in filenames:
+                if not filename.endswith('.jpg'):
+                    continue
+                path = os.path.join(dirpath, filename)
+                key = self._key_from_path(path)
+                if not key.startswith(prefix):
+                    continue
+                yield self._resource(key, path)
+
+    def delete(self, key):
+        try:
+            os.remove(self._path(key))
+            return True
+        except FileNotFoundError:
+            return False
+
+    def delete_prefix(self, prefix):
+        start_time = time.perf_counter()
+        deleted_count = sum(1 for resource in list(self.list(prefix)) if self.delete(resource['public_id']))
+        return {
+            'target': prefix,
+            'deleted': deleted_count,
+            'calls': 1,
+            'seconds': round(time.perf_counter() - start_time, 3)
+        }
+
+
+STORAGE_BACKENDS = {
+    CloudinaryStorage.name: CloudinaryStorage,
+    LocalStorage.name: LocalStorage
+}
+
+
+def get_storage():
+    """מחזיר את האחסון שנבחר ב-ATTENDME_STORAGE (נוצר בשימוש הראשון)"""
+    global _storage
+
+    if _storage is not None:
+        return _storage
+
+    with _storage_lock:
+        if _storage is None:
+            if STORAGE_BACKEND not in STORAGE_BACKENDS:
+                raise ValueError(f"ATTENDME_STORAGE לא מוכר: {STORAGE_BACKEND} "
+                                 f"(אפשרויות: {', '.join(STORAGE_BACKENDS)})")
+            _storage = STORAGE_BACKENDS[STORAGE_BACKEND]()
+            print_status(f"אחסון תמונות: {_storage.name}", emoji="🗄️")
+    return _storage
+
+
+def iter_resources(prefix):
+    """
+    עובר על כל המשאבים תחת prefix באחסון הפעיל
+
+    Yields:
+        dict: {'public_id', 'url', 'created_at'}
+    """
+    return get_storage().list(prefix)
+
+
+def delete_by_prefix(prefix):
+    """
+    מוחק את כל המשאבים תחת prefix באחסון הפעיל
+
+    Returns:
+        dict: {'target': prefix, 'deleted': int, 'calls': int, 'seconds': float}
+    """
+    return get_storage().delete_prefix(prefix)
+
+
+def delete_prefixes(prefixes, max_workers=DELETE_CONCURRENCY):
+    """
+    מוחק כמה prefixes במקביל
+
+    Returns:
+        dict: {'deleted': סה"כ, 'seconds': זמן כולל, 'results': תוצאה לכל prefix}
+    """
+    start_time = time.perf_counter()
+    results = []
+    with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(prefixes)))) as executor:
+        futures = {executor.submit(delete_by_prefix, prefix): prefix for prefix in prefixes}
+        for future in as_completed(futures):
+            try:
+                results.append(future.result())
+            except Exception as e:
+                print_status(f"שגיאה במחיקת {futures[future]}: {str(e)}", emoji="❌", level=1)
+                results.append({'target': futures[future], 'deleted': 0, 'calls': 0, 'seconds': 0, 'error': str(e)})
+
+    return {
+        'deleted': sum(result['deleted'] for result in results),
+        'seconds': round(time.perf_counter() - start_time, 3),
+        'results': results
+    }
@@ -1,12 +1,8 @@
-import os
+import sys
 import cv2
 import numpy as np
-from ultralytics import YOLO
-import requests
-from io import BytesIO
-import cloudinary
-import cloudinary.uploader
-import cloudinary.api
+from Face_detector import get_yolo_model, run_yolo
+from Storage import get_storage, LOCAL_STORAGE_URL_PREFIX
 
 
 def print_status(message, emoji="ℹ️", level=0):
@@ -16,20 +12,29 @@ def print_status(message, emoji="ℹ️", level=0):
 
 
 class Target:
+    # בלי __dict__ לכל מטרה; ערכי הסף משותפים לכל המטרות ברמת המחלקה
+    __slots__ = ('camera_number', 'image_url', '_is_checked', 'extracted_faces', 'faces_count',
+                 '_face_detection_enabled')
+
+    # ערכי סף לבדיקות איכות
+    FACE_SIZE_THRESHOLD = 0.01  # 1% מגודל התמונה
+    MIN_SHARPNESS = 100
+    MAX_NOISE_THRESHOLD = 50
+    MIN_CONTRAST = 30
+
     def __init__(self, camera_number, images_url, yolo_model_path="yolov8n-face.pt", enable_face_detection=False):
         # מידע אישי
         self.camera_number = camera_number
-        self.image_url = images_url
+        self.image_url = sys.intern(images_url) if type(images_url) is str else images_url
         self._is_checked = False
         self.extracted_faces = []
         self.faces_count = 0
-        self.yolo_model = None
+        self._face_detection_enabled = False
 
-        # ערכי סף לבדיקות איכות
-        self.FACE_SIZE_THRESHOLD = 0.01  # 1% מגודל התמונה
-        self.MIN_SHARPNESS = 100
-        self.MAX_NOISE_THRESHOLD = 50
-        self.MIN_CONTRAST = 30
+    @property
+    def yolo_model(self):
+        """מודל ה-YOLO המשותף של התהליך - רק אחרי שהופעל זיהוי פנים למטרה (אחרת None)"""
+        return get_yolo_model() if self._face_detection_enabled else None
 
     @property
     def is_checked(self):
@@ -113,21 +118,12 @@ class Target:
             self.faces_count = 0
 
             # אם זה URL ישיר של תמונה
-            if isinstance(self.image_url, str) and (
-                    self.image_url.startswith('http') or self.image_url.startswith('https')):
+            if isinstance(self.image_url, str) and self.image_url.startswith(('http', LOCAL_STORAGE_URL_PREFIX)):
                 try:
                     print_status(f"מעבד תמונה: {self.image_url}", level=1)
 
-                    # הורדת התמונה מ-URL
-                    response = requests.get(self.image_url)
-                    if response.status_code != 200:
-                        print_status(f"לא ניתן להוריד את התמונה", level=1, emoji="❌")
-                        return 0
-
-                    # המרה ל-OpenCV format
-                    image_bytes = BytesIO(response.content)
-                    image_array = np.frombuffer(image_bytes.getvalue(), np.uint8)
-                    img = cv2.imdecode(image_array, cv2.IMREAD_COLOR)
+                    # הורדה ופענוח דרך האחסון הפעיל (URL מקומי נקרא ישירות מהדיסק)
+                    img = get_storage().read_image(self.image_url)
 
                     if img is None:
                         print_status(f"לא ניתן לטעון את התמונה", level=1, emoji="❌")
@@ -135,7 +131,7 @@ class Target:
 
                     # זיהוי פנים
                     image_area = img.shape[0] * img.shape[1]
-                    results = self.yolo_model(img, verbose=False)[0]
+                    results = run_yolo(img, verbose=False)[0]
 
                     # בדיקה שיש boxes
                     if not hasattr(results, 'boxes') or results.boxes is None:
@@ -177,13 +173,8 @@ class Target:
                                 # יצירת שם ייחודי לפנים
                                 face_filename = f"extracted_face_{self.camera_number}_{self.faces_count + 1}_{i}"
 
-                                # העלאה ל-Cloudinary
-                                upload_result = cloudinary.uploader.upload(
-                                    img_bytes,
-                                    public_id=f"extracted_faces/{face_filename}",
-                                    resource_type="image",
-                                    folder="extracted_faces"
-                                )
+                                # שמירה באחסון
+                                upload_result = get_storage().put(f"extracted_faces/{face_filename}", img_bytes)
 
                                 # שמירת ה-public_id במערך
                                 face_public_id = upload_result['public_id']
@@ -224,15 +215,14 @@ class Target:
         return self.extracted_faces
 
     def enable_face_detection_later(self, yolo_model_path="yolov8n-face.pt"):
-        """מאפשר הפעלת זיהוי פנים לאחר יצירת האובייקט"""
+        """
+        מאפשר הפעלת זיהוי פנים לאחר יצירת האובייקט.
+        משתמש במודל ה-YOLO המשותף של התהליך (yolo_model_path נשמר לתאימות בלבד)
+        """
         try:
-            if os.path.exists(yolo_model_path):
-                self.yolo_model = YOLO(yolo_model_path)
-                print_status(f"✅ מודל YOLO נטען בהצלחה: {yolo_model_path}")
-                return self.extract_faces()  # מבצע חילוץ פנים
-            else:
-                print_status(f"❌ קובץ מודל YOLO לא נמצא: {yolo_model_path}")
-                return 0
+            get_yolo_model()
+            self._face_detection_enabled = True
+            return self.extract_faces()  # מבצע חילוץ פנים
         except Exception as e:
             print_status(f"❌ שגיאה בטעינת מודל YOLO: {str(e)}")
             return 0
@@ -0,0 +1,103 @@
+import os
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import cv2
+
+from Storage import get_storage
+
+# מספר העלאות מקבילות לאחסון, ומספר מקסימלי של תמונות שממתינות בתור (לחץ חוזר על המחלץ)
+UPLOAD_WORKERS = int(os.getenv('ATTENDME_UPLOAD_WORKERS', '8'))
+UPLOAD_MAX_PENDING = int(os.getenv('ATTENDME_UPLOAD_MAX_PENDING', '256'))
+
+_pipeline = None
+_pipeline_lock = threading.Lock()
+
+
+def print_status(message, emoji="ℹ️", level=0):
+    """פונקציה להדפסת סטטוס עם רמות הזחה - בלי כפילות"""
+    indent = "  " * level
+    log_message = f"{indent}{emoji} {message}"
+    print(log_message)
+
+
+class UploadPipeline:
+    """
+    תור העלאות לאחסון (Cloudinary או דיסק מקומי) עם מאגר workers מוגבל.
+    הקורא מקודד את התמונה ומקבל Future מיד; ההעלאה עצמה רצה ברקע.
+    """
+
+    def __init__(self, max_workers=UPLOAD_WORKERS, max_pending=UPLOAD_MAX_PENDING):
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='storage-upload')
+        self._pending = threading.BoundedSemaphore(max_pending)
+        self._stats_lock = threading.Lock()
+        self.uploaded = 0
+        self.failed = 0
+        self.upload_seconds = 0.0
+
+    def submit(self, image, public_id, folder, overwrite=True, jpeg_quality=90):
+        """
+        מקודד תמונה ל-JPEG ומכניס אותה לתור ההעלאה
+
+        Args:
+            image (numpy.ndarray): תמונת OpenCV
+            public_id (str): מזהה התמונה באחסון (בתוך התיקיה)
+            folder (str): תיקיית היעד
+            overwrite (bool): האם לדרוס תמונה קיימת
+            jpeg_quality (int): איכות הקידוד
+
+        Returns:
+            Future: מחזיר {'public_id', 'url'} בהצלחה או None בכישלון; None אם הקידוד נכשל
+        """
+        success, buffer = cv2.imencode('.jpg', image, [cv2.IMWRITE_JPEG_QUALITY, jpeg_quality])
+        if not success:
+            return None
+        return self.submit_bytes(buffer.tobytes(), public_id, folder, overwrite)
+
+    def submit_bytes(self, data, public_id, folder, overwrite=True):
+        """מכניס תמונה מקודדת (bytes) לתור ההעלאה ומחזיר Future"""
+        # אם התור מלא - המתנה עד שהעלאה תסתיים, כדי לא לצבור תמונות בזיכרון ללא גבול
+        self._pending.acquire()
+        try:
+            future = self._executor.submit(self._upload, data, public_id, folder, overwrite)
+        except Exception:
+            self._pending.release()
+            raise
+        future.add_done_callback(lambda _: self._pending.release())
+        return future
+
+    def _upload(self, data, public_id, folder, overwrite):
+        start_time = time.perf_counter()
+        try:
+            result = get_storage().put(f"{folder}/{public_id}", data, overwrite=overwrite)
+            with self._stats_lock:
+                self.uploaded += 1
+                self.upload_seconds += time.perf_counter() - start_time
+            return {'public_id': result['public_id'], 'url': result['url']}
+
+        except Exception as e:
+            with self._stats_lock:
+                self.failed += 1
+            print_status(f"שגיאה בהעלאה לאחסון ({public_id}): {str(e)}", emoji="❌", level=2)
+            return None
+
+    def get_stats(self):
+        with self._stats_lock:
+            return {
+                'uploaded': self.uploaded,
+                'failed': self.failed,
+                'upload_seconds': round(self.upload_seconds, 2)
+            }
+
+
+def get_upload_pipeline():
+    """מחזיר את תור ההעלאות המשותף לכל התהליך (נוצר בשימוש הראשון, אחרי fork של gunicorn)"""
+    global _pipeline
+
+    if _pipeline is not None:
+        return _pipeline
+
+    with _pipeline_lock:
+        if _pipeline is None:
+            _pipeline = UploadPipeline()
+    return _pipeline
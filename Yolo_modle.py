@@ -1,15 +1,25 @@
 from Data_Manage import validate_school_index, schools_database
 
-import numpy as np
-from ultralytics import YOLO
-from io import BytesIO
-import requests
 import os
 import cv2
 import tempfile
+import time
+import threading
+from functools import partial
+from concurrent.futures import ThreadPoolExecutor, as_completed
 import cloudinary
-import cloudinary.uploader
-import cloudinary.api
+
+from Face_detector import get_yolo_model, detect_faces_batch, YOLO_BATCH_SIZE
+from Upload_pipeline import get_upload_pipeline
+from Face_store import start_run, finish_run, fail_run, clear_school, wait_for_archival
+from Storage import get_storage, iter_resources, delete_by_prefix, delete_prefixes, LOCAL_STORAGE_URL_PREFIX
+from Face_index import (record_image, record_images, remove_images, query_gallery, is_backfilled, mark_backfilled,
+                        now_timestamp, KIND_FACE, KIND_MATCH, KIND_UNKNOWN)
+
+# מספר הורדות מקבילות של תמונות מצלמה לכל בית ספר
+CAMERA_FETCH_CONCURRENCY = int(os.getenv('ATTENDME_CAMERA_FETCH_CONCURRENCY', '8'))
+_school_fetch_semaphores = {}
+_school_fetch_lock = threading.Lock()
 
 # הגדרת Cloudinary
 cloudinary.config(
@@ -27,42 +37,45 @@ def print_status(message, emoji="ℹ️", level=0):
     print(log_message)
 
 
-def save_face_to_cloudinary(face_image, school_index, face_counter, camera_number=None):
-    """שומר תמונת פנים ל-Cloudinary"""
-    try:
-        success, buffer = cv2.imencode('.jpg', face_image, [cv2.IMWRITE_JPEG_QUALITY, 90])
-        if not success:
-            return False
+def queue_face_upload(face_image, school_index, face_counter, camera_number=None, run_id=None):
+    """
+    מכניס תמונת פנים לתור ההעלאות ל-Cloudinary בלי להמתין. בסיום מוצלח הפנים נרשמות באינדקס המקומי
 
-        camera_suffix = f"_cam{camera_number}" if camera_number else ""
-        public_id = f"school_{school_index}/face_{face_counter}{camera_suffix}"
+    Returns:
+        Future: מחזיר {'public_id', 'url'} או None; None אם הקידוד נכשל
+    """
+    public_id = face_public_id(school_index, face_counter, camera_number)
+    future = get_upload_pipeline().submit(face_image, public_id, folder="attendance_faces", overwrite=True,
+                                          jpeg_quality=90)
+    if future is not None:
+        future.add_done_callback(partial(_index_uploaded_face, school_index, camera_number, run_id))
+    return future
 
-        result = cloudinary.uploader.upload(
-            buffer.tobytes(),
-            public_id=public_id,
-            folder="attendance_faces",
-            overwrite=True,
-            resource_type="image",
-            format="jpg"
-        )
 
-        return True
+def _index_uploaded_face(school_index, camera_number, run_id, future):
+    """רושם באינדקס פנים שהועלו בהצלחה"""
+    uploaded = future.result()
+    if uploaded is not None:
+        record_image(uploaded['public_id'], school_index, KIND_FACE, uploaded['url'], camera_number=camera_number,
+                     run_id=run_id)
 
-    except Exception as e:
-        print_status(f"שגיאה בהעלאה ל-Cloudinary: {str(e)}", emoji="❌", level=2)
-        return False
+
+def face_public_id(school_index, face_counter, camera_number=None):
+    """מזהה הפנים בתוך תיקיית attendance_faces"""
+    camera_suffix = f"_cam{camera_number}" if camera_number else ""
+    return f"school_{school_index}/face_{face_counter}{camera_suffix}"
 
 
 def delete_school_faces_from_cloudinary(school_index):
     """מוחק פנים קודמות של בית ספר מ-Cloudinary"""
     try:
-        folder_path = f"attendance_faces/school_{school_index}"
-        result = cloudinary.api.resources(type="upload", prefix=folder_path, max_results=500)
+        folder_path = f"attendance_faces/school_{school_index}/"
+        result = delete_by_prefix(folder_path)
+        remove_images(school_index, (KIND_FACE,))
 
-        if result.get('resources'):
-            public_ids = [resource['public_id'] for resource in result['resources']]
-            cloudinary.api.delete_resources(public_ids)
-            print_status(f"נמחקו {len(public_ids)} פנים קודמות מ-Cloudinary", emoji="🧹", level=1)
+        if result['deleted']:
+            print_status(f"נמחקו {result['deleted']} פנים קודמות מ-Cloudinary ({result['seconds']}s)", emoji="🧹",
+                         level=1)
 
     except Exception as e:
         print_status(f"שגיאה במחיקת פנים קודמות: {str(e)}", emoji="⚠️", level=1)
@@ -71,14 +84,13 @@ def delete_school_faces_from_cloudinary(school_index):
 def get_school_faces_from_cloudinary(school_index):
     """מחזיר רשימת פנים של בית ספר מ-Cloudinary"""
     try:
-        folder_path = f"attendance_faces/school_{school_index}"
-        result = cloudinary.api.resources(type="upload", prefix=folder_path, max_results=500)
+        folder_path = f"attendance_faces/school_{school_index}/"
 
         faces = []
-        for resource in result.get('resources', []):
+        for resource in iter_resources(folder_path):
             faces.append({
                 'public_id': resource['public_id'],
-                'url': resource['secure_url'],
+                'url': resource['url'],
                 'filename': resource['public_id'].split('/')[-1] + '.jpg'
             })
 
@@ -89,8 +101,15 @@ def get_school_faces_from_cloudinary(school_index):
         return []
 
 
-def save_detected_match_to_cloudinary(match_image, school_index, person_first_name, person_last_name, person_id):
-    """שומר תמונת התאמה מזוהה ל-Cloudinary"""
+def save_detected_match_to_cloudinary(match_image, school_index, person_first_name, person_last_name, person_id,
+                                      match_number=None, scores=None):
+    """
+    שומר תמונת התאמה מזוהה ל-Cloudinary ורושם אותה באינדקס המקומי
+
+    Args:
+        match_number (int, optional): מספר סידורי כשיש כמה התאמות לאותו אדם
+        scores (dict, optional): {'primary_score', 'secondary_score', 'final_score'}
+    """
     try:
         from datetime import datetime
 
@@ -99,16 +118,14 @@ def save_detected_match_to_cloudinary(match_image, school_index, person_first_na
             return False
 
         timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        public_id = f"school_{school_index}/match_{person_first_name}_{person_last_name}_{person_id}_{timestamp}"
+        id_suffix = f"{person_id}_{match_number}" if match_number is not None else person_id
+        public_id = f"school_{school_index}/match_{person_first_name}_{person_last_name}_{id_suffix}_{timestamp}"
+
+        result = get_storage().put(f"detected_matches/{public_id}", buffer.tobytes(), overwrite=False)
 
-        result = cloudinary.uploader.upload(
-            buffer.tobytes(),
-            public_id=public_id,
-            folder="detected_matches",
-            overwrite=False,
-            resource_type="image",
-            format="jpg"
-        )
+        record_image(result['public_id'], school_index, KIND_MATCH, result['url'],
+                     created_at=result.get('created_at'), person_id=person_id, first_name=person_first_name,
+                     last_name=person_last_name, **(scores or {}))
 
         print_status(f"התאמה נשמרה ב-Cloudinary: {person_first_name} {person_last_name}", emoji="📸", level=3)
         return True
@@ -118,16 +135,120 @@ def save_detected_match_to_cloudinary(match_image, school_index, person_first_na
         return False
 
 
-def extract_all_faces_from_cameras(school_index):
+def _load_target_frame(target, target_index):
+    """מוריד ומפענח את תמונת המטרה. מחזיר תמונת OpenCV או None"""
+    # קבלת URL התמונה
+    image_url = target.image_url
+
+    if not image_url or not isinstance(image_url, str):
+        print_status(f"URL לא תקין עבור target {target_index + 1}", emoji="⚠️")
+        return None
+
+    if not image_url.startswith(('http', LOCAL_STORAGE_URL_PREFIX)):
+        print_status(f"URL לא נתמך עבור target {target_index + 1}", emoji="⚠️")
+        return None
+
+    try:
+        # הורדה ופענוח דרך האחסון הפעיל (URL מקומי נקרא ישירות מהדיסק)
+        print_status(f"מוריד תמונה מ-URL...", emoji="📥", level=1)
+        img = get_storage().read_image(image_url)
+
+        if img is None:
+            print_status(f"לא ניתן לטעון תמונה מ-target {target_index + 1}", emoji="❌")
+            return None
+
+        print_status(f"תמונה נטענה בהצלחה (גודל: {img.shape[1]}x{img.shape[0]})", emoji="✅", level=1)
+        return img
+
+    except Exception as target_error:
+        print_status(f"שגיאה בעיבוד target {target_index + 1}: {str(target_error)}", emoji="❌")
+        return None
+
+
+def _get_school_fetch_semaphore(school_index):
+    """מגביל את מספר ההורדות המקבילות לכל בית ספר (גם בין ריצות מקבילות של אותו בית ספר)"""
+    with _school_fetch_lock:
+        if school_index not in _school_fetch_semaphores:
+            _school_fetch_semaphores[school_index] = threading.BoundedSemaphore(CAMERA_FETCH_CONCURRENCY)
+        return _school_fetch_semaphores[school_index]
+
+
+def _fetch_target_frame(target, target_index, school_semaphore):
+    """הורדה ופענוח של תמונת מטרה בתוך מגבלת המקביליות של בית הספר. מחזיר (תמונה, שניות)"""
+    with school_semaphore:
+        start_time = time.perf_counter()
+        img = _load_target_frame(target, target_index)
+        return img, time.perf_counter() - start_time
+
+
+def _queue_frame_faces(img, boxes, school_index, face_counter, camera_number, target_index, face_run):
+    """
+    חותך את כל הפנים שזוהו בתמונה אחת, שומר אותן בריצה (בזיכרון) ומכניס אותן לתור ההעלאות
+
+    Returns:
+        list: רשימת (מספר פנים, Future) - המספור ממשיך מ-face_counter
+    """
+    if len(boxes) == 0:
+        print_status(f"לא נמצאו פנים ב-target {target_index + 1}", emoji="⚠️")
+        return []
+
+    print_status(f"נמצאו {len(boxes)} פנים ב-target {target_index + 1}", emoji="📊", level=1)
+
+    queued = []
+    for box_index, (x1, y1, x2, y2) in enumerate(boxes):
+        try:
+            # בדיקת תקינות קואורדינטות
+            if x2 <= x1 or y2 <= y1:
+                print_status(f"קואורדינטות לא תקינות עבור פנים {box_index + 1}", emoji="⚠️", level=2)
+                continue
+
+            # חיתוך הפנים
+            face = img[y1:y2, x1:x2]
+
+            if face.size == 0:
+                print_status(f"פנים ריקות עבור פנים {box_index + 1}", emoji="⚠️", level=2)
+                continue
+
+            # העתק של החיתוך נשמר בזיכרון לבדיקת הנוכחות; ההעלאה ל-Cloudinary רצה ברקע כארכיון
+            current_counter = face_counter + len(queued)
+            face = face.copy()
+            future = queue_face_upload(face, school_index, current_counter, camera_number, face_run.run_id)
+            if future is None:
+                print_status(f"שגיאה בקידוד פנים מ-target {target_index + 1}", emoji="❌", level=2)
+                continue
+
+            face_run.add_face(face_public_id(school_index, current_counter, camera_number), face, future)
+            queued.append((current_counter, future))
+
+        except Exception as face_error:
+            print_status(f"שגיאה בעיבוד פנים מ-target {target_index + 1}: {str(face_error)}", emoji="❌", level=2)
+            continue
+
+    return queued
+
+
+def _report_progress(on_progress, stage, status, **details):
+    """שולח אירוע התקדמות (לזרם SSE או למשימת רקע) אם הוגדר צרכן"""
+    if on_progress is None:
+        return
+    try:
+        on_progress({'stage': stage, 'status': status, **details})
+    except Exception as e:
+        print_status(f"שגיאה בדיווח התקדמות: {str(e)}", emoji="⚠️", level=1)
+
+
+def extract_all_faces_from_cameras(school_index, on_progress=None):
     """
     מחלצת פנים מכל תמונות המטרה של בית ספר ספציפי ושומרת אותן ב-Cloudinary
 
     Args:
         school_index (int): מספר בית הספר במערכת
+        on_progress (callable, optional): מקבל מילון {'stage': 'detect', 'status', ...} בכל שלב
 
     Returns:
         dict: {'success': bool, 'faces_extracted': int, 'message': str, 'school_name': str}
     """
+    face_run = None
     try:
         # בדיקת תקינות האינדקס
         is_valid, error_msg = validate_school_index(school_index)
@@ -154,35 +275,15 @@ def extract_all_faces_from_cameras(school_index):
                 'school_name': school.school_name
             }
 
-        # מחיקת פנים קודמות מ-Cloudinary
+        # ריצה חדשה בזיכרון - ממתינה קודם שהעלאות של ריצות קודמות יסתיימו, ואז מחיקת פנים קודמות מ-Cloudinary
+        face_run = start_run(school_index)
         delete_school_faces_from_cloudinary(school_index)
 
-        # בדיקה וטעינת/יצירת מודל YOLO ספציפי לפנים
-        yolo_model_path = "face_yolov8n.pt"
-
+        # מודל YOLO משותף לכל התהליך - נטען פעם אחת בלבד
         try:
-            if os.path.exists(yolo_model_path):
-                # המודל קיים - טוען אותו
-                print_status(f"נמצא מודל פנים זמני", emoji="📁")
-                yolo_model = YOLO(yolo_model_path)
-                print_status("מודל פנים קיים נטען בהצלחה", emoji="✅")
-            else:
-                # המודל לא קיים - יוצר/מוריד מודל ספציפי לפנים
-                print_status("מודל פנים לא נמצא, מוריד מודל ספציפי לזיהוי פנים...", emoji="📥")
-
-                try:
-                    # אפשרות 1: מודל YOLOv8 מותאם לפנים (מומלץ)
-                    yolo_model = YOLO('yolov8n-face.pt')  # מודל ספציפי לפנים
-                except:
-                    # אפשרות 2: מודל רגיל אם הספציפי לא עובד
-                    print_status("מנסה מודל רגיל...", emoji="🔄")
-                    yolo_model = YOLO('yolov8n.pt')
-
-                # שמירה זמנית
-                yolo_model.save(yolo_model_path)
-                print_status(f"מודל פנים זמני נשמר", emoji="💾")
-
+            get_yolo_model()
         except Exception as e:
+            fail_run(face_run, str(e))
             return {
                 'success': False,
                 'faces_extracted': 0,
@@ -195,106 +296,89 @@ def extract_all_faces_from_cameras(school_index):
         total_faces_extracted = 0
 
         print_status(f"מעבד {len(targets_vector)} מטרות של בית הספר {school.school_name}", emoji="📊", level=1)
-
-        # מעבר על כל targets של בית הספר הספציפי
-        for target_index, target in enumerate(targets_vector):
-            camera_number = getattr(target, 'camera_number', target_index + 1)
-            print_status(f"מעבד תמונת מטרה {target_index + 1}: מצלמה {camera_number}", emoji="🔍")
-
-            # קבלת URL התמונה
-            image_url = target.image_url
-
-            if not image_url or not isinstance(image_url, str):
-                print_status(f"URL לא תקין עבור target {target_index + 1}", emoji="⚠️")
-                continue
-
-            if not (image_url.startswith('http') or image_url.startswith('https')):
-                print_status(f"URL לא נתמך עבור target {target_index + 1}", emoji="⚠️")
-                continue
-
-            try:
-                # הורדת התמונה
-                print_status(f"מוריד תמונה מ-URL...", emoji="📥", level=1)
-                response = requests.get(image_url, timeout=10)
-                if response.status_code != 200:
-                    print_status(f"לא ניתן להוריד תמונה מ-target {target_index + 1}", emoji="❌")
-                    continue
-
-                # המרה ל-OpenCV format
-                image_bytes = BytesIO(response.content)
-                image_array = np.frombuffer(image_bytes.getvalue(), np.uint8)
-                img = cv2.imdecode(image_array, cv2.IMREAD_COLOR)
-
+        _report_progress(on_progress, 'detect', 'started', total_frames=len(targets_vector))
+        frames_done = 0
+
+        timings = {'fetch_seconds': 0.0, 'fetch_wall_seconds': 0.0, 'detect_seconds': 0.0, 'save_seconds': 0.0}
+        run_start = time.perf_counter()
+
+        def process_batch(batch):
+            """זיהוי פנים באצווה אחת של תמונות, ואז חיתוך והכנסה לתור ההעלאות"""
+            nonlocal face_counter, frames_done
+
+            print_status(f"מתחיל זיהוי פנים ב-YOLO עבור {len(batch)} תמונות...", emoji="🔍", level=1)
+            detect_start = time.perf_counter()
+            boxes_per_frame = detect_faces_batch([img for _, _, img in batch])
+            timings['detect_seconds'] += time.perf_counter() - detect_start
+
+            save_start = time.perf_counter()
+            for (target_index, camera_number, img), boxes in zip(batch, boxes_per_frame):
+                queued = _queue_frame_faces(img, boxes, school_index, face_counter, camera_number, target_index,
+                                            face_run)
+                face_counter += len(queued)
+            timings['save_seconds'] += time.perf_counter() - save_start
+
+            frames_done += len(batch)
+            _report_progress(on_progress, 'detect', 'running', processed_frames=frames_done,
+                             total_frames=len(targets_vector), faces=face_counter - 1)
+
+        # הורדה ופענוח במקביל (מוגבל לכל בית ספר); תמונות עוברות לזיהוי באצוות ברגע שהן מגיעות
+        school_semaphore = _get_school_fetch_semaphore(school_index)
+        with ThreadPoolExecutor(max_workers=CAMERA_FETCH_CONCURRENCY) as executor:
+            futures = {}
+            for target_index, target in enumerate(targets_vector):
+                camera_number = getattr(target, 'camera_number', target_index + 1)
+                print_status(f"מעבד תמונת מטרה {target_index + 1}: מצלמה {camera_number}", emoji="🔍")
+                future = executor.submit(_fetch_target_frame, target, target_index, school_semaphore)
+                futures[future] = (target_index, camera_number)
+
+            pending_batch = []
+            for future in as_completed(futures):
+                target_index, camera_number = futures[future]
+                img, fetch_seconds = future.result()
+                timings['fetch_seconds'] += fetch_seconds
                 if img is None:
-                    print_status(f"לא ניתן לטעון תמונה מ-target {target_index + 1}", emoji="❌")
                     continue
 
-                print_status(f"תמונה נטענה בהצלחה (גודל: {img.shape[1]}x{img.shape[0]})", emoji="✅", level=1)
+                pending_batch.append((target_index, camera_number, img))
+                if len(pending_batch) >= YOLO_BATCH_SIZE:
+                    process_batch(pending_batch)
+                    pending_batch = []
 
-                # זיהוי פנים
-                print_status("מתחיל זיהוי פנים ב-YOLO...", emoji="🔍", level=1)
-                results = yolo_model(img, verbose=False)[0]
+            timings['fetch_wall_seconds'] = time.perf_counter() - run_start
+            if pending_batch:
+                process_batch(pending_batch)
 
-                if not hasattr(results, 'boxes') or results.boxes is None:
-                    print_status(f"לא נמצאו פנים ב-target {target_index + 1}", emoji="⚠️")
-                    continue
+        # הפנים זמינות לבדיקת הנוכחות מהזיכרון מיד; ההעלאות ממשיכות ברקע
+        finish_run(face_run)
+        total_faces_extracted = len(face_run.faces)
+        pending_uploads = face_run.pending_uploads()
 
-                num_faces = len(results.boxes)
-                print_status(f"נמצאו {num_faces} פנים ב-target {target_index + 1}", emoji="📊", level=1)
-
-                # חילוץ כל פנים
-                for box_index, box in enumerate(results.boxes):
-                    try:
-                        # קבלת קואורדינטות
-                        x1, y1, x2, y2 = map(int, box.xyxy[0])
-
-                        # בדיקת תקינות קואורדינטות
-                        if x2 <= x1 or y2 <= y1:
-                            print_status(f"קואורדינטות לא תקינות עבור פנים {box_index + 1}", emoji="⚠️", level=2)
-                            continue
-
-                        # חיתוך הפנים
-                        face = img[y1:y2, x1:x2]
-
-                        if face.size == 0:
-                            print_status(f"פנים ריקות עבור פנים {box_index + 1}", emoji="⚠️", level=2)
-                            continue
-
-                        # שמירת הפנים ב-Cloudinary
-                        success = save_face_to_cloudinary(face, school_index, face_counter, camera_number)
-
-                        if success:
-                            print_status(f"נשמרו פנים ב-Cloudinary: face_{face_counter} (גודל: {x2 - x1}x{y2 - y1})",
-                                         emoji="✅", level=2)
-                            face_counter += 1
-                            total_faces_extracted += 1
-                        else:
-                            print_status(f"שגיאה בשמירת פנים ב-Cloudinary מ-target {target_index + 1}", emoji="❌",
-                                         level=2)
-
-                    except Exception as face_error:
-                        print_status(f"שגיאה בעיבוד פנים מ-target {target_index + 1}: {str(face_error)}", emoji="❌",
-                                     level=2)
-                        continue
-
-            except Exception as target_error:
-                print_status(f"שגיאה בעיבוד target {target_index + 1}: {str(target_error)}", emoji="❌")
-                continue
+        timings['total_seconds'] = time.perf_counter() - run_start
+        timings = {stage: round(seconds, 3) for stage, seconds in timings.items()}
 
         # סיכום
-        message = f"הושלם חילוץ פנים עבור {school.school_name}: {total_faces_extracted} פנים נשמרו ב-Cloudinary"
+        message = f"הושלם חילוץ פנים עבור {school.school_name}: {total_faces_extracted} פנים נשמרו"
         print_status(message, emoji="🎉")
+        print_status(f"זמנים: הורדה {timings['fetch_seconds']}s (מצטבר), זיהוי {timings['detect_seconds']}s, "
+                     f"חיתוך {timings['save_seconds']}s, סה\"כ {timings['total_seconds']}s", emoji="⏱️", level=1)
+        print_status(f"{pending_uploads} העלאות ל-Cloudinary ממשיכות ברקע", emoji="☁️", level=1)
+        _report_progress(on_progress, 'detect', 'completed', faces=total_faces_extracted, timings=timings)
 
         return {
             'success': True,
             'faces_extracted': total_faces_extracted,
             'message': message,
-            'school_name': school.school_name
+            'school_name': school.school_name,
+            'run_id': face_run.run_id,
+            'pending_uploads': pending_uploads,
+            'timings': timings
         }
 
     except Exception as e:
         error_message = f"שגיאה כללית בחילוץ פנים: {str(e)}"
         print_status(error_message, emoji="❌")
+        fail_run(face_run, str(e))
         return {
             'success': False,
             'faces_extracted': 0,
@@ -305,7 +389,7 @@ def extract_all_faces_from_cameras(school_index):
 
 # הוסף את הפונקציות האלו לקובץ Yolo_modle.py
 
-def save_unidentified_faces_after_attendance(school_index, faces_from_cloudinary, identified_faces):
+def save_unidentified_faces_after_attendance(school_index, faces_from_cloudinary, identified_faces, image_cache=None):
     """
     שומר פנים לא מזוהים אחרי בדיקת נוכחות - באותה תיקיה עם prefix שונה
 
@@ -313,6 +397,7 @@ def save_unidentified_faces_after_attendance(school_index, faces_from_cloudinary
         school_index (int): מספר בית הספר
         faces_from_cloudinary (list): כל הפנים מהמצלמות
         identified_faces (set): פנים שכבר זוהו (filenames)
+        image_cache (ImageCache, optional): קאש התמונות של ריצת הנוכחות
 
     Returns:
         int: כמות פנים לא מזוהים שנשמרו
@@ -341,8 +426,11 @@ def save_unidentified_faces_after_attendance(school_index, faces_from_cloudinary
 
         for i, face_data in enumerate(unidentified_faces):
             try:
-                # הורד תמונה לזיכרון
-                face_image = download_image_to_memory(face_data['url'])
+                # תמונה מהקאש של הריצה (או הורדה אם אין קאש)
+                if image_cache is not None:
+                    face_image = image_cache.get(face_data['url'])
+                else:
+                    face_image = download_image_to_memory(face_data['url'])
                 if face_image is None:
                     continue
 
@@ -354,15 +442,14 @@ def save_unidentified_faces_after_attendance(school_index, faces_from_cloudinary
                 # שמירה באותה תיקיה עם prefix שונה
                 public_id = f"school_{school_index}/unknown_face_{i + 1}_{timestamp}"
 
-                result = cloudinary.uploader.upload(
+                result = get_storage().put(
+                    f"detected_matches/{public_id}",  # אותה תיקיה!
                     buffer.tobytes(),
-                    public_id=public_id,
-                    folder="detected_matches",  # אותה תיקיה!
                     overwrite=False,
-                    resource_type="image",
-                    format="jpg",
                     tags=[f"school_{school_index}", "unidentified"]  # תגים לזיהוי
                 )
+                record_image(result['public_id'], school_index, KIND_UNKNOWN, result['url'],
+                             created_at=result.get('created_at'))
 
                 print_status(f"פנים לא מזוהים נשמרו: unknown_face_{i + 1}", emoji="❓", level=3)
                 saved_count += 1
@@ -380,120 +467,113 @@ def save_unidentified_faces_after_attendance(school_index, faces_from_cloudinary
 
 
 def download_image_to_memory(image_url):
-    """מוריד תמונה מ-URL ומחזיר אותה כ-OpenCV image בזיכרון"""
+    """טוען תמונה לפי URL (מהאחסון הפעיל) ומחזיר אותה כ-OpenCV image בזיכרון"""
     try:
-        response = requests.get(image_url, timeout=10)
-        if response.status_code == 200:
-            image_array = np.frombuffer(response.content, np.uint8)
-            img = cv2.imdecode(image_array, cv2.IMREAD_COLOR)
-            return img
-        return None
+        return get_storage().read_image(image_url)
     except Exception as e:
         print_status(f"שגיאה בהורדת תמונה: {str(e)}", emoji="❌", level=2)
         return None
 
 
-def get_all_matches_for_school(school_index, include_unidentified=True, limit=100):
+def _match_resource_to_index_row(resource, school_index):
+    """משאב מ-Cloudinary → שורה באינדקס (שמות ות"ז מתוך שם הקובץ). None אם זה לא קובץ התאמה"""
+    filename = resource['public_id'].split('/')[-1]
+    row = {
+        'public_id': resource['public_id'],
+        'school_index': school_index,
+        'url': resource['url'],
+        'created_at': resource.get('created_at') or now_timestamp()
+    }
+
+    if filename.startswith('match_'):
+        # חילוץ פרטים: match_יוסי_כהן_123456789_20250803
+        parts = filename.split('_')
+        row['kind'] = KIND_MATCH
+        if len(parts) >= 4:
+            row['first_name'] = parts[1]
+            row['last_name'] = parts[2]
+            row['person_id'] = parts[3]
+        return row
+
+    if filename.startswith('unknown_'):
+        row['kind'] = KIND_UNKNOWN
+        return row
+
+    return None
+
+
+def _backfill_matches_index(school_index):
+    """ממלא את האינדקס המקומי מ-Cloudinary פעם אחת לבית ספר (התאמות שנשמרו לפני שהיה אינדקס)"""
+    folder_path = f"detected_matches/school_{school_index}/"
+    rows = [row for row in (_match_resource_to_index_row(resource, school_index)
+                            for resource in iter_resources(folder_path)) if row is not None]
+    record_images(rows)
+    mark_backfilled(school_index)
+    print_status(f"אינדקס ההתאמות של בית ספר {school_index} מולא מ-Cloudinary: {len(rows)} תמונות", emoji="🗂️",
+                 level=1)
+
+
+def get_all_matches_for_school(school_index, include_unidentified=True, limit=100, offset=0):
     """
-    מחזיר את כל ההתאמות - מזוהות ולא מזוהות מאותה תיקיה
+    מחזיר את כל ההתאמות - מזוהות ולא מזוהות - מהאינדקס המקומי, עם עימוד
 
     Args:
         school_index (int): מספר בית הספר
         include_unidentified (bool): האם לכלול לא מזוהים
-        limit (int): מגבלת תוצאות
+        limit (int): מגבלת תוצאות לעמוד
+        offset (int): כמה תוצאות לדלג
 
     Returns:
-        dict: {'identified': [...], 'unidentified': [...]}
+        dict: {'identified': [...], 'unidentified': [...], 'faces': [...], 'total': int, ...}
     """
     try:
-        folder_path = f"detected_matches/school_{school_index}"
-        result = cloudinary.api.resources(type="upload", prefix=folder_path, max_results=limit)
-
-        identified = []
-        unidentified = []
-
-        for resource in result.get('resources', []):
-            filename = resource['public_id'].split('/')[-1]
-
-            # בדוק אם זה מזוהה או לא מזוהה לפי prefix
-            if filename.startswith('match_'):
-                # מזוהה
-                parts = filename.split('_')
-                match_info = {
-                    'url': resource['secure_url'],
-                    'created_at': resource.get('created_at'),
-                    'is_identified': True,
-                    'type': 'identified',
-                    'filename': filename
-                }
-
-                # חילוץ פרטים: match_יוסי_כהן_123456789_20250803
-                if len(parts) >= 4:
-                    match_info['first_name'] = parts[1]
-                    match_info['last_name'] = parts[2]
-                    match_info['person_id'] = parts[3]
-
-                identified.append(match_info)
-
-            elif filename.startswith('unknown_') and include_unidentified:
-                # לא מזוהה
-                face_info = {
-                    'url': resource['secure_url'],
-                    'created_at': resource.get('created_at'),
-                    'is_identified': False,
-                    'type': 'unidentified',
-                    'filename': filename,
-                    'first_name': 'לא מזוהה',
-                    'last_name': '',
-                    'person_id': ''
-                }
-                unidentified.append(face_info)
-
-        # מיון לפי תאריך (החדשים ראשונים)
-        identified.sort(key=lambda x: x.get('created_at', ''), reverse=True)
-        unidentified.sort(key=lambda x: x.get('created_at', ''), reverse=True)
+        # בפעם הראשונה לבית ספר - מילוי האינדקס מ-Cloudinary; מאז כל שמירה מעדכנת אותו ישירות
+        if not is_backfilled(school_index):
+            _backfill_matches_index(school_index)
+
+        page = query_gallery(school_index, include_unidentified, limit, offset)
+        faces = page['faces']
 
         return {
-            'identified': identified,
-            'unidentified': unidentified,
-            'total_identified': len(identified),
-            'total_unidentified': len(unidentified)
+            'identified': [face for face in faces if face['is_identified']],
+            'unidentified': [face for face in faces if not face['is_identified']],
+            'faces': faces,
+            'total': page['total'],
+            'total_identified': page['total_identified'],
+            'total_unidentified': page['total_unidentified']
         }
 
     except Exception as e:
         print_status(f"שגיאה בקריאת התאמות: {str(e)}", emoji="❌")
-        return {'identified': [], 'unidentified': [], 'total_identified': 0, 'total_unidentified': 0}
+        return {'identified': [], 'unidentified': [], 'faces': [], 'total': 0, 'total_identified': 0,
+                'total_unidentified': 0}
 
 
 # עדכון הפונקציה הקיימת
 def delete_all_detected_matches(school_index):
     """מוחק את כל ההתאמות של בית ספר - מזוהות ולא מזוהות (כולם באותה תיקיה)"""
     try:
-        total_deleted = 0
-
-        # 1. מחק תמונות התאמה (detected_matches) - כולל מזוהות ולא מזוהות
-        detected_folder = f"detected_matches/school_{school_index}"
-        detected_result = cloudinary.api.resources(type="upload", prefix=detected_folder, max_results=500)
-
-        if detected_result.get('resources'):
-            detected_ids = [resource['public_id'] for resource in detected_result['resources']]
-            cloudinary.api.delete_resources(detected_ids)
-            deleted_detected = len(detected_ids)
-            total_deleted += deleted_detected
-            print_status(f"נמחקו {deleted_detected} התאמות (מזוהות + לא מזוהות)", emoji="🗑️")
-
-        # 2. מחק פנים מהמצלמות (attendance_faces)
-        attendance_folder = f"attendance_faces/school_{school_index}"
-        attendance_result = cloudinary.api.resources(type="upload", prefix=attendance_folder, max_results=500)
-
-        if attendance_result.get('resources'):
-            attendance_ids = [resource['public_id'] for resource in attendance_result['resources']]
-            cloudinary.api.delete_resources(attendance_ids)
-            deleted_attendance = len(attendance_ids)
-            total_deleted += deleted_attendance
-            print_status(f"נמחקו {deleted_attendance} פנים מהמצלמות", emoji="🗑️")
-
-        print_status(f"סה״כ נמחקו {total_deleted} תמונות מ-Cloudinary", emoji="🗑️")
+        # מחיקה לפי prefix, שתי התיקיות במקביל:
+        # 1. תמונות התאמה (detected_matches) - כולל מזוהות ולא מזוהות
+        # 2. פנים מהמצלמות (attendance_faces)
+        detected_folder = f"detected_matches/school_{school_index}/"
+        attendance_folder = f"attendance_faces/school_{school_index}/"
+
+        # העלאות שעדיין רצות ברקע היו מחזירות פנים אחרי המחיקה
+        wait_for_archival(school_index)
+        deletion = delete_prefixes([detected_folder, attendance_folder])
+
+        for result in deletion['results']:
+            description = "התאמות (מזוהות + לא מזוהות)" if result['target'] == detected_folder else "פנים מהמצלמות"
+            print_status(f"נמחקו {result['deleted']} {description} ({result['calls']} קריאות, {result['seconds']}s)",
+                         emoji="🗑️")
+
+        # הפנים של הריצה האחרונה נמחקו גם מהזיכרון ומהאינדקס
+        clear_school(school_index)
+        remove_images(school_index)
+
+        total_deleted = deletion['deleted']
+        print_status(f"סה״כ נמחקו {total_deleted} תמונות מ-Cloudinary ({deletion['seconds']}s)", emoji="🗑️")
         return total_deleted
 
     except Exception as e:
@@ -22,24 +22,30 @@
 from Data_Manage import (add_new_person, remove_person, get_all_people, get_person,
                          update_person, toggle_presence, add_new_target, remove_target,
                          get_all_targets, clear_all_targets, login_user, register_school,
-                         add_new_image_url)
+                         add_new_image_url, resolve_person_ids, mark_all_presence, set_presence_for_people,
+                         get_attendance_summary)
 
-from Attend_Manage import (extract_faces_from_cameras, check_attendance_for_people,
-                           check_attendance_for_selected_people)
+from Attend_Manage import (enqueue_face_extraction, enqueue_attendance_check, enqueue_attendance_pipeline)
+from Job_manager import get_job, list_jobs
+from Storage import get_storage, LocalStorage
 
-from flask import Flask, render_template, request, session, redirect, url_for, flash, jsonify
+from Model_registry import warm_up_models, get_models_status
+from Face_detector import warm_up_yolo, get_yolo_status
+
+from flask import (Flask, render_template, request, session, redirect, url_for, flash, jsonify, Response,
+                   stream_with_context, send_from_directory, abort)
 from flask_cors import CORS
 from functools import wraps
 import os
 import time
+import json
+import queue
 import logging
 from dotenv import load_dotenv
 
 load_dotenv()
 
 import cloudinary
-import cloudinary.uploader
-import cloudinary.api
 
 # הגדרת Cloudinary
 cloudinary.config(
@@ -49,9 +55,6 @@ cloudinary.config(
     secure=True
 )
 
-# נתיבי קבצים
-DATA_FILE = os.path.join(os.path.dirname(__file__), 'people_data.json')
-TARGET_IMAGES_FILE = os.path.join(os.path.dirname(__file__), 'target_images.json')
 
 # יצירת אפליקציית Flask
 app = Flask(__name__,
@@ -69,6 +72,21 @@ CORS(app)
 logging.basicConfig(level=logging.INFO)
 app.logger.setLevel(logging.INFO)
 
+# כל כמה שניות נשלחת הודעת keep-alive בזרם SSE כשאין אירוע חדש
+SSE_KEEPALIVE_SECONDS = 15
+
+
+def warm_up_worker():
+    """
+    טוען את מודלי הפנים וה-YOLO בתהליך ה-worker (נקרא מ-post_worker_init ב-gunicorn.conf.py).
+    לא בזמן import: עם --preload ה-import רץ ב-master, ו-TensorFlow/torch שנבנו לפני fork נתקעים ב-workers.
+    """
+    if os.environ.get('ATTENDME_PRELOAD_MODELS', '1') != '1':
+        return
+    run_inference = os.environ.get('ATTENDME_WARMUP_INFERENCE', '0') == '1'
+    warm_up_models(run_inference=run_inference)
+    warm_up_yolo(run_inference=run_inference)
+
 
 # ==================== AUTHENTICATION DECORATOR ====================
 
@@ -257,7 +275,9 @@ def api_health():
     return jsonify({
         'status': 'ok',
         'message': 'Server is running',
-        'version': '1.0.0'
+        'version': '1.0.0',
+        'models': get_models_status(),
+        'yolo': get_yolo_status()
     })
 
 
@@ -891,12 +911,7 @@ def get_person_images(person_id):
 
         # חיפוש האדם
         school = schools_database[school_index]
-        person = None
-
-        for p in school.people_vector:
-            if p.id_number == person_id:
-                person = p
-                break
+        person = school.get_person(person_id)
 
         if not person:
             return jsonify({
@@ -955,6 +970,19 @@ def delete__image():
 #                        פונקציות ניהול נתונים ובדיקת נוכחות - מעודכן
 # ===============================================================================
 
+def job_accepted_response(job, message, **extra):
+    """תשובת 202 למשימה שנכנסה לתור - עם מזהה המשימה וכתובות המעקב"""
+    return jsonify({
+        'success': True,
+        'job_id': job.job_id,
+        'status': job.status,
+        'message': message,
+        'status_url': url_for('get_face_recognition_status', job_id=job.job_id),
+        'results_url': url_for('get_face_recognition_results', job_id=job.job_id),
+        **extra
+    }), 202
+
+
 @app.route('/api/face-recognition/extract-faces', methods=['POST'])
 def extract_faces_from_targets():
     """מחלץ פנים מכל תמונות המטרה של בית ספר ספציפי"""
@@ -978,22 +1006,9 @@ def extract_faces_from_targets():
                 'faces_extracted': 0
             }), 400
 
-        result = extract_faces_from_cameras(school_index)
-
-        if result['success']:
-            return jsonify({
-                'success': True,
-                'faces_extracted': result['faces_extracted'],
-                'message': result['message'],
-                'school_name': result['school_name']
-            }), 200
-        else:
-            return jsonify({
-                'success': False,
-                'error': result['message'],
-                'faces_extracted': result['faces_extracted'],
-                'school_name': result.get('school_name')
-            }), 400
+        # החילוץ רץ ברקע - הסטטוס והתוצאה ב-/api/face-recognition/status ו-/results
+        job = enqueue_face_extraction(school_index)
+        return job_accepted_response(job, 'חילוץ הפנים נכנס לתור')
 
     except Exception as e:
         return jsonify({
@@ -1030,26 +1045,8 @@ def check_attendance_all():
                 'absent_people': 0
             }), 400
 
-        result = check_attendance_for_people(school_index)
-
-        if result['success']:
-            return jsonify({
-                'success': True,
-                'checked_people': result['checked_people'],
-                'present_people': result['present_people'],
-                'absent_people': result['absent_people'],
-                'message': result['message'],
-                'school_name': result['school_name']
-            }), 200
-        else:
-            return jsonify({
-                'success': False,
-                'error': result['message'],
-                'checked_people': result['checked_people'],
-                'present_people': result['present_people'],
-                'absent_people': result['absent_people'],
-                'school_name': result.get('school_name')
-            }), 400
+        job = enqueue_attendance_check(school_index)
+        return job_accepted_response(job, 'בדיקת הנוכחות נכנסה לתור')
 
     except Exception as e:
         return jsonify({
@@ -1109,27 +1106,25 @@ def check_attendance_selected_people():
                 'absent_people': 0
             }), 400
 
-        # קריאה לפונקציה עם מערך התעודות זהות
-        result = check_attendance_for_selected_people(school_index, person_ids)
+        # תעודות זהות נשמרות כמחרוזות - מספרים מ-JSON מנורמלים לפני החיפוש
+        person_ids = [str(person_id) for person_id in person_ids]
 
-        if result['success']:
-            return jsonify({
-                'success': True,
-                'checked_people': result['checked_people'],
-                'present_people': result['present_people'],
-                'absent_people': result['absent_people'],
-                'message': result['message'],
-                'school_name': result['school_name']
-            }), 200
-        else:
+        # תעודות זהות שלא קיימות בבית הספר מוחזרות מיד, בלי להמתין לבדיקה
+        resolved = resolve_person_ids(school_index, person_ids)
+        if not resolved['success']:
             return jsonify({
                 'success': False,
-                'error': result['message'],
-                'checked_people': result['checked_people'],
-                'present_people': result['present_people'],
-                'absent_people': result['absent_people'],
-                'school_name': result.get('school_name')
-            }), 400
+                'message': resolved['message'],
+                'unknown_person_ids': resolved['unknown_person_ids'],
+                'checked_people': 0,
+                'present_people': 0,
+                'absent_people': 0
+            }), 400 if resolved['error'] == 'INVALID_SCHOOL_INDEX' else 404
+
+        # בדיקה עם מערך התעודות זהות - ברקע
+        job = enqueue_attendance_check(school_index, person_ids)
+        return job_accepted_response(job, 'בדיקת הנוכחות נכנסה לתור',
+                                     unknown_person_ids=resolved['unknown_person_ids'])
 
     except Exception as e:
         return jsonify({
@@ -1141,20 +1136,73 @@ def check_attendance_selected_people():
         }), 500
 
 
+@app.route('/api/attendance/pipeline/stream', methods=['GET'])
+def stream_attendance_pipeline():
+    """
+    חילוץ פנים ובדיקת נוכחות בבקשה אחת, עם התקדמות בזמן אמת (Server-Sent Events).
+    GET כי EventSource בדפדפן תומך רק ב-GET: ?school_index=0&person_ids=123,456
+    """
+    school_index = request.args.get('school_index', type=int)
+    if school_index is None or school_index < 0:
+        return jsonify({
+            'success': False,
+            'message': 'מזהה בית ספר לא תקין'
+        }), 400
+
+    person_ids_arg = request.args.get('person_ids', '').strip()
+    person_ids = [person_id.strip() for person_id in person_ids_arg.split(',') if person_id.strip()] or None
+
+    # בדיקה ספציפית בלי אף תעודת זהות מוכרת - אין טעם לחלץ פנים; התוצאה נשלחת מיד באותו פורמט
+    if person_ids is not None:
+        resolved = resolve_person_ids(school_index, person_ids)
+        if not resolved['success']:
+            result = {'success': False, 'checked_people': 0, 'present_people': 0, 'absent_people': 0,
+                      'unknown_person_ids': resolved['unknown_person_ids'], 'message': resolved['message']}
+            event = {'stage': 'result', 'status': 'failed', 'result': result}
+            return Response(f"event: result\ndata: {json.dumps(event, ensure_ascii=False)}\n\n",
+                            mimetype='text/event-stream', headers={'Cache-Control': 'no-cache'})
+
+    # הריצה עצמה היא משימת רקע; האירועים עוברים בתור ונשלחים ללקוח ברגע שהם מגיעים.
+    # אם החיבור נותק - המשימה ממשיכה, והתוצאה זמינה ב-/api/face-recognition/results
+    events = queue.Queue()
+    job = enqueue_attendance_pipeline(school_index, person_ids, listener=events.put)
+
+    def generate():
+        yield f"event: job\ndata: {json.dumps({'job_id': job.job_id})}\n\n"
+        while True:
+            try:
+                event = events.get(timeout=SSE_KEEPALIVE_SECONDS)
+            except queue.Empty:
+                yield ': keep-alive\n\n'
+                continue
+
+            event_name = 'result' if event['stage'] == 'result' else 'progress'
+            yield f"event: {event_name}\ndata: {json.dumps(event, ensure_ascii=False, default=str)}\n\n"
+            if event_name == 'result':
+                break
+
+    return Response(stream_with_context(generate()), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+
 @app.route('/api/all-faces/<int:school_index>', methods=['GET'])
 def get_all_faces(school_index):
-    """מחזיר את כל הפנים - מזוהות ולא מזוהות"""
+    """מחזיר את כל הפנים - מזוהות ולא מזוהות - מהאינדקס המקומי, עם עימוד (?page=1&per_page=100)"""
     try:
         from Yolo_modle import get_all_matches_for_school
 
-        result = get_all_matches_for_school(school_index)
+        page = max(request.args.get('page', default=1, type=int), 1)
+        per_page = min(max(request.args.get('per_page', default=100, type=int), 1), 500)
 
-        # איחוד הרשימות לרשימה אחת כמו שהקוד מצפה
-        all_faces = result['identified'] + result['unidentified']
+        result = get_all_matches_for_school(school_index, limit=per_page, offset=(page - 1) * per_page)
 
+        # רשימה אחת כמו שהקוד מצפה - מזוהות קודם, החדשות ראשונות
         return jsonify({
             'success': True,
-            'faces': all_faces
+            'faces': result['faces'],
+            'total': result['total'],
+            'page': page,
+            'per_page': per_page
         })
     except Exception as e:
         return jsonify({
@@ -1211,16 +1259,13 @@ def upload_temp_image():
 
         print(f"Public ID: {public_id}")
 
-        result = cloudinary.uploader.upload(
-            file_to_upload,
-            public_id=public_id
-        )
+        result = get_storage().put(public_id, file_to_upload, image_format=None)
 
-        print(f"Upload successful: {result.get('secure_url')}")
+        print(f"Upload successful: {result.get('url')}")
 
         return jsonify({
             'success': True,
-            'image_url': result.get('secure_url'),
+            'image_url': result.get('url'),
             'public_id': result.get('public_id')
         })
     except Exception as e:
@@ -1241,12 +1286,21 @@ def delete_temp_image():
     data = request.get_json()
     public_id = data.get('public_id')
     try:
-        cloudinary.uploader.destroy(public_id)
+        get_storage().delete(public_id)
         return jsonify({'success': True})
     except:
         return jsonify({'success': False})
 
 
+@app.route('/storage/<path:filename>', methods=['GET'])
+def serve_stored_image(filename):
+    """מגיש תמונות מהאחסון המקומי (רק כש-ATTENDME_STORAGE=local)"""
+    storage = get_storage()
+    if not isinstance(storage, LocalStorage):
+        abort(404)
+    return send_from_directory(storage.root, filename, max_age=3600)
+
+
 @app.route('/api/temp-images', methods=['GET'])
 def get_temp_images():
     """מחזיר רשימת תמונות זמניות (אם צריך)"""
@@ -1261,30 +1315,162 @@ def get_temp_images():
 
 @app.route('/api/face-recognition/status', methods=['GET'])
 def get_face_recognition_status():
-    """מחזיר סטטוס תהליך זיהוי הפנים"""
-    # TODO: מלא את הפונקציה
-    pass
+    """
+    מחזיר סטטוס תהליך זיהוי הפנים: ?job_id=... למשימה אחת (כולל זמני שלבים),
+    או ?school_index=... לרשימת המשימות האחרונות של בית הספר
+    """
+    job_id = request.args.get('job_id')
+    if job_id:
+        job = get_job(job_id)
+        if job is None:
+            return jsonify({
+                'success': False,
+                'error': 'משימה לא נמצאה'
+            }), 404
+        return jsonify({'success': True, **job.to_dict()}), 200
+
+    school_index = request.args.get('school_index', type=int)
+    limit = request.args.get('limit', default=20, type=int)
+    return jsonify({
+        'success': True,
+        'jobs': [job.to_dict() for job in list_jobs(school_index, limit)]
+    }), 200
 
 
 @app.route('/api/face-recognition/results', methods=['GET'])
 def get_face_recognition_results():
-    """מחזיר תוצאות זיהוי הפנים"""
-    # TODO: מלא את הפונקציה
-    pass
+    """מחזיר תוצאות זיהוי הפנים של משימה (?job_id=...) - 202 כל עוד היא לא הסתיימה"""
+    job_id = request.args.get('job_id')
+    if not job_id:
+        return jsonify({
+            'success': False,
+            'error': 'מזהה משימה נדרש'
+        }), 400
+
+    job = get_job(job_id)
+    if job is None:
+        return jsonify({
+            'success': False,
+            'error': 'משימה לא נמצאה'
+        }), 404
+
+    if not job.is_finished():
+        return jsonify({'success': True, **job.to_dict()}), 202
+
+    return jsonify({'success': True, **job.to_dict(include_result=True)}), 200
 
 
 @app.route('/api/attendance/mark-all-present', methods=['POST'])
 def mark_all_present():
     """מסמן את כל האנשים כנוכחים"""
-    # TODO: מלא את הפונקציה
-    pass
+    try:
+        data = request.json or {}
+
+        # קבלת school_index מהבקשה
+        school_index = data.get('school_index')
+        if school_index is None or school_index < 0:
+            return jsonify({
+                'success': False,
+                'message': 'מזהה בית ספר לא תקין'
+            }), 400
+
+        result = mark_all_presence(school_index, True, bool(data.get('update_check_time')))
+        return jsonify(result), 200 if result['success'] else 400
+
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'message': f'שגיאת שרת: {str(e)}'
+        }), 500
 
 
 @app.route('/api/attendance/mark-all-absent', methods=['POST'])
 def mark_all_absent():
     """מסמן את כל האנשים כלא נוכחים"""
-    # TODO: מלא את הפונקציה
-    pass
+    try:
+        data = request.json or {}
+
+        # קבלת school_index מהבקשה
+        school_index = data.get('school_index')
+        if school_index is None or school_index < 0:
+            return jsonify({
+                'success': False,
+                'message': 'מזהה בית ספר לא תקין'
+            }), 400
+
+        result = mark_all_presence(school_index, False, bool(data.get('update_check_time')))
+        return jsonify(result), 200 if result['success'] else 400
+
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'message': f'שגיאת שרת: {str(e)}'
+        }), 500
+
+
+@app.route('/api/attendance/bulk-presence', methods=['POST'])
+def set_bulk_presence():
+    """
+    מעדכן סטטוס נוכחות לרשימת אנשים:
+    {'school_index', 'person_ids': [...], 'is_present': bool, 'update_check_time': bool (אופציונלי)}
+    """
+    try:
+        data = request.json or {}
+
+        # קבלת school_index מהבקשה
+        school_index = data.get('school_index')
+        if school_index is None or school_index < 0:
+            return jsonify({
+                'success': False,
+                'message': 'מזהה בית ספר לא תקין'
+            }), 400
+
+        person_ids = data.get('person_ids')
+        if not person_ids or not isinstance(person_ids, list):
+            return jsonify({
+                'success': False,
+                'message': 'רשימת תעודות זהות נדרשת'
+            }), 400
+
+        if 'is_present' not in data:
+            return jsonify({
+                'success': False,
+                'message': 'סטטוס נוכחות נדרש'
+            }), 400
+
+        result = set_presence_for_people(school_index, person_ids, bool(data['is_present']),
+                                         bool(data.get('update_check_time')))
+        if result['success']:
+            return jsonify(result), 200
+        return jsonify(result), 400 if result['error'] == 'INVALID_SCHOOL_INDEX' else 404
+
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'message': f'שגיאת שרת: {str(e)}'
+        }), 500
+
+
+@app.route('/api/attendance/summary/<int:school_index>', methods=['GET'])
+def get_attendance_summary_api(school_index):
+    """ספירות נוכחות; ?status=present/absent מחזיר גם את תעודות הזהות המתאימות"""
+    try:
+        status = request.args.get('status')
+        if status not in (None, 'present', 'absent'):
+            return jsonify({
+                'success': False,
+                'message': 'status חייב להיות present או absent'
+            }), 400
+
+        is_present = None if status is None else status == 'present'
+        result = get_attendance_summary(school_index, is_present)
+        return jsonify(result), 200 if result['success'] else 400
+
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'message': f'שגיאת שרת: {str(e)}'
+        }), 500
 
 
 @app.route('/api/attendance/export', methods=['GET'])
@@ -1350,6 +1536,9 @@ if __name__ == '__main__':
     print(f"📊 PORT environment variable: {os.environ.get('PORT', 'Not set')}")
     print(f"📊 App debug mode: {app.debug}")
 
+    # הרצה ישירה (בלי gunicorn) - אותו תהליך משרת, אז טוענים בו את המודלים
+    warm_up_worker()
+
     try:
         # ✅ הגדרות נכונות ל-Render
         app.run(
@@ -0,0 +1,11 @@
+import threading
+
+
+def post_worker_init(worker):
+    """
+    טעינת המודלים בכל worker אחרי ה-fork (ולא ב-master של --preload).
+    ברקע, כדי שטעינה ארוכה לא תעכב את עליית ה-worker מעבר ל---timeout; בקשות שצריכות מודל
+    ממתינות לטעינה דרך ה-lock של המודל.
+    """
+    from app import warm_up_worker
+    threading.Thread(target=warm_up_worker, name='model-warm-up', daemon=True).start()
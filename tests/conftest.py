@@ -0,0 +1,16 @@
+import os
+import sys
+import tempfile
+
+# המודולים יושבים בשורש הריפו
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# כל המאגרים המקומיים בתיקייה זמנית - הבדיקות לא נוגעות בקבצי הנתונים של הריפו.
+# חייב לקרות לפני הייבוא הראשון של המודולים (Data_Manage טוען את בתי הספר כבר בייבוא)
+_data_dir = tempfile.mkdtemp(prefix='attendme-tests-')
+os.environ.setdefault('ATTENDME_SCHOOL_DB_PATH', os.path.join(_data_dir, 'school_data.sqlite3'))
+os.environ.setdefault('ATTENDME_FACE_INDEX_PATH', os.path.join(_data_dir, 'face_index.sqlite3'))
+os.environ.setdefault('ATTENDME_ENROLLMENT_CACHE_DIR', os.path.join(_data_dir, 'enrollment_cache'))
+os.environ.setdefault('ATTENDME_STORAGE', 'local')
+os.environ.setdefault('ATTENDME_STORAGE_ROOT', os.path.join(_data_dir, 'storage'))
+os.environ.setdefault('ATTENDME_ANN_MIN_PEOPLE', '0')
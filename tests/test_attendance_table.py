@@ -0,0 +1,95 @@
+import math
+
+from Attendance_table import AttendanceTable, format_check_time, parse_check_time
+
+
+def _table(*id_numbers):
+    table = AttendanceTable()
+    for id_number in id_numbers:
+        table.add_row(id_number)
+    return table
+
+
+def test_remove_row_moves_last_row_into_the_gap():
+    table = _table('1', '2', '3', '4')
+    table.set_present('4', True)
+    table.set_check_time('4', '18/10/26 09:30')
+
+    removed = table.remove_row('2')
+
+    assert removed == (False, None)
+    assert len(table) == 3
+    assert '2' not in table
+    # השורה האחרונה ('4') עברה למקום של '2' עם הנוכחות וזמן הבדיקה שלה
+    assert table.get_ids() == ['1', '4', '3']
+    assert table.is_present('4')
+    assert table.get_check_time('4') == '18/10/26 09:30'
+    assert table.get_counts() == {'total': 3, 'present': 1, 'absent': 2, 'checked': 1}
+
+
+def test_remove_last_and_missing_rows():
+    table = _table('1', '2')
+    table.set_present('2', True)
+
+    assert table.remove_row('2') == (True, None)
+    assert table.remove_row('2') is None
+    assert table.get_ids() == ['1']
+
+    # שורה חדשה במקום שהתפנה לא יורשת את המצב של השורה שנמחקה
+    table.add_row('5')
+    assert not table.is_present('5')
+    assert table.get_check_time('5') is None
+
+
+def test_rows_survive_growing_past_initial_capacity():
+    id_numbers = [str(number) for number in range(200)]
+    table = _table(*id_numbers)
+    table.set_presence(id_numbers[::2], True)
+
+    assert len(table) == 200
+    assert table.get_ids(is_present=True) == id_numbers[::2]
+    assert table.get_counts()['present'] == 100
+
+
+def test_mark_all_keeps_check_times_unless_given():
+    table = _table('1', '2', '3')
+    table.set_check_time('1', '18/10/26 08:00')
+
+    assert table.mark_all(True) == 3
+    assert table.get_ids(is_present=True) == ['1', '2', '3']
+    assert table.get_check_time('1') == '18/10/26 08:00'
+    assert table.get_check_time('2') is None
+
+    check_time = parse_check_time('18/10/26 10:15')
+    table.mark_all(False, check_time=check_time)
+    assert table.get_ids(is_present=False) == ['1', '2', '3']
+    assert {table.get_check_time(id_number) for id_number in ('1', '2', '3')} == {'18/10/26 10:15'}
+
+
+def test_set_presence_reports_unknown_ids_and_counts_duplicates_once():
+    table = _table('1', '2', '3')
+
+    updated, unknown_ids = table.set_presence(['1', '3', '3', '9'], True,
+                                              check_time=parse_check_time('18/10/26 11:00'))
+
+    assert updated == 2
+    assert unknown_ids == ['9']
+    assert table.get_ids(is_present=True) == ['1', '3']
+    assert table.get_check_time('1') == '18/10/26 11:00'
+    assert table.get_check_time('2') is None
+
+
+def test_get_ids_checked_since_skips_unchecked_rows():
+    table = _table('1', '2', '3')
+    table.set_check_time('1', '18/10/26 08:00')
+    table.set_check_time('2', '18/10/26 12:00')
+
+    assert table.get_ids(checked_since=parse_check_time('18/10/26 10:00')) == ['2']
+    assert table.get_ids(is_present=False, checked_since=parse_check_time('18/10/26 07:00')) == ['1', '2']
+
+
+def test_check_time_round_trip():
+    assert format_check_time(parse_check_time('18/10/26 09:30')) == '18/10/26 09:30'
+    assert format_check_time(None) is None
+    assert math.isnan(parse_check_time(None))
+    assert math.isnan(parse_check_time(''))
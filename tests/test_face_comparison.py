@@ -0,0 +1,179 @@
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+
+pytest.importorskip('deepface')
+pytest.importorskip('ultralytics')
+
+import Face_comparison
+from Face_comparison import (compute_attendance_matrix, FIRST_THRESHOLD, SECOND_THRESHOLD,
+                             GRAY_ZONE_LOWER_THRESHOLD)
+from Face_embeddings import PRIMARY_MODEL, SECONDARY_MODEL
+from Person import Person
+
+
+class _VectorStore:
+    """וקטורים קבועים לפי מפתח - בלי הורדות ובלי מודלים"""
+
+    def __init__(self, vectors):
+        self._vectors = vectors
+
+    def get(self, key, image_loader):
+        return self._vectors.get(key)
+
+
+@pytest.fixture
+def run_matrix(monkeypatch):
+    """מריץ את compute_attendance_matrix על וקטורים מוכנים (לפי URL של תמונת רישום / public_id של פנים)"""
+    monkeypatch.setattr(Face_comparison, 'validate_school_index', lambda school_index: (True, ''))
+    monkeypatch.setattr(Face_comparison, 'schools_database', [SimpleNamespace(people_vector=[])])
+    monkeypatch.setattr(Face_comparison, 'ANN_MIN_PEOPLE', 0)
+
+    def run(people, person_vectors, faces, face_vectors):
+        monkeypatch.setattr(Face_comparison, 'person_embeddings', _VectorStore(person_vectors))
+        return compute_attendance_matrix(0, people=people, faces_from_cloudinary=faces, image_cache=object(),
+                                         face_embeddings=_VectorStore(face_vectors))
+    return run
+
+
+def _legacy_decision(first_similarity, second_similarity):
+    """ההחלטה של ההשוואה הזוגית הישנה (DeepFace.verify) לזוג אחד של אדם ופנים"""
+    if first_similarity < FIRST_THRESHOLD:
+        second_similarity = 0
+    if second_similarity > 0:
+        final_similarity = (first_similarity + second_similarity) / 2
+    else:
+        final_similarity = first_similarity
+    is_definite = first_similarity >= FIRST_THRESHOLD and second_similarity >= SECOND_THRESHOLD
+    is_gray_zone = not is_definite and first_similarity >= GRAY_ZONE_LOWER_THRESHOLD
+    return second_similarity, final_similarity, is_definite, is_gray_zone
+
+
+def _with_similarity(similarity):
+    """וקטור יחידה שהדמיון שלו לוקטור [1, 0] הוא similarity"""
+    return np.array([similarity, np.sqrt(1 - similarity ** 2)], dtype=np.float32)
+
+
+def _face(number):
+    return {'public_id': f"school_0/face_{number}", 'url': f"face-{number}.jpg", 'filename': f"face_{number}"}
+
+
+def _unit_rows(matrix):
+    return (matrix / np.linalg.norm(matrix, axis=1, keepdims=True)).astype(np.float32)
+
+
+@pytest.mark.parametrize('primary, secondary', [
+    (0.8, 0.7),    # שתי הבדיקות עברו
+    (0.6, 0.5),    # בדיוק על שני הספים
+    (0.8, 0.4),    # הראשונה עברה, השנייה לא
+    (0.95, 0.49),
+    (0.59, 0.9),   # הראשונה לא עברה - השנייה לא נחשבת בכלל
+    (0.2, 0.0),
+])
+def test_single_pair_matches_pairwise_verify(run_matrix, primary, secondary):
+    face_vector = np.array([1, 0], dtype=np.float32)
+    result = run_matrix(
+        [Person('dana', 'levi', '1', ['dana.jpg'])],
+        {'dana.jpg': {PRIMARY_MODEL: _with_similarity(primary), SECONDARY_MODEL: _with_similarity(secondary)}},
+        [_face(0)],
+        {'school_0/face_0': {PRIMARY_MODEL: face_vector, SECONDARY_MODEL: face_vector}})
+
+    first_similarity = float(result['primary_scores'][0, 0])
+    second_similarity, final_similarity, is_definite, is_gray_zone = _legacy_decision(first_similarity, secondary)
+
+    assert result['success']
+    assert first_similarity == pytest.approx(primary, abs=1e-6)
+    assert result['secondary_scores'][0, 0] == pytest.approx(second_similarity, abs=1e-6)
+    assert result['final_scores'][0, 0] == pytest.approx(final_similarity, abs=1e-6)
+    assert bool(result['definite_mask'][0, 0]) == is_definite
+    assert bool(result['gray_zone_mask'][0, 0]) == is_gray_zone
+    assert bool(result['present'][0]) == is_definite
+
+
+def test_matrix_matches_pairwise_verify_for_every_pair(run_matrix):
+    rng = np.random.default_rng(7)
+    people_count, faces_count, dimension = 6, 12, 16
+    person_primary = _unit_rows(rng.normal(size=(people_count, dimension)))
+    person_secondary = _unit_rows(rng.normal(size=(people_count, dimension)))
+
+    # פנים שהן גרסה רועשת של אדם (ברמות רעש שונות, כך שחלק עוברים רק את הסף הראשון) ופנים זרות
+    face_primary = []
+    face_secondary = []
+    for number in range(faces_count):
+        owner = number % people_count
+        noise = (0.2, 0.6, 1.2, 4.0)[number % 4]
+        face_primary.append(person_primary[owner] + noise * rng.normal(size=dimension) / np.sqrt(dimension))
+        face_secondary.append(person_secondary[owner] + 2 * noise * rng.normal(size=dimension) / np.sqrt(dimension))
+    face_primary = _unit_rows(np.array(face_primary))
+    face_secondary = _unit_rows(np.array(face_secondary))
+
+    people = [Person(f"p{row}", 'levi', str(row), [f"{row}.jpg"]) for row in range(people_count)]
+    result = run_matrix(
+        people,
+        {f"{row}.jpg": {PRIMARY_MODEL: person_primary[row], SECONDARY_MODEL: person_secondary[row]}
+         for row in range(people_count)},
+        [_face(number) for number in range(faces_count)],
+        {f"school_0/face_{number}": {PRIMARY_MODEL: face_primary[number], SECONDARY_MODEL: face_secondary[number]}
+         for number in range(faces_count)})
+
+    expected_definite = np.zeros((people_count, faces_count), dtype=bool)
+    for row in range(people_count):
+        for column in range(faces_count):
+            first_similarity = float(np.dot(person_primary[row], face_primary[column]))
+            second_similarity, final_similarity, is_definite, is_gray_zone = _legacy_decision(
+                first_similarity, float(np.dot(person_secondary[row], face_secondary[column])))
+            expected_definite[row, column] = is_definite
+            assert result['primary_scores'][row, column] == pytest.approx(first_similarity, abs=1e-5)
+            assert result['secondary_scores'][row, column] == pytest.approx(second_similarity, abs=1e-5)
+            assert result['final_scores'][row, column] == pytest.approx(final_similarity, abs=1e-5)
+            assert bool(result['gray_zone_mask'][row, column]) == is_gray_zone
+
+    # הנתונים מכסים את שלושת המקרים: התאמה ודאית, רק הסף הראשון, ומתחת לסף
+    passed_first = result['primary_scores'] >= FIRST_THRESHOLD
+    assert expected_definite.any() and (passed_first & ~expected_definite).any() and (~passed_first).any()
+    np.testing.assert_array_equal(result['definite_mask'], expected_definite)
+    np.testing.assert_array_equal(result['present'], expected_definite.any(axis=1))
+    np.testing.assert_array_equal(result['best_face_index'], result['primary_scores'].argmax(axis=1))
+
+
+def test_best_gallery_image_decides(run_matrix):
+    face_vector = np.array([1, 0], dtype=np.float32)
+    result = run_matrix(
+        [Person('dana', 'levi', '1', ['old.jpg', 'new.jpg'])],
+        {'old.jpg': {PRIMARY_MODEL: _with_similarity(0.3), SECONDARY_MODEL: _with_similarity(0.2)},
+         'new.jpg': {PRIMARY_MODEL: _with_similarity(0.9), SECONDARY_MODEL: _with_similarity(0.8)}},
+        [_face(0)],
+        {'school_0/face_0': {PRIMARY_MODEL: face_vector, SECONDARY_MODEL: face_vector}})
+
+    assert result['present'][0]
+    assert result['primary_scores'][0, 0] == pytest.approx(0.9, abs=1e-6)
+    assert result['gallery_sizes'].tolist() == [2]
+
+
+def test_people_and_faces_without_vectors_are_left_out(run_matrix):
+    face_vector = np.array([1, 0], dtype=np.float32)
+    match = {PRIMARY_MODEL: _with_similarity(0.9), SECONDARY_MODEL: _with_similarity(0.9)}
+    result = run_matrix(
+        [Person('dana', 'levi', '1', ['dana.jpg']), Person('noa', 'cohen', '2', ['missing.jpg']),
+         Person('tal', 'bar', '3', [])],
+        {'dana.jpg': match},
+        [_face(0), _face(1)],
+        {'school_0/face_1': {PRIMARY_MODEL: face_vector, SECONDARY_MODEL: face_vector}})
+
+    assert [person.id_number for person in result['people']] == ['1']
+    assert [face['public_id'] for face in result['faces']] == ['school_0/face_1']
+    assert result['row_by_person_id'] == {'1': 0}
+    assert result['present'].tolist() == [True]
+
+
+def test_no_faces_marks_everyone_absent(run_matrix):
+    result = run_matrix(
+        [Person('dana', 'levi', '1', ['dana.jpg'])],
+        {'dana.jpg': {PRIMARY_MODEL: _with_similarity(0.9), SECONDARY_MODEL: _with_similarity(0.9)}},
+        [], {})
+
+    assert result['success']
+    assert result['primary_scores'].shape == (1, 0)
+    assert result['present'].tolist() == [False]
+    assert result['best_face_index'].tolist() == [-1]
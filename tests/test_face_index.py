@@ -0,0 +1,77 @@
+import pytest
+
+import Face_index
+
+
+@pytest.fixture(autouse=True)
+def face_index_path(tmp_path, monkeypatch):
+    """אינדקס ריק לכל בדיקה"""
+    monkeypatch.setattr(Face_index, 'FACE_INDEX_PATH', str(tmp_path / 'face_index.sqlite3'))
+    monkeypatch.setattr(Face_index, '_connection', None)
+    monkeypatch.setattr(Face_index, '_connection_pid', None)
+
+
+def _record_gallery(school_index, matches, unknown):
+    rows = []
+    for number in range(matches):
+        rows.append({'public_id': f"detected_matches/school_{school_index}/match_{number}",
+                     'school_index': school_index, 'kind': Face_index.KIND_MATCH, 'url': f"match-{number}",
+                     'person_id': str(number), 'first_name': 'dana', 'last_name': 'levi', 'final_score': 0.8,
+                     'created_at': f"2026-10-18T10:{number:02d}:00Z"})
+    for number in range(unknown):
+        rows.append({'public_id': f"unidentified_faces/school_{school_index}/unknown_{number}",
+                     'school_index': school_index, 'kind': Face_index.KIND_UNKNOWN, 'url': f"unknown-{number}",
+                     'created_at': f"2026-10-18T11:{number:02d}:00Z"})
+    # פנים מהמצלמות לא מופיעות בגלריה
+    rows.append({'public_id': f"school_{school_index}/face_0", 'school_index': school_index,
+                 'kind': Face_index.KIND_FACE, 'url': 'face-0', 'created_at': '2026-10-18T12:00:00Z'})
+    Face_index.record_images(rows)
+
+
+def test_pages_cover_the_gallery_once_in_order():
+    _record_gallery(0, matches=5, unknown=4)
+
+    pages = [Face_index.query_gallery(0, limit=4, offset=offset) for offset in (0, 4, 8)]
+
+    assert [page['total'] for page in pages] == [9, 9, 9]
+    assert pages[0]['total_identified'] == 5
+    assert pages[0]['total_unidentified'] == 4
+    assert [len(page['faces']) for page in pages] == [4, 4, 1]
+
+    # התאמות מזוהות קודם, ובכל סוג - החדשות ראשונות; אין כפילויות בין עמודים
+    urls = [face['url'] for page in pages for face in page['faces']]
+    assert urls == [f"match-{number}" for number in range(4, -1, -1)] + \
+                   [f"unknown-{number}" for number in range(3, -1, -1)]
+
+
+def test_offset_past_the_end_returns_totals_without_faces():
+    _record_gallery(0, matches=2, unknown=1)
+
+    page = Face_index.query_gallery(0, limit=10, offset=10)
+
+    assert page['faces'] == []
+    assert page['total'] == 3
+
+
+def test_identified_only_and_other_schools():
+    _record_gallery(0, matches=3, unknown=2)
+    _record_gallery(1, matches=1, unknown=7)
+
+    page = Face_index.query_gallery(0, include_unidentified=False, limit=2)
+
+    assert page['total'] == 3
+    assert page['total_unidentified'] == 0
+    assert [face['type'] for face in page['faces']] == ['identified', 'identified']
+    assert page['faces'][0]['first_name'] == 'dana'
+    assert page['faces'][0]['final_score'] == 0.8
+    assert Face_index.query_gallery(1)['total'] == 8
+
+
+def test_removed_kinds_leave_the_gallery():
+    _record_gallery(0, matches=2, unknown=3)
+
+    assert Face_index.remove_images(0, kinds=[Face_index.KIND_UNKNOWN]) == 3
+
+    page = Face_index.query_gallery(0)
+    assert page['total'] == 2
+    assert {face['type'] for face in page['faces']} == {'identified'}
@@ -0,0 +1,86 @@
+import threading
+import time
+
+from Job_manager import JobManager, JOB_COMPLETED, JOB_FAILED
+
+
+def _wait(jobs, timeout=5):
+    deadline = time.time() + timeout
+    while not all(job.is_finished() for job in jobs):
+        assert time.time() < deadline, "המשימות לא הסתיימו בזמן"
+        time.sleep(0.01)
+
+
+def _recording_job(name, log, log_lock, delay=0.05):
+    def func(on_progress):
+        with log_lock:
+            log.append(('start', name))
+        time.sleep(delay)
+        with log_lock:
+            log.append(('end', name))
+        return {'success': True, 'message': name}
+    return func
+
+
+def test_jobs_of_one_school_run_one_after_another():
+    manager = JobManager(max_workers=4)
+    log = []
+    log_lock = threading.Lock()
+
+    jobs = [manager.submit('check_all', 0, _recording_job(name, log, log_lock)) for name in ('a', 'b', 'c')]
+    _wait(jobs)
+
+    # כל משימה מתחילה רק אחרי שהקודמת של אותו בית ספר הסתיימה, לפי סדר ההגשה
+    assert log == [('start', 'a'), ('end', 'a'), ('start', 'b'), ('end', 'b'), ('start', 'c'), ('end', 'c')]
+    assert [job.status for job in jobs] == [JOB_COMPLETED] * 3
+
+
+def test_different_schools_run_in_parallel():
+    manager = JobManager(max_workers=2)
+    both_started = threading.Barrier(2, timeout=5)
+
+    def func(on_progress):
+        # נתקע אם המשימה של בית הספר השני לא רצה באותו זמן
+        both_started.wait()
+        return {'success': True, 'message': 'ok'}
+
+    jobs = [manager.submit('check_all', school_index, func) for school_index in (0, 1)]
+    _wait(jobs)
+
+    assert [job.status for job in jobs] == [JOB_COMPLETED, JOB_COMPLETED]
+
+
+def test_failed_job_releases_the_school():
+    manager = JobManager(max_workers=2)
+
+    def failing(on_progress):
+        raise RuntimeError("boom")
+
+    first = manager.submit('extract_faces', 0, failing)
+    second = manager.submit('check_all', 0, lambda on_progress: {'success': True, 'message': 'ok'})
+    _wait([first, second])
+
+    assert first.status == JOB_FAILED
+    assert first.error == "boom"
+    assert second.status == JOB_COMPLETED
+    assert second.started_at >= first.finished_at
+
+
+def test_progress_events_reach_stages_and_listener():
+    manager = JobManager(max_workers=1)
+    events = []
+
+    def func(on_progress):
+        on_progress({'stage': 'embed', 'status': 'started'})
+        on_progress({'stage': 'embed', 'status': 'completed', 'faces': 3})
+        return {'success': True, 'message': 'ok'}
+
+    job = manager.submit('check_all', 0, func, listener=events.append)
+    _wait([job])
+
+    job_data = job.to_dict(include_result=True)
+    assert job_data['stages']['embed']['status'] == 'completed'
+    assert job_data['stages']['embed']['faces'] == 3
+    assert job_data['result'] == {'success': True, 'message': 'ok'}
+    assert [event['stage'] for event in events] == ['embed', 'embed', 'result']
+    assert manager.get_recent(school_index=0) == [job]
@@ -0,0 +1,114 @@
+import pytest
+
+# Target (ולכן המאגר) מייבא את שכבת ה-YOLO
+pytest.importorskip('ultralytics')
+
+import School_store
+from Person import Person
+from School import School
+from Target import Target
+
+
+@pytest.fixture(autouse=True)
+def school_db_path(tmp_path, monkeypatch):
+    """מאגר ריק לכל בדיקה"""
+    monkeypatch.setattr(School_store, 'SCHOOL_DB_PATH', str(tmp_path / 'school_data.sqlite3'))
+    _restart()
+
+
+def _restart():
+    """כמו הפעלה מחדש של התהליך - החיבור הבא נפתח מחדש מהקובץ"""
+    School_store._connection = None
+    School_store._connection_pid = None
+
+
+def _school(school_index=0):
+    return School('herzl', 'herzl@example.com', '050', 'tel aviv', f"admin{school_index}", 'secret',
+                  school_index=school_index, created_at='18/10/26 08:00')
+
+
+def _person(id_number, first_name='dana', image_urls=None):
+    return Person(first_name, 'levi', id_number, image_urls or [f"{id_number}.jpg"])
+
+
+def test_school_headers_round_trip():
+    assert School_store.save_school(_school(0))
+    assert School_store.save_school(_school(1))
+    _restart()
+
+    schools = School_store.load_schools()
+
+    assert [school.school_index for school in schools] == [0, 1]
+    assert schools[0].admin_username == 'admin0'
+    assert schools[0].created_at == '18/10/26 08:00'
+
+
+def test_people_and_targets_round_trip_in_insertion_order():
+    School_store.save_school(_school())
+    School_store.save_people(0, [_person('3'), _person('1', image_urls=['a.jpg', 'b.jpg']), _person('2')])
+    target = Target(7, ['cam-a.jpg', 'cam-b.jpg'])
+    target.faces_count = 2
+    target.extracted_faces = ['face-1', 'face-2']
+    target.is_checked = True
+    School_store.save_target(0, target)
+    School_store.save_target(0, Target(4, 'cam.jpg'))
+    _restart()
+
+    people, targets = School_store.load_school_contents(0)
+
+    assert [person.id_number for person in people] == ['3', '1', '2']
+    assert list(people[1].image_urls) == ['a.jpg', 'b.jpg']
+    assert [target.camera_number for target in targets] == [7, 4]
+    assert targets[0].image_url == ['cam-a.jpg', 'cam-b.jpg']
+    assert targets[0].faces_count == 2
+    assert targets[0].extracted_faces == ['face-1', 'face-2']
+    assert targets[0].is_checked
+    assert targets[1].image_url == 'cam.jpg'
+
+
+def test_update_keeps_position():
+    School_store.save_people(0, [_person('1'), _person('2'), _person('3')])
+
+    School_store.save_person(0, _person('1', first_name='noa'))
+    _restart()
+
+    people, _ = School_store.load_school_contents(0)
+    assert [person.id_number for person in people] == ['1', '2', '3']
+    assert people[0].first_name == 'noa'
+
+
+def test_presence_and_check_time_survive_restart():
+    School_store.save_people(0, [_person('1'), _person('2'), _person('3')])
+
+    School_store.save_presence(0, True, id_numbers=['1', '3'], check_time='18/10/26 09:30')
+    _restart()
+
+    people, _ = School_store.load_school_contents(0)
+    assert [(person.id_number, person.is_present, person.check_time) for person in people] == [
+        ('1', True, '18/10/26 09:30'), ('2', False, None), ('3', True, '18/10/26 09:30')]
+
+
+def test_presence_without_check_time_keeps_the_stored_one():
+    School_store.save_people(0, [_person('1'), _person('2')])
+    School_store.save_presence(0, True, check_time='18/10/26 09:30')
+
+    School_store.save_presence(0, False)
+    _restart()
+
+    people, _ = School_store.load_school_contents(0)
+    assert [(person.is_present, person.check_time) for person in people] == [
+        (False, '18/10/26 09:30'), (False, '18/10/26 09:30')]
+
+
+def test_deletes():
+    School_store.save_people(0, [_person('1'), _person('2')])
+    School_store.save_people(1, [_person('1')])
+    School_store.save_target(0, Target(1, 'cam.jpg'))
+
+    School_store.delete_person(0, '1')
+    School_store.delete_targets(0)
+    _restart()
+
+    assert [person.id_number for person in School_store.load_school_contents(0)[0]] == ['2']
+    assert School_store.load_school_contents(0)[1] == []
+    assert [person.id_number for person in School_store.load_school_contents(1)[0]] == ['1']
@@ -19,6 +19,11 @@ let attendanceData = [];
 // מצב בדיקה פעילה
 let isCheckingAttendance = false;
 
+// עימוד גלריית הפנים - כמה פנים בכל עמוד, העמוד האחרון שנטען וכמה פנים יש בסך הכל
+const DETECTED_MATCHES_PER_PAGE = 100;
+let detectedMatchesPage = 0;
+let detectedMatchesTotal = 0;
+
 // ==================== INITIALIZATION ====================
 
 /**
@@ -84,6 +89,12 @@ function initializeAttendanceEventListeners() {
         clearMatchesBtn.addEventListener('click', clearDetectedMatches);
     }
 
+    // כפתור טעינת עמוד נוסף בגלריית הפנים
+    const loadMoreMatchesBtn = document.getElementById('load-more-matches');
+    if (loadMoreMatchesBtn) {
+        loadMoreMatchesBtn.addEventListener('click', () => loadDetectedMatches(true));
+    }
+
     console.log('🎯 מאזיני אירועים לנוכחות הוגדרו');
 }
 
@@ -199,6 +210,93 @@ function renderAttendanceTable() {
 
 // ==================== ATTENDANCE CHECKING ====================
 
+/**
+ * הודעות לשלבי הריצה (לפי האירועים שהשרת שולח)
+ */
+const PIPELINE_STAGE_MESSAGES = {
+    detect: 'שלב 1: מחלץ פנים מתמונות מטרה...',
+    embed: 'שלב 2: מחשב וקטורי פנים...',
+    match: 'שלב 3: משווה פנים מול האנשים הרשומים...',
+    persist: 'שלב 4: שומר תוצאות נוכחות...'
+};
+
+/**
+ * הרצת חילוץ פנים ובדיקת נוכחות בבקשה אחת, עם התקדמות בזמן אמת (Server-Sent Events)
+ * @param {number} schoolIndex - מספר בית הספר
+ * @param {Array<string>|null} personIds - תעודות זהות לבדיקה ספציפית (null = כולם)
+ * @returns {Promise<Object>} תוצאת בדיקת הנוכחות
+ */
+function runAttendancePipeline(schoolIndex, personIds = null) {
+    return new Promise((resolve, reject) => {
+        const params = new URLSearchParams({ school_index: schoolIndex });
+        if (personIds && personIds.length > 0) {
+            params.set('person_ids', personIds.join(','));
+        }
+
+        const source = new EventSource(`/api/attendance/pipeline/stream?${params.toString()}`);
+        let finished = false;
+        let jobId = null;
+
+        source.addEventListener('job', (event) => {
+            jobId = JSON.parse(event.data).job_id;
+            console.log('📥 משימת נוכחות:', jobId);
+        });
+
+        source.addEventListener('progress', (event) => {
+            const progress = JSON.parse(event.data);
+            console.log('📡 התקדמות:', progress);
+
+            if (progress.status === 'started' && PIPELINE_STAGE_MESSAGES[progress.stage]) {
+                showNotification(PIPELINE_STAGE_MESSAGES[progress.stage], 'info');
+            } else if (progress.stage === 'detect' && progress.status === 'completed') {
+                console.log(`✅ חילוץ פנים הצליח: ${progress.faces} פנים`);
+            }
+        });
+
+        source.addEventListener('result', (event) => {
+            finished = true;
+            source.close();
+            resolve(JSON.parse(event.data).result);
+        });
+
+        source.onerror = () => {
+            if (finished) return;
+            finished = true;
+            source.close();
+
+            // הריצה ממשיכה בשרת גם אם הזרם נותק - ממשיכים לעקוב אחרי המשימה
+            if (!jobId) {
+                reject(new Error('החיבור לשרת נותק במהלך בדיקת הנוכחות'));
+                return;
+            }
+            console.warn('⚠️ זרם ההתקדמות נותק, עובר למעקב אחרי המשימה');
+            waitForJobResult(jobId).then(resolve, reject);
+        };
+    });
+}
+
+/**
+ * המתנה לסיום משימת רקע בשרת - בדיקת /api/face-recognition/results כל כמה שניות
+ * @param {string} jobId - מזהה המשימה
+ * @param {number} intervalMs - זמן בין בדיקות
+ * @returns {Promise<Object>} תוצאת המשימה
+ */
+async function waitForJobResult(jobId, intervalMs = 2000) {
+    while (true) {
+        const response = await fetch(`/api/face-recognition/results?job_id=${encodeURIComponent(jobId)}`);
+        const data = await response.json();
+
+        if (response.status === 200) {
+            return data.result;
+        }
+        if (response.status !== 202) {
+            throw new Error(data.error || 'שגיאה בקבלת תוצאות המשימה');
+        }
+
+        await new Promise(resolve => setTimeout(resolve, intervalMs));
+    }
+}
+
 /**
  * טיפול בבדיקת נוכחות כללית
  */
@@ -228,32 +326,8 @@ async function handleCheckAllPeople() {
     try {
         const schoolIndex = getCurrentSchoolIndex();
 
-        // שלב 1: חילוץ פנים
-        showNotification('שלב 1: מחלץ פנים מתמונות מטרה...', 'info');
-
-        const extractResponse = await fetch('/api/face-recognition/extract-faces', {
-            method: 'POST',
-            headers: {'Content-Type': 'application/json'},
-            body: JSON.stringify({ school_index: schoolIndex })
-        });
-
-        const extractData = await extractResponse.json();
-        if (!extractData.success) {
-            throw new Error(extractData.error || 'שגיאה בחילוץ פנים');
-        }
-
-        console.log(`✅ חילוץ פנים הצליח: ${extractData.faces_extracted} פנים`);
-
-        // שלב 2: בדיקת נוכחות
-        showNotification('שלב 2: בודק נוכחות עבור כל האנשים...', 'info');
-
-        const attendanceResponse = await fetch('/api/attendance/check-all', {
-            method: 'POST',
-            headers: {'Content-Type': 'application/json'},
-            body: JSON.stringify({ school_index: schoolIndex })
-        });
-
-        const attendanceResult = await attendanceResponse.json();
+        // חילוץ פנים ובדיקת נוכחות בריצה אחת
+        const attendanceResult = await runAttendancePipeline(schoolIndex);
 
         if (attendanceResult.success) {
             const message = `🎉 בדיקת נוכחות הושלמה!\n` +
@@ -265,12 +339,11 @@ async function handleCheckAllPeople() {
 
             // רענון נתונים
             showNotification('מעדכן נתונים...', 'info');
-            await new Promise(resolve => setTimeout(resolve, 1000));
             await loadAttendanceData();
             await loadDetectedMatches();
 
         } else {
-            throw new Error(attendanceResult.error || 'שגיאה בבדיקת נוכחות');
+            throw new Error(attendanceResult.error || attendanceResult.message || 'שגיאה בבדיקת נוכחות');
         }
 
     } catch (error) {
@@ -313,45 +386,23 @@ async function handleCheckSpecificPeople() {
     try {
         const schoolIndex = getCurrentSchoolIndex();
 
-        // שלב 1: חילוץ פנים
-        showNotification('שלב 1: מחלץ פנים מתמונות מטרה...', 'info');
-
-        const extractResponse = await fetch('/api/face-recognition/extract-faces', {
-            method: 'POST',
-            headers: {'Content-Type': 'application/json'},
-            body: JSON.stringify({ school_index: schoolIndex })
-        });
-
-        const extractData = await extractResponse.json();
-        if (!extractData.success) {
-            throw new Error(extractData.error || 'שגיאה בחילוץ פנים');
-        }
-
-        // שלב 2: בדיקת נוכחות ספציפית
-        showNotification('שלב 2: בודק נוכחות עבור האנשים הנבחרים...', 'info');
-
-        const attendanceResponse = await fetch('/api/attendance/check-specific', {
-            method: 'POST',
-            headers: {'Content-Type': 'application/json'},
-            body: JSON.stringify({
-                school_index: schoolIndex,
-                person_ids: selectedIds
-            })
-        });
-
-        const result = await attendanceResponse.json();
+        // חילוץ פנים ובדיקת נוכחות לאנשים הנבחרים בריצה אחת
+        const result = await runAttendancePipeline(schoolIndex, selectedIds);
 
         if (result.success) {
             const message = `🎉 בדיקת נוכחות הושלמה!\n` +
                            `✅ נוכחים: ${result.present_people}\n` +
                            `❌ נעדרים: ${result.absent_people}\n` +
-                           `📊 סה"כ נבדקו: ${selectedIds.length} אנשים`;
+                           `📊 סה"כ נבדקו: ${result.checked_people} אנשים`;
 
             showNotification(message, 'success');
 
+            if (result.unknown_person_ids && result.unknown_person_ids.length > 0) {
+                showNotification(`תעודות זהות שלא נמצאו: ${result.unknown_person_ids.join(', ')}`, 'warning');
+            }
+
             // רענון נתונים
             showNotification('מעדכן נתונים...', 'info');
-            await new Promise(resolve => setTimeout(resolve, 1000));
             await loadAttendanceData();
             await loadDetectedMatches();
 
@@ -359,7 +410,7 @@ async function handleCheckSpecificPeople() {
             selectedCheckboxes.forEach(cb => cb.checked = false);
 
         } else {
-            throw new Error(result.error || 'שגיאה בבדיקת נוכחות');
+            throw new Error(result.error || result.message || 'שגיאה בבדיקת נוכחות');
         }
 
     } catch (error) {
@@ -536,27 +587,48 @@ if (window.location.hostname === 'localhost' || window.location.hostname === '12
     console.log('🔧 כלי דיבוג זמינים: window.debugAttendance');
 }
 
-// טעינת כל הפנים
-async function loadDetectedMatches() {
+// טעינת הפנים - העמוד הראשון מחדש, או (append) העמוד הבא בהמשך הגלריה
+async function loadDetectedMatches(append = false) {
     try {
         const schoolIndex = getCurrentSchoolIndex();
-        const response = await fetch(`/api/all-faces/${schoolIndex}`);
+        const page = append ? detectedMatchesPage + 1 : 1;
+        const response = await fetch(`/api/all-faces/${schoolIndex}?page=${page}&per_page=${DETECTED_MATCHES_PER_PAGE}`);
         const data = await response.json();
 
         if (data.success && data.faces) {
-            renderDetectedMatches(data.faces);
+            detectedMatchesPage = data.page;
+            detectedMatchesTotal = data.total;
+            renderDetectedMatches(data.faces, append);
+            updateLoadMoreMatchesButton();
         }
     } catch (error) {
         console.error('שגיאה בטעינת פנים:', error);
     }
 }
 
-// הצגת כל הפנים
-function renderDetectedMatches(faces) {
+// כפתור "טען עוד" מוצג כל עוד לא כל הפנים בגלריה
+function updateLoadMoreMatchesButton() {
+    const button = document.getElementById('load-more-matches');
+    const container = document.getElementById('detected-matches-container');
+    if (!button || !container) return;
+
+    const shown = container.children.length;
+    if (shown < detectedMatchesTotal) {
+        button.style.display = '';
+        button.innerHTML = `<i class="fas fa-chevron-down"></i> טען עוד (${shown} מתוך ${detectedMatchesTotal})`;
+    } else {
+        button.style.display = 'none';
+    }
+}
+
+// הצגת הפנים (append - הוספה לסוף הגלריה במקום החלפה)
+function renderDetectedMatches(faces, append = false) {
     const container = document.getElementById('detected-matches-container');
     if (!container) return;
 
-    container.innerHTML = '';
+    if (!append) {
+        container.innerHTML = '';
+    }
 
     faces.forEach(face => {
         const faceCard = document.createElement('div');